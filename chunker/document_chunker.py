@@ -4,28 +4,98 @@ from langchain_core.documents import Document
 from unstructured.chunking.title import chunk_by_title
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+from chunker.section_splitter import SectionSplitter, add_filter_fields
+
 
 class DocumentChunker:
-    def __init__(self, max_chunk_size=1800, overlap=200):
+    def __init__(self, max_chunk_size=1800, overlap=200, native=False, max_tokens=None, token_counter=None):
         self.max_chunk_size = max_chunk_size
         self.overlap = overlap
+        # Sections shorter than this are merged with the next one
+        self.combine_under_chars = 200
         self.fallback_splitter = RecursiveCharacterTextSplitter(
             chunk_size=max_chunk_size,
             chunk_overlap=overlap,
             separators=["\n\n", "\n", ". ", " ", ""]  # Prioritize paragraph breaks
         )
+        # Single-pass splitter; max_tokens keeps chunks inside the embedding model's input window
+        self.splitter = SectionSplitter(
+            max_chunk_size=max_chunk_size,
+            overlap=overlap,
+            max_tokens=max_tokens,
+            token_counter=token_counter
+        ) if native else None
 
-    def chunk_document(self, elements, source_url):
+    def _title_chunks(self, elements, include_orig_elements=False):
         # Step 1: Use title-based chunking to respect document structure
-        title_chunks = chunk_by_title(
+        return chunk_by_title(
             elements,
             max_characters=self.max_chunk_size,  # Respect size limits
             new_after_n_chars=int(self.max_chunk_size * 0.8),  # Start looking for breaks at 80%
-            combine_text_under_n_chars=200,  # Combine very small sections
+            combine_text_under_n_chars=self.combine_under_chars,  # Combine very small sections
+            # Chunks would otherwise carry a copy of every element they contain
+            include_orig_elements=include_orig_elements,
         )
 
-        processed_chunks = []
+    def chunk_document(self, elements, source_url):
+        if self.splitter is not None:
+            return list(self.splitter.split(elements, source_url))
+        return list(self._documents(self._title_chunks(elements), source_url))
+
+    def iter_chunks(self, elements, source_url, max_section_chars=None):
+        """Yield Documents section by section while consuming elements from any iterable.
+
+        Only the open title section is buffered; a section that grows past max_section_chars
+        (default 20 chunks' worth) is flushed at the next page boundary. The chunk still being
+        filled when a section is flushed is carried into the next one, so chunk boundaries match
+        chunking the whole document at once.
+        """
+        if self.splitter is not None:
+            # Already streaming: only the chunk being filled is buffered
+            yield from self.splitter.split(elements, source_url)
+            return
+
+        max_section_chars = max_section_chars or self.max_chunk_size * 20
+        section = []
+        section_chars = 0
+        page = None
 
+        for element in elements:
+            element_page = getattr(element.metadata, "page_number", None)
+            at_title = element.category == "Title"
+            if section and (at_title or (section_chars > max_section_chars and element_page != page)):
+                chunks, section = self._close_section(section, at_title)
+                yield from self._documents(chunks, source_url)
+                section_chars = sum(len(carried.text or "") for carried in section)
+
+            section.append(element)
+            section_chars += len(element.text or "")
+            page = element_page
+
+        if section:
+            yield from self._documents(self._title_chunks(section), source_url)
+
+    def _close_section(self, section, at_title):
+        """Chunk a buffered section; returns its finished chunks and the elements of the chunk still open.
+
+        At a title the last chunk is still open only when it is short enough to be combined with the
+        next section; at a page boundary inside a section it always is.
+        """
+        chunks = self._title_chunks(section, include_orig_elements=True)
+        carry = []
+        if chunks:
+            last = chunks[-1]
+            # A piece of a split element can't be re-chunked without repeating the whole element
+            open_chunk = not getattr(last.metadata, "is_continuation", False) and (
+                not at_title or len(last.text) < self.combine_under_chars
+            )
+            if open_chunk and last.metadata.orig_elements:
+                carry = chunks.pop().metadata.orig_elements
+        for chunk in chunks:
+            chunk.metadata.orig_elements = None
+        return chunks, carry
+
+    def _documents(self, title_chunks, source_url):
         for chunk in title_chunks:
             if not isinstance(chunk.text, str) or not chunk.text.strip():
                 continue
@@ -52,10 +122,10 @@ class DocumentChunker:
                         elif isinstance(chunk.metadata, dict):
                             metadata.update(chunk.metadata)
 
-                    processed_chunks.append(Document(
+                    yield Document(
                         page_content=sub_chunk.page_content,
-                        metadata=metadata
-                    ))
+                        metadata=add_filter_fields(metadata)
+                    )
             else:
                 # Step 3: Keep title-based chunks that are appropriately sized
                 metadata = {
@@ -71,9 +141,7 @@ class DocumentChunker:
                     elif isinstance(chunk.metadata, dict):
                         metadata.update(chunk.metadata)
 
-                processed_chunks.append(Document(
+                yield Document(
                     page_content=chunk_text,
-                    metadata=metadata
-                ))
-
-        return processed_chunks
\ No newline at end of file
+                    metadata=add_filter_fields(metadata)
+                )
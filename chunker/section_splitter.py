@@ -0,0 +1,225 @@
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+import logging
+import math
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# Same preference order as the RecursiveCharacterTextSplitter fallback it replaces
+SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+
+# Element-level layout details that don't describe the section as a whole
+ELEMENT_ONLY_METADATA = {
+    "coordinates", "parent_id", "category_depth", "orig_elements", "emphasized_text_contents",
+    "emphasized_text_tags", "text_as_html", "detection_class_prob", "links", "link_texts", "link_urls",
+    "link_start_indexes",
+}
+
+
+def add_filter_fields(metadata: Dict) -> Dict:
+    """Flatten the element metadata Milvus filters on into scalar values"""
+    languages = metadata.get("languages")
+    if languages:
+        metadata["language"] = languages[0]
+    # Document dates from unstructured are ISO timestamps; keep the date part
+    last_modified = metadata.get("last_modified")
+    if isinstance(last_modified, str) and len(last_modified) >= 10:
+        metadata["publication_date"] = last_modified[:10]
+    return metadata
+
+
+class SectionSplitter:
+    """Title-section chunking and oversized-text splitting in one pass over the elements
+
+    Boundaries follow chunk_by_title (new section at each Title, sections under combine_under
+    characters merged into the next, soft limit at 80% of max_chunk_size) and text longer than a
+    chunk is split on the same separators and overlap as the RecursiveCharacterTextSplitter fallback.
+    With max_tokens set, chunks are also kept within the embedding model's input window.
+    """
+
+    def __init__(self, max_chunk_size: int = 1800, overlap: int = 200, combine_under: int = 200,
+                 max_tokens: Optional[int] = None, token_counter: Optional[Callable[[str], int]] = None,
+                 chars_per_token: float = 4.0):
+        self.max_chunk_size = max_chunk_size
+        self.soft_max = int(max_chunk_size * 0.8)
+        self.overlap = overlap
+        self.combine_under = combine_under
+        self.max_tokens = max_tokens
+        self.chars_per_token = chars_per_token
+        self.token_counter = token_counter or self._estimate_tokens
+
+    def _estimate_tokens(self, text: str) -> int:
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def _fits(self, length: int, tokens: int) -> bool:
+        return length <= self.max_chunk_size and (self.max_tokens is None or tokens <= self.max_tokens)
+
+    @staticmethod
+    def _section_metadata(element, source_url: str) -> Dict:
+        """Metadata shared by every chunk of a section, built once from its first element"""
+        metadata = element.metadata.to_dict() if hasattr(element.metadata, "to_dict") else dict(element.metadata)
+        for key in ELEMENT_ONLY_METADATA:
+            metadata.pop(key, None)
+        metadata["source_url"] = source_url
+        return add_filter_fields(metadata)
+
+    def split(self, elements: Iterable, source_url: str) -> Iterator[Document]:
+        section_metadata = None
+        section_length = 0
+        # The chunk being filled: element texts, their joined length and estimated tokens
+        texts: List[str] = []
+        length = 0
+        tokens = 0
+        page = None
+        # A title ending the open chunk belongs with the text after it, not at the tail of this chunk
+        ends_with_title = False
+        title_page = None
+
+        def flush(keep_title=False):
+            nonlocal texts, length, tokens, page, ends_with_title
+            held = texts.pop() if keep_title and ends_with_title and len(texts) > 1 else None
+            if texts:
+                yield self._document("\n\n".join(texts), section_metadata, page, "title_section")
+            texts, length, tokens = [], 0, 0
+            ends_with_title = False
+            if held is not None:
+                texts, length, tokens, page = [held], len(held), self.token_counter(held), title_page
+                ends_with_title = True
+
+        for element in elements:
+            text = (element.text or "").strip()
+            if not text:
+                continue
+            element_page = getattr(element.metadata, "page_number", None)
+
+            # A title closes the open section unless that section is too small to stand alone
+            if element.category == "Title" and section_metadata is not None and section_length >= self.combine_under:
+                yield from flush()
+                section_metadata = None
+                section_length = 0
+            if section_metadata is None:
+                section_metadata = self._section_metadata(element, source_url)
+
+            element_tokens = self.token_counter(text)
+            if not self._fits(len(text), element_tokens):
+                if length > self.max_chunk_size // 2:
+                    yield from flush(keep_title=True)
+                # What is still open (typically just the section title) leads the first split piece
+                if not texts:
+                    page = element_page
+                lead = "\n\n".join(texts)
+                texts, length, tokens, ends_with_title = [], 0, 0, False
+                for i, piece in enumerate(self._split_with_lead(lead, text)):
+                    yield self._document(piece, section_metadata, page, "title_subsection", i)
+                section_length += len(text)
+                continue
+
+            joined_length = length + (2 if texts else 0) + len(text)
+            if texts and (length >= self.soft_max or not self._fits(joined_length, tokens + element_tokens)):
+                yield from flush(keep_title=True)
+                joined_length = length + (2 if texts else 0) + len(text)
+
+            if not texts:
+                page = element_page
+            texts.append(text)
+            length = joined_length
+            tokens += element_tokens
+            section_length += len(text)
+            ends_with_title = element.category == "Title"
+            if ends_with_title:
+                title_page = element_page
+
+        yield from flush()
+
+    def _split_with_lead(self, lead: str, text: str) -> List[str]:
+        """Split oversized text with lead prefixed to its first piece, never as a piece of its own"""
+        pieces = self._split_text(text)
+        if not lead:
+            return pieces
+
+        first = f"{lead}\n\n{pieces[0]}"
+        if self._fits(len(first), self.token_counter(first)):
+            return [first] + pieces[1:]
+
+        # Only the first chunk gets the smaller budget: split off what fits next to the lead, then split the
+        # rest of the text (from where the narrower split's second chunk starts, keeping its overlap) as usual
+        room = self.max_chunk_size - len(lead) - 2
+        room_tokens = self.max_tokens - self.token_counter(lead) - 1 if self.max_tokens is not None else None
+        if room <= self.overlap or (room_tokens is not None and room_tokens <= 0):
+            return [lead] + pieces
+        narrower = SectionSplitter(max_chunk_size=room, overlap=self.overlap, max_tokens=room_tokens,
+                                   token_counter=self.token_counter, chars_per_token=self.chars_per_token)
+        head = narrower._split_text(text)
+        if len(head) == 1:
+            return [f"{lead}\n\n{head[0]}"]
+        # The second chunk overlaps the first by at most `overlap` characters
+        rest = text.find(head[1], max(len(head[0]) - self.overlap - 2, 1))
+        if rest < 0:
+            return [f"{lead}\n\n{head[0]}"] + head[1:]
+        return [f"{lead}\n\n{head[0]}"] + self._split_text(text[rest:])
+
+    @staticmethod
+    def _document(text: str, section_metadata: Dict, page, chunk_type: str,
+                  subsection_index: Optional[int] = None) -> Document:
+        # Shallow copy: section values are shared, only the per-chunk keys are new
+        metadata = dict(section_metadata, chunk_type=chunk_type, is_split_chunk=subsection_index is not None)
+        if subsection_index is not None:
+            metadata["subsection_index"] = subsection_index
+        if page is not None:
+            metadata["page_number"] = page
+        return Document(page_content=text, metadata=metadata)
+
+    def _split_text(self, text: str, separators: List[str] = SEPARATORS) -> List[str]:
+        """Recursive separator split with overlap, as RecursiveCharacterTextSplitter does it"""
+        separator = separators[-1]
+        remaining = []
+        for i, candidate in enumerate(separators):
+            if candidate == "" or candidate in text:
+                separator = candidate
+                remaining = separators[i + 1:]
+                break
+
+        pieces = text.split(separator) if separator else list(text)
+        chunks: List[str] = []
+        pending: List[str] = []
+        for piece in pieces:
+            if self._fits(len(piece), self.token_counter(piece)):
+                pending.append(piece)
+                continue
+            if pending:
+                chunks.extend(self._merge(pending, separator))
+                pending = []
+            if remaining:
+                chunks.extend(self._split_text(piece, remaining))
+            else:
+                chunks.append(piece)
+        if pending:
+            chunks.extend(self._merge(pending, separator))
+        return chunks
+
+    def _merge(self, pieces: List[str], separator: str) -> List[str]:
+        """Greedily pack pieces into chunks, carrying up to `overlap` characters into the next one"""
+        chunks = []
+        window: List[str] = []
+        length = 0
+        tokens = 0
+        gap = len(separator)
+
+        for piece in pieces:
+            piece_tokens = self.token_counter(piece)
+            if window and not self._fits(length + gap + len(piece), tokens + piece_tokens):
+                chunks.append(separator.join(window).strip())
+                # Drop leading pieces until what remains is a valid overlap for the next chunk
+                while window and (length > self.overlap or
+                                  not self._fits(length + gap + len(piece), tokens + piece_tokens)):
+                    dropped = window.pop(0)
+                    length -= len(dropped) + (gap if window else 0)
+                    tokens -= self.token_counter(dropped)
+            length += (gap if window else 0) + len(piece)
+            tokens += piece_tokens
+            window.append(piece)
+
+        if window:
+            chunks.append(separator.join(window).strip())
+        return [chunk for chunk in chunks if chunk]
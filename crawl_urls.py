@@ -4,33 +4,72 @@ from langchain_core.documents import Document
 from embedding_provider.embedding_provider import EmbeddingService  # Replace with actual import path
 from chunker.document_chunker import DocumentChunker
 from parsers.parser import EurlexHTMLParser, CSSFHTMLParser, PDFParser, DocumentProcessor
+from parsers.boilerplate import BoilerplateCleaner
 
 import scrapy
+from scrapy import signals
 from scrapy.crawler import CrawlerProcess
 from urllib.parse import urlparse, urljoin, unquote
 from url.url_rules import URLRules
+from url.frontier import CrawlFrontier
+from crawler.ingest_pipeline import IngestJob, IngestPipeline
+from crawler.page_state import PageStateStore
+from crawler.near_duplicates import NearDuplicateIndex
+from crawler.scheduling import RequestPrioritizer, budget_domain, download_slots
+from crawler.discovery import (DISCOVERY_SOURCES, SOURCE_PRIORITY, needs_fetch, parse_eli_list, parse_feed,
+                               parse_sitemap, sitemaps_from_robots)
+from email.utils import parsedate_to_datetime
 import hashlib
+import json
 
 
 # Add the DocumentChunker class before the UrlSpider class
 class UrlSpider(scrapy.Spider):
     name = "cssf_urls"
     start_urls = ["https://www.cssf.lu/en/"]
+    # Conditional requests answered with 304 still reach parse()
+    handle_httpstatus_list = [304]
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, discovery="sitemap", **kwargs):
         super().__init__(*args, **kwargs)
-        self.rules = URLRules()
-        self.processor = DocumentProcessor(parsers=[EurlexHTMLParser(), CSSFHTMLParser(), PDFParser()])
-        self.seen_hashes = set()
-        # Initialize the DocumentChunker
-        self.chunker = DocumentChunker(max_chunk_size=1800, overlap=200)
+        # "sitemap": pages come from sitemaps, feeds and ELI lists, with lastmod deciding what is fetched;
+        # in-page links are only followed to URLs no listing has (documents, other domains);
+        # "links": walk every link from start_urls (also the fallback when a sitemap fails or is empty)
+        self.discovery = discovery
+        self.discovery_sources = DISCOVERY_SOURCES
+        self.discovery_stats = {"sources": 0, "listed": 0, "scheduled": 0, "fresh": 0, "unlisted_links": 0}
+        self._open_sources = 0
+        # Canonical URL -> (url, newest lastmod) of every listed page, scheduled once all listings are read
+        self.listed = {}
+        self._sitemap_problems = []
+        self._deferred_links = []
+        # Visited URLs and the pending queue live on disk so an interrupted crawl can resume
+        self.frontier = CrawlFrontier("cache/frontier.sqlite")
+        self.rules = URLRules(frontier=self.frontier)
+        self.prioritizer = RequestPrioritizer(self.rules)
+        # Navigation, cookie banners and blocks repeated across a site are cut before partitioning
+        self.boilerplate = BoilerplateCleaner("cache/boilerplate.sqlite", chunk_chars=1800)
+        # unstructured partitioning is CPU-bound, so it runs in a process pool
+        self.processor = DocumentProcessor(
+            parsers=[EurlexHTMLParser(self.boilerplate), CSSFHTMLParser(self.boilerplate), PDFParser(page_window=50)],
+            use_process_pool=True,
+            timeout=300,
+            max_tasks_per_child=50
+        )
+        self.page_state = PageStateStore("cache/page_state.sqlite")
+        # Single-pass chunker, capped at the embedding model's 512-token input window
+        self.chunker = DocumentChunker(max_chunk_size=1800, overlap=200, native=True, max_tokens=512)
 
         # Initialize EmbeddingService with Milvus configuration
         milvus_config = {
             'host': 'localhost',  # Update with your Milvus host
             'port': '19530',  # Update with your Milvus port
             'collection_name': 'cssf_documents',  # Collection name for CSSF documents
-            'connection_args': {"host": "localhost", "port": "19530"}
+            'connection_args': {"host": "localhost", "port": "19530"},
+            'auto_id': False,  # Primary keys are the chunks' doc_id, so recrawls can diff against the store
+            'enable_sparse': True,  # BM25 field for hybrid search on identifiers like "CSSF 22/806"
+            'sparse_stats_path': 'cache/bm25_stats.json',
+            'typed_metadata': True  # Indexed scalar fields for pre-filtered search
         }
 
         # Initialize embedding service (use_remote=True for SageMaker, False for local)
@@ -38,54 +77,295 @@ class UrlSpider(scrapy.Spider):
             use_remote=True,  # Set to False if you want to use local embeddings
             use_tei=True,  # Set to False if using legacy SageMaker handler
             milvus_config=milvus_config,
+            cache_config={'path': 'cache/embeddings.sqlite', 'max_entries': 2_000_000},
             endpoint_name='embedding-endpoint',  # Update with your SageMaker endpoint name
             region_name='eu-west-1'  # Update with your AWS region
         )
 
+        # The same circular text is republished across FAQ pages, PDFs and EUR-Lex mirrors
+        self.near_duplicates = NearDuplicateIndex("cache/near_duplicates.sqlite", threshold=0.9)
+
+        # Parsing, chunking, embedding and storage run off the Scrapy reactor thread
+        self.pipeline = IngestPipeline(
+            processor=self.processor,
+            chunker=self.chunker,
+            embedding_service=self.embedding_service,
+            select_docs=self.select_new_docs,
+            on_stored=self.record_stored,
+            # One parse thread per pool worker keeps every process busy
+            parse_workers=self.processor.max_workers,
+            near_duplicates=self.near_duplicates,
+            # Stop scheduling downloads while the parse backlog is full instead of blocking the reactor
+            on_saturated=self.pause_downloads,
+            on_drained=self.resume_downloads,
+            on_failed=self.on_ingest_failed,
+        )
+
+    def pause_downloads(self):
+        # Called from submit() on the reactor thread
+        self.logger.info(f"Ingest backlog full, pausing downloads: {self.pipeline.stats()}")
+        self.crawler.engine.pause()
+
+    def resume_downloads(self):
+        # Called from a parse worker thread; the engine must only be touched from the reactor
+        from twisted.internet import reactor
+
+        reactor.callFromThread(self.crawler.engine.unpause)
+
     def hash_document(self, doc: Document) -> str:
-        base = doc.page_content + str(doc.metadata.get("source", ""))
+        base = doc.page_content + str(doc.metadata.get("source_url", doc.metadata.get("source", "")))
         return hashlib.sha256(base.encode("utf-8")).hexdigest()
 
+    @staticmethod
+    def publication_date(last_modified):
+        """ISO date from an HTTP Last-Modified header, "" when absent or malformed"""
+        if not last_modified:
+            return ""
+        try:
+            return parsedate_to_datetime(last_modified).date().isoformat()
+        except (TypeError, ValueError):
+            return ""
+
+    def select_new_docs(self, job: IngestJob):
+        """Tag chunks with their doc_id and filter fields, and drop repeats within the page"""
+        domain_type = self.rules.get_domain_type(job.url)
+        published = self.publication_date(job.last_modified)
+
+        new_docs = []
+        seen_hashes = set()
+        for doc in job.docs:
+            doc_id = self.hash_document(doc)
+            if doc_id in seen_hashes:
+                continue
+
+            # Add doc_id to metadata
+            doc.metadata["doc_id"] = doc_id
+            doc.metadata["domain_type"] = domain_type
+            # Dates found in the document itself win over the server's Last-Modified
+            if not doc.metadata.get("publication_date"):
+                doc.metadata["publication_date"] = published
+            seen_hashes.add(doc_id)
+            new_docs.append(doc)
+        return new_docs
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.on_request_dropped, signal=signals.request_dropped)
+        return spider
+
+    def checkpoint(self, urls):
+        """The URLs no longer need fetching on resume"""
+        for url in urls:
+            self.rules.mark_done(url)
+
+    def record_stored(self, job: IngestJob):
+        self.page_state.record_ingest(job.url, job.etag, job.last_modified, job.content_hash, job.milvus_ids)
+        # Only now is the page safe from a crash; until here a resumed crawl fetches it again
+        self.checkpoint(job.redirect_urls + [job.url])
+        if job.stale:
+            self.page_state.invalidate(job.url)
+        # Their only stored copy of some chunks is gone, so those pages must be ingested again
+        for url in job.orphaned_sources:
+            if url != job.url:
+                self.page_state.invalidate(url)
+                self.logger.info(f"Near-duplicate canonical removed, {url} will be re-ingested")
+
+    def on_ingest_failed(self, job: IngestJob):
+        # Like a failed request: don't resume a page that fails deterministically forever
+        self.checkpoint(job.redirect_urls + [job.url])
+
+    def on_request_dropped(self, request, spider):
+        # The dupefilter drops e.g. redirects to an already seen page; nothing will fetch these URLs
+        if spider is self:
+            self.checkpoint(request.meta.get("redirect_urls", []) + [request.url])
+
+    def start_requests(self):
+        if self.frontier.has_pending():
+            self.logger.info(f"Resuming crawl with {self.frontier.stats().get('pending', 0)} pending URLs")
+            # Read page by page as Scrapy pulls start requests, not all at once
+            urls = self.frontier.pending()
+        else:
+            self.frontier.reset()
+            urls = self.start_urls if self.discovery == "links" else []
+
+        for url in urls:
+            yield self.page_request(url)
+
+        # Listings are re-read on resume too; URLs already in the frontier are not scheduled twice
+        if self.discovery == "sitemap":
+            for url in self.discovery_sources["robots"]:
+                yield self.source_request(url, self.parse_robots)
+            for url in self.discovery_sources["sitemaps"]:
+                yield self.source_request(url, self.parse_sitemap)
+            for url in self.discovery_sources["feeds"]:
+                yield self.source_request(url, self.parse_feed)
+            for url in self.discovery_sources["eli_lists"]:
+                yield self.source_request(url, self.parse_eli_list)
+
+    def page_request(self, url):
+        headers = self.page_state.conditional_headers(url)
+        # Last-Modified from the previous crawl dates pages whose URL carries no year
+        priority = self.prioritizer.priority(url, headers.get("If-Modified-Since"))
+        self.rules.mark_visited(url, priority)
+        return scrapy.Request(url, callback=self.parse, errback=self.on_request_error, headers=headers,
+                              priority=priority, meta=self.slot_meta(url))
+
+    def source_request(self, url, callback):
+        self._open_sources += 1
+        self.discovery_stats["sources"] += 1
+        return scrapy.Request(url, callback=callback, errback=self.on_source_error, dont_filter=True,
+                              priority=SOURCE_PRIORITY, meta=self.slot_meta(url))
+
+    @staticmethod
+    def slot_meta(url):
+        # Set before scheduling: DownloaderAwarePriorityQueue keys its per-slot queues on it when queueing
+        return {"download_slot": budget_domain(urlparse(url).hostname or "")}
+
+    def source_done(self):
+        """Once every listing has been read, schedule the listed pages (and the link walk if a sitemap failed)"""
+        self._open_sources -= 1
+        if self._open_sources or self.discovery != "sitemap":
+            return
+        if not self.discovery_stats["listed"]:
+            self._sitemap_problems.append("no URLs listed")
+        fallback = bool(self._sitemap_problems)
+        if fallback:
+            self.logger.warning(f"Sitemap discovery incomplete ({'; '.join(self._sitemap_problems)}), "
+                                f"falling back to link walk")
+            self.discovery = "links"
+
+        yield from self.schedule_listed()
+        if fallback:
+            # Nothing has fetched the start URLs in discovery mode unless a listing had them
+            for url in self.start_urls:
+                if self.rules.should_follow(url):
+                    yield self.page_request(url)
+
+    def on_source_error(self, failure):
+        self.logger.warning(f"Discovery source failed: {failure.request.url}: {failure.value}")
+        if failure.request.callback in (self.parse_robots, self.parse_sitemap):
+            self._sitemap_problems.append(f"{failure.request.url} failed")
+        return list(self.source_done())
+
+    def discovered(self, entries):
+        """Record listed (url, lastmod) pairs; nothing is scheduled until every listing is read"""
+        for url, lastmod in entries:
+            self.discovery_stats["listed"] += 1
+            key = self.rules.canonical(url)
+            known = self.listed.get(key)
+            # Listings disagree at times (a sitemap and a feed); the newest lastmod wins, a missing one never does
+            if known and (lastmod is None or (known[1] is not None and known[1] >= lastmod)):
+                continue
+            self.listed[key] = (url, lastmod)
+
+    def schedule_listed(self):
+        """Requests for listed pages new or modified since we last fetched them; unlisted links of the rest"""
+        fresh_links = []
+        for url, lastmod in self.listed.values():
+            if not self.rules.should_follow(url):
+                continue
+
+            state = self.page_state.get(url)
+            if needs_fetch(state, lastmod):
+                self.discovery_stats["scheduled"] += 1
+                yield self.page_request(url)
+                continue
+
+            self.discovery_stats["fresh"] += 1
+            self.rules.mark_done(url)
+            fresh_links.extend(state["links"])
+
+        # After every listed page is settled, so a link never fetches a listed page its lastmod says is fresh.
+        # Documents of unchanged pages get a conditional request: a PDF replaced under the same URL is picked up
+        deferred, self._deferred_links = self._deferred_links, []
+        yield from self.follow_links(fresh_links + deferred)
+
+    def parse_robots(self, response):
+        sitemaps = sitemaps_from_robots(response.body)
+        if not sitemaps and not self.discovery_sources["sitemaps"]:
+            self._sitemap_problems.append(f"{response.url} lists no sitemap")
+        for url in sitemaps:
+            yield self.source_request(url, self.parse_sitemap)
+        yield from self.source_done()
+
+    def parse_sitemap(self, response):
+        kind, entries = parse_sitemap(response.body)
+        if not entries:
+            self._sitemap_problems.append(f"{response.url} is empty or unreadable")
+        if kind == "sitemapindex":
+            for url, _ in entries:
+                yield self.source_request(url, self.parse_sitemap)
+        else:
+            yield from self.discovered(entries)
+        yield from self.source_done()
+
+    def parse_feed(self, response):
+        yield from self.discovered(parse_feed(response.body, response.url))
+        yield from self.source_done()
+
+    def parse_eli_list(self, response):
+        yield from self.discovered((url, None) for url in parse_eli_list(response.body, response.url))
+        yield from self.source_done()
+
+    def on_request_error(self, failure):
+        # Scrapy has already retried transient errors; don't resume this URL forever
+        self.logger.warning(f"Request failed: {failure.request.url}: {failure.value}")
+        self.checkpoint(failure.request.meta.get("redirect_urls", []) + [failure.request.url])
+
+    def ingest(self, response, state) -> bool:
+        """Queue a page for ingestion unless its body is unchanged since the last crawl; True if queued"""
+        content_hash = hashlib.sha256(response.body).hexdigest()
+        etag = response.headers.get("ETag", b"").decode("utf-8") or None
+        last_modified = response.headers.get("Last-Modified", b"").decode("utf-8") or None
+
+        if state and state["content_hash"] == content_hash:
+            self.page_state.record_validators(response.url, etag, last_modified)
+            self.logger.info(f"Unchanged content, skipping ingest: {response.url}")
+            return False
+
+        job = IngestJob(response.url, response)
+        job.etag = etag
+        job.last_modified = last_modified
+        job.content_hash = content_hash
+        job.redirect_urls = response.meta.get("redirect_urls", [])
+
+        # Hand the page to the ingest pipeline; never blocks, downloads pause while its backlog is full
+        self.pipeline.submit(job)
+        return True
+
+    def follow_links(self, links):
+        if self.discovery == "sitemap" and self._open_sources:
+            # Pages resumed from the frontier are parsed while listings are still being read
+            self._deferred_links.extend(links)
+            return
+        for full_url in links:
+            # full_url = canonicalize_url(full_url, keep_fragments=False)
+            # In discovery mode listed pages are scheduled from their lastmod, never through a link
+            if self.discovery == "sitemap" and self.rules.canonical(full_url) in self.listed:
+                continue
+            if self.rules.should_follow(full_url):
+                if self.discovery == "sitemap":
+                    self.discovery_stats["unlisted_links"] += 1
+                self.logger.info(f"Following primary: {full_url}")
+                yield self.page_request(full_url)
+
     def parse(self, response):
-        parsed_url = urlparse(response.url)
-        domain = parsed_url.netloc
-
-        if not self.rules.is_nested_only(response.url):
-            elements = self.processor.process(response)
-
-            # Use the DocumentChunker instead of manual chunking
-            chunked_docs = self.chunker.chunk_document(elements, response.url)
-
-            # Deduplication and Storage using EmbeddingService
-            new_docs = []
-            texts_to_store = []
-            metadatas_to_store = []
-
-            for doc in chunked_docs:
-                doc_id = self.hash_document(doc)
-                if doc_id in self.seen_hashes:
-                    continue
-
-                # Add doc_id to metadata
-                doc.metadata["doc_id"] = doc_id
-                self.seen_hashes.add(doc_id)
-                new_docs.append(doc)
-
-                # Prepare for batch storage
-                texts_to_store.append(doc.page_content)
-                metadatas_to_store.append(doc.metadata)
-
-            # Store documents using EmbeddingService (batch operation)
-            if new_docs:
-                try:
-                    result = self.embedding_service.add_texts_to_store(
-                        texts=texts_to_store,
-                        metadatas=metadatas_to_store
-                    )
-                    self.logger.info(f"Stored {result['count']} new documents from {response.url}")
-                    self.logger.debug(f"Milvus IDs: {result['milvus_ids']}")
-                except Exception as e:
-                    self.logger.error(f"Failed to store documents from {response.url}: {str(e)}")
+        # The URL and the ones redirecting to it are checkpointed once nothing is left to ingest
+        fetched_urls = response.meta.get("redirect_urls", []) + [response.url]
+        state = self.page_state.get(response.url)
+
+        if response.status == 304:
+            # Nothing to re-ingest; expand the links recorded on the previous crawl
+            self.logger.info(f"Not modified: {response.url}")
+            self.checkpoint(fetched_urls)
+            self.page_state.touch(response.url)
+            yield from self.follow_links(state["links"] if state else [])
+            return
+
+        # Queued pages are checkpointed by record_stored / on_ingest_failed
+        if self.rules.is_nested_only(response.url) or not self.ingest(response, state):
+            self.checkpoint(fetched_urls)
 
         if not self.rules.is_primary_domain(response.url):
             self.logger.info(f"No Primary URL: {response.url}")
@@ -95,30 +375,69 @@ class UrlSpider(scrapy.Spider):
         if not content_type.startswith("text/html"):
             return
 
+        links = []
         for href in response.css("a::attr(href)").getall():
             if not href:
                 continue
             href = href.strip()
-            full_url = urljoin(response.url, href)
-            # full_url = canonicalize_url(full_url, keep_fragments=False)
-            if self.rules.should_follow(full_url):
-                self.rules.mark_visited(full_url)
-                self.logger.info(f"Following primary: {full_url}")
-                yield response.follow(full_url, callback=self.parse)
+            links.append(urljoin(response.url, href))
+
+        self.page_state.record_links(response.url, links)
+        yield from self.follow_links(links)
+
+    def record_crawl_stats(self, path="cache/crawl_stats.json"):
+        """Requests and bytes this crawl cost, next to the discovery counters (see test/compare_discovery.py)"""
+        stats = self.crawler.stats
+        record = {
+            "discovery": self.discovery,
+            "requests": stats.get_value("downloader/request_count", 0),
+            "response_bytes": stats.get_value("downloader/response_bytes", 0),
+            "not_modified": stats.get_value("downloader/response_status_count/304", 0),
+            **self.discovery_stats,
+        }
+        with open(path, "w", encoding="utf-8") as stats_file:
+            json.dump(record, stats_file, indent=2)
+        self.logger.info(f"Crawl cost: {record['requests']} requests, {record['response_bytes']} response bytes")
+
+    def closed(self, reason):
+        # Let in-flight pages finish embedding and storage before the process exits
+        self.pipeline.close()
+        self.processor.close()
+        self.page_state.close()
+        self.logger.info(f"Near-duplicates: {self.near_duplicates.stats()}")
+        self.near_duplicates.close()
+        self.logger.info(f"Boilerplate savings: {self.boilerplate.report()}")
+        self.boilerplate.close()
+        self.logger.info(f"Discovery ({self.discovery}): {self.discovery_stats}")
+        self.record_crawl_stats()
+        self.logger.info(f"Frontier: {self.frontier.stats()}")
+        self.frontier.close()
+
+        stats = self.embedding_service.cache_stats()
+        if stats:
+            self.logger.info(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+                             f"({stats['hit_rate']:.1%} hit rate, {stats['size']} entries)")
+        self.embedding_service.close()
 
 
 # === Run the spider ===
-def run_spider(output_file="urls_raw.json"):
+def run_spider(output_file="urls_raw.json", discovery="sitemap"):
     process = CrawlerProcess(settings={
         "ROBOTSTXT_OBEY": True,
-        "CONCURRENT_REQUESTS": 8,
+        # Global ceiling; per-domain concurrency and delay come from crawler.scheduling.DOMAIN_BUDGETS
+        "CONCURRENT_REQUESTS": 16,
         "DOWNLOAD_DELAY": 0.3,
+        "DOWNLOAD_SLOTS": download_slots(),
+        "DOWNLOADER_MIDDLEWARES": {"crawler.scheduling.AdaptiveThrottleMiddleware": 560},
+        # Feeds the least busy domain next so a slow EUR-Lex budget never stalls cssf.lu;
+        # request priorities order the URLs within each domain
+        "SCHEDULER_PRIORITY_QUEUE": "scrapy.pqueues.DownloaderAwarePriorityQueue",
         "USER_AGENT": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115 Safari/537.36",
         "LOG_LEVEL": "INFO",
         "CLOSESPIDER_ITEMCOUNT": 0,
         # "CLOSESPIDER_PAGECOUNT": 50,
     })
-    process.crawl(UrlSpider)
+    process.crawl(UrlSpider, discovery=discovery)
     process.start()
 
 if __name__ == "__main__":
@@ -0,0 +1,139 @@
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin
+import gzip
+import logging
+import re
+
+from lxml import etree, html as lxml_html
+
+logger = logging.getLogger(__name__)
+
+# Where discovery mode looks for URLs; robots.txt lists the sitemaps
+DISCOVERY_SOURCES = {
+    "robots": ["https://www.cssf.lu/robots.txt"],
+    "sitemaps": [],
+    "feeds": ["https://www.cssf.lu/en/feed/"],
+    # Pages or XML lists of ELI links, e.g. an EUR-Lex or Legilux ELI listing for a year or act type
+    "eli_lists": [],
+}
+
+# Listings are read before any page request (page priorities stay below 4000)
+SOURCE_PRIORITY = 10_000
+
+_ELI = re.compile(r"/eli/", re.IGNORECASE)
+# No network access or entity expansion while parsing third-party XML
+_XML_PARSER = etree.XMLParser(resolve_entities=False, no_network=True, recover=True, remove_comments=True,
+                              huge_tree=True)
+
+
+def _local(tag) -> str:
+    return etree.QName(tag).localname if isinstance(tag, str) else ""
+
+
+def _xml_root(body: bytes):
+    if body[:2] == b"\x1f\x8b":
+        body = gzip.decompress(body)
+    try:
+        return etree.fromstring(body, parser=_XML_PARSER)
+    except etree.XMLSyntaxError:
+        return None
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """Unix time of a W3C datetime (sitemaps, Atom) or RFC 822 date (RSS), None when unparseable"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def sitemaps_from_robots(body: bytes) -> List[str]:
+    return [
+        line.split(":", 1)[1].strip()
+        for line in body.decode("utf-8", errors="ignore").splitlines()
+        if line.lower().startswith("sitemap:")
+    ]
+
+
+def parse_sitemap(body: bytes) -> Tuple[str, List[Tuple[str, Optional[float]]]]:
+    """("sitemapindex" | "urlset", [(loc, lastmod)]) of a sitemap, plain or gzipped"""
+    root = _xml_root(body)
+    if root is None:
+        return "", []
+
+    entries = []
+    for entry in root:
+        fields = {_local(child.tag): (child.text or "").strip() for child in entry}
+        if fields.get("loc"):
+            entries.append((fields["loc"], parse_timestamp(fields.get("lastmod"))))
+    return _local(root.tag), entries
+
+
+def parse_feed(body: bytes, base_url: str = "") -> List[Tuple[str, Optional[float]]]:
+    """[(link, updated)] of an RSS 2.0 or Atom feed"""
+    root = _xml_root(body)
+    if root is None:
+        return []
+
+    entries = []
+    for item in root.iter():
+        kind = _local(item.tag)
+        if kind not in ("item", "entry"):
+            continue
+        link, updated = None, None
+        for child in item:
+            name = _local(child.tag)
+            if name == "link":
+                # Atom links carry the URL in href; prefer rel="alternate" (the default)
+                href = child.get("href")
+                if href is not None:
+                    if child.get("rel", "alternate") == "alternate" or link is None:
+                        link = href
+                elif child.text:
+                    link = child.text.strip()
+            elif name in ("updated", "pubDate", "modified", "published", "date") and updated is None:
+                updated = parse_timestamp(child.text)
+        if link:
+            entries.append((urljoin(base_url, link), updated))
+    return entries
+
+
+def parse_eli_list(body: bytes, base_url: str) -> List[str]:
+    """ELI links of an HTML listing or an XML/RDF document"""
+    if not body.strip():
+        return []
+
+    if b"<html" in body[:2048].lower():
+        hrefs = lxml_html.fromstring(body).xpath("//a/@href")
+        return sorted({urljoin(base_url, href.strip()) for href in hrefs if _ELI.search(href)})
+
+    root = _xml_root(body)
+    if root is None:
+        return []
+    links = set()
+    for element in root.iter():
+        for value in [element.text or ""] + list(element.attrib.values()):
+            value = value.strip()
+            if value.startswith("http") and _ELI.search(value):
+                links.add(value)
+    return sorted(links)
+
+
+def needs_fetch(state: Optional[Dict], lastmod: Optional[float]) -> bool:
+    """Whether a listed URL must be requested: unknown, never ingested, or modified since we fetched it"""
+    if not state or not state["content_hash"] or not state["fetched_at"]:
+        return True
+    # Without lastmod a conditional request is the only way to tell
+    return lastmod is None or lastmod > state["fetched_at"]
+
@@ -0,0 +1,279 @@
+from typing import Callable, Dict, List, Optional
+import itertools
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def _consume(elements: List):
+    """Iterate a list while dropping each item from it, so consumed elements can be freed"""
+    elements.reverse()
+    while elements:
+        yield elements.pop()
+
+
+class IngestJob:
+    """State of one crawled page as it moves through the pipeline"""
+
+    def __init__(self, url: str, response=None):
+        self.url = url
+        self.response = response
+        self.elements = []
+        self.docs = []
+        self.embeddings = None
+        self.milvus_ids = []
+        # doc_id -> canonical doc_id of chunks skipped as near-duplicates
+        self.duplicates = {}
+        # Rows of NearDuplicateIndex.check() committed once the page is stored
+        self.near_duplicate_rows = []
+        # Set when the page was stored without chunks it needs; it is fetched again on the next crawl
+        self.stale = False
+        # Pages whose chunks were skipped as duplicates of a chunk this job deleted
+        self.orphaned_sources = []
+        # URLs that redirected to this page, checkpointed together with it
+        self.redirect_urls = []
+        # HTTP validators and body hash recorded once the page is stored
+        self.etag = None
+        self.last_modified = None
+        self.content_hash = None
+
+
+class PipelineStage:
+    """A queue (bounded unless queue_size is 0) drained by a pool of worker threads
+
+    With batch_size > 1 the handler receives a list of the jobs already queued (up to batch_size)
+    and returns the list of jobs to pass on.
+    """
+
+    def __init__(self, name: str, handler: Callable, workers: int = 1, queue_size: int = 16, batch_size: int = 1):
+        self.name = name
+        self.handler = handler
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.downstream: Optional["PipelineStage"] = None
+        # Called with each job a handler failed on
+        self.on_failed: Optional[Callable[[IngestJob], None]] = None
+        self.processed = 0
+        self.failed = 0
+        self._stats_lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"ingest-{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def put(self, job: IngestJob):
+        # Blocks while the stage is saturated, which propagates backpressure upstream
+        self.queue.put(job)
+
+    def put_nowait(self, job: IngestJob):
+        self.queue.put_nowait(job)
+
+    def _take(self) -> List:
+        """Block for one job, then take whatever else is already queued, up to batch_size"""
+        jobs = [self.queue.get()]
+        while len(jobs) < self.batch_size and jobs[-1] is not _STOP:
+            try:
+                jobs.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return jobs
+
+    def _run(self):
+        while True:
+            jobs = self._take()
+            stop = jobs[-1] is _STOP
+            if stop:
+                jobs.pop()
+            try:
+                if jobs:
+                    self._handle(jobs)
+            finally:
+                for _ in range(len(jobs) + stop):
+                    self.queue.task_done()
+            if stop:
+                return
+
+    def _handle(self, jobs: List[IngestJob]):
+        try:
+            results = self.handler(jobs) if self.batch_size > 1 else [self.handler(jobs[0])]
+            with self._stats_lock:
+                self.processed += len(jobs)
+            for result in results:
+                if result is not None and self.downstream is not None:
+                    self.downstream.put(result)
+        except Exception as e:
+            with self._stats_lock:
+                self.failed += len(jobs)
+            logger.error(f"Ingest stage '{self.name}' failed for {', '.join(job.url for job in jobs)}: {e}")
+            if self.on_failed:
+                for job in jobs:
+                    try:
+                        self.on_failed(job)
+                    except Exception as callback_error:
+                        logger.error(f"on_failed callback failed for {job.url}: {callback_error}")
+
+    def stop(self):
+        """Wait for queued jobs to finish, then shut the workers down"""
+        self.queue.join()
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+
+class IngestPipeline:
+    """Staged crawl ingest: parse -> chunk -> embed -> store, each stage with its own workers"""
+
+    def __init__(self, processor, chunker, embedding_service,
+                 select_docs: Optional[Callable[[IngestJob], List]] = None,
+                 on_stored: Optional[Callable[[IngestJob], None]] = None,
+                 parse_workers: int = 4, chunk_workers: int = 2, embed_workers: int = 2, store_workers: int = 1,
+                 queue_size: int = 16, embed_batch_pages: int = 8, near_duplicates=None,
+                 on_saturated: Optional[Callable[[], None]] = None, on_drained: Optional[Callable[[], None]] = None,
+                 on_failed: Optional[Callable[[IngestJob], None]] = None):
+        self.processor = processor
+        self.chunker = chunker
+        self.embedding_service = embedding_service
+        self.select_docs = select_docs
+        self.on_stored = on_stored
+        # NearDuplicateIndex consulted between chunking and embedding
+        self.near_duplicates = near_duplicates
+        # submit() never blocks its caller (the Scrapy reactor thread); instead on_saturated fires once
+        # queue_size pages wait for parsing and on_drained once the backlog is down to half of that
+        self.on_saturated = on_saturated
+        self.on_drained = on_drained
+        self.high_water = queue_size
+        self.low_water = queue_size // 2
+        self._saturated = False
+        self._saturation_lock = threading.Lock()
+
+        self.stages = [
+            # Unbounded, so the hand-off never blocks; the water marks above keep it short
+            PipelineStage("parse", self._parse, parse_workers, queue_size=0),
+            PipelineStage("chunk", self._chunk, chunk_workers, queue_size),
+            # Small pages are embedded together so endpoint batches stay full
+            PipelineStage("embed", self._embed, embed_workers, queue_size, batch_size=embed_batch_pages),
+            PipelineStage("store", self._store, store_workers, queue_size),
+        ]
+        for upstream, downstream in zip(self.stages, self.stages[1:]):
+            upstream.downstream = downstream
+        for stage in self.stages:
+            stage.on_failed = on_failed
+
+        self._closed = False
+        for stage in self.stages:
+            stage.start()
+
+    def submit(self, job: IngestJob):
+        """Queue a page without blocking; signals on_saturated when the parse backlog reaches high_water"""
+        if self._closed:
+            raise Exception("Ingest pipeline is closed")
+        self.stages[0].put_nowait(job)
+        with self._saturation_lock:
+            saturated = not self._saturated and self.stages[0].queue.qsize() >= self.high_water
+            if saturated:
+                self._saturated = True
+        if saturated and self.on_saturated:
+            self.on_saturated()
+
+    def _check_drained(self):
+        with self._saturation_lock:
+            drained = self._saturated and self.stages[0].queue.qsize() <= self.low_water
+            if drained:
+                self._saturated = False
+        if drained and self.on_drained:
+            self.on_drained()
+
+    def _parse(self, job: IngestJob) -> Optional[IngestJob]:
+        self._check_drained()
+        if self.processor.is_windowed(job.response):
+            # Long PDFs are chunked as each page window is parsed, so only one window's elements are alive
+            windows = self.processor.iter_windows(job.response)
+            job.docs = list(self.chunker.iter_chunks(itertools.chain.from_iterable(windows), job.url))
+        else:
+            job.elements = self.processor.process(job.response)
+        # The raw response is no longer needed downstream
+        job.response = None
+        # Pages without content still travel to the store stage so their old chunks get removed
+        return job
+
+    def _chunk(self, job: IngestJob) -> IngestJob:
+        if job.elements:
+            # Sections are chunked as they close and their elements released as they are consumed
+            elements, job.elements = job.elements, []
+            job.docs = list(self.chunker.iter_chunks(_consume(elements), job.url))
+        if self.select_docs and job.docs:
+            job.docs = self.select_docs(job)
+        if self.near_duplicates is not None and job.docs:
+            job.docs = self._drop_near_duplicates(job)
+        return job
+
+    def _drop_near_duplicates(self, job: IngestJob) -> List:
+        """Skip chunks that nearly repeat one already stored, e.g. a circular mirrored on EUR-Lex"""
+        # Nothing is indexed yet: a canonical only counts once its page is stored (see _store)
+        duplicates, job.near_duplicate_rows = self.near_duplicates.check(
+            (doc.metadata["doc_id"], job.url, doc.page_content) for doc in job.docs
+        )
+        job.duplicates = {chunk_id: canonical_id for chunk_id, (canonical_id, _) in duplicates.items()}
+        if not job.duplicates:
+            return job.docs
+
+        logger.info(f"Skipping {len(job.duplicates)} near-duplicate chunks of {job.url}")
+        return [doc for doc in job.docs if doc.metadata["doc_id"] not in job.duplicates]
+
+    def _embed(self, jobs: List[IngestJob]) -> List[IngestJob]:
+        """Embed the chunks of every queued page in one call, then hand each page its rows"""
+        texts = [doc.page_content for job in jobs for doc in job.docs]
+        if texts:
+            embeddings = self.embedding_service.embed_texts(texts)
+            offset = 0
+            for job in jobs:
+                if job.docs:
+                    job.embeddings = embeddings[offset:offset + len(job.docs)]
+                    offset += len(job.docs)
+        return jobs
+
+    def _store(self, job: IngestJob) -> None:
+        # Only chunks that changed since the last crawl are inserted or deleted
+        result = self.embedding_service.replace_source_in_store(job.url, job.docs, job.embeddings)
+        job.milvus_ids = result["milvus_ids"]
+        if self.near_duplicates is not None and result["deleted"]:
+            # Deleted primary keys are doc_ids (auto_id off)
+            job.orphaned_sources = self.near_duplicates.remove([str(pk) for pk in result["deleted"]])
+        if self.near_duplicates is not None and job.near_duplicate_rows:
+            lost = self.near_duplicates.commit(job.near_duplicate_rows)
+            job.near_duplicate_rows = []
+            if lost:
+                logger.warning(f"Canonicals of {len(lost)} skipped chunks of {job.url} were removed meanwhile, "
+                               f"it will be re-ingested")
+                job.stale = True
+        if result["inserted"] or result["deleted"]:
+            logger.info(f"Stored {len(result['inserted'])} new and deleted {len(result['deleted'])} stale "
+                        f"documents from {job.url}")
+
+        if self.on_stored:
+            self.on_stored(job)
+        return None
+
+    def stats(self) -> Dict:
+        return {
+            stage.name: {"processed": stage.processed, "failed": stage.failed, "queued": stage.queue.qsize()}
+            for stage in self.stages
+        }
+
+    def close(self):
+        """Drain every stage in order and stop the workers"""
+        if self._closed:
+            return
+        self._closed = True
+        for stage in self.stages:
+            stage.stop()
+        logger.info(f"Ingest pipeline drained: {self.stats()}")
@@ -0,0 +1,249 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def shingles(text: str, size: int = 5) -> List[str]:
+    """Word n-grams over lower-cased alphanumerics, so whitespace and punctuation edits don't matter"""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """(bands, rows) whose LSH S-curve midpoint (1/b)^(1/r) sits closest below the threshold"""
+    candidates = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    below = [(b, r) for b, r in candidates if (1 / b) ** (1 / r) <= threshold]
+    return max(below or candidates[:1], key=lambda band: (1 / band[0]) ** (1 / band[1]))
+
+
+class MinHasher:
+    """MinHash signatures with fixed permutations, so signatures stay comparable across runs"""
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.array([zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text, self.shingle_size)],
+                          dtype=np.uint64)
+        if not len(hashes):
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        # uint64 products wrap around like the reference implementation; only the low 32 bits are kept
+        with np.errstate(over="ignore"):
+            permuted = (np.outer(hashes, self.a) + self.b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """Persistent MinHash LSH index mapping near-duplicate chunks to the first (canonical) copy stored
+
+    Chunks are matched with check() before they are embedded and only indexed with commit() after
+    they are stored, so a canonical is never a chunk that failed to reach the store.
+    """
+
+    def __init__(self, path: str = "near_duplicates.sqlite", threshold: float = 0.9, num_perm: int = 128,
+                 shingle_size: int = 5):
+        self.path = path
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size)
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS signatures (
+                chunk_id TEXT PRIMARY KEY,
+                source_url TEXT NOT NULL,
+                signature BLOB NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                chunk_id TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_buckets_band_bucket ON buckets(band, bucket)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_buckets_chunk ON buckets(chunk_id)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS duplicates (
+                chunk_id TEXT PRIMARY KEY,
+                canonical_id TEXT NOT NULL,
+                source_url TEXT NOT NULL,
+                similarity REAL NOT NULL,
+                detected_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_duplicates_canonical ON duplicates(canonical_id)")
+        self._conn.commit()
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        keys = []
+        for band in range(self.bands):
+            digest = hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8)
+            keys.append(int.from_bytes(digest.digest(), "little", signed=True))
+        return keys
+
+    def _best_match(self, signature: np.ndarray) -> Optional[Tuple[str, float]]:
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            rows = self._conn.execute(
+                "SELECT chunk_id FROM buckets WHERE band = ? AND bucket = ?", (band, key)
+            ).fetchall()
+            candidates.update(chunk_id for (chunk_id,) in rows)
+
+        best = None
+        for chunk_id in candidates:
+            row = self._conn.execute("SELECT signature FROM signatures WHERE chunk_id = ?", (chunk_id,)).fetchone()
+            # Share of equal MinHash values estimates the Jaccard similarity of the shingle sets
+            similarity = float(np.mean(np.frombuffer(row[0], dtype=np.uint32) == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (chunk_id, similarity)
+        return best
+
+    def check(self, chunks: Iterable[Tuple[str, str, str]]) -> Tuple[Dict[str, Tuple[str, float]], List[Tuple]]:
+        """Match (chunk_id, source_url, text) triples against the index without adding them
+
+        Returns {chunk_id: (canonical_id, similarity)} for duplicates and the rows to pass to commit()
+        once the chunks are stored. Chunks already indexed as canonical stay canonical, so re-ingesting
+        a page never flags itself.
+        """
+        duplicates = {}
+        pending = []
+        # Canonicals of this batch, matched like indexed ones but only committed with it
+        batch = []
+        with self._lock:
+            for chunk_id, source_url, text in chunks:
+                known = self._conn.execute(
+                    "SELECT canonical_id, similarity FROM duplicates WHERE chunk_id = ?", (chunk_id,)
+                ).fetchone()
+                if known:
+                    duplicates[chunk_id] = (known[0], known[1])
+                    continue
+                if self._conn.execute("SELECT 1 FROM signatures WHERE chunk_id = ?", (chunk_id,)).fetchone():
+                    continue
+
+                signature = self.hasher.signature(text)
+                match = self._best_match(signature)
+                for batch_id, batch_signature in batch:
+                    similarity = float(np.mean(batch_signature == signature))
+                    if similarity >= self.threshold and (match is None or similarity > match[1]):
+                        match = (batch_id, similarity)
+                if match:
+                    duplicates[chunk_id] = match
+                    pending.append((chunk_id, source_url, signature, match[0], match[1]))
+                else:
+                    batch.append((chunk_id, signature))
+                    pending.append((chunk_id, source_url, signature, None, None))
+        return duplicates, pending
+
+    def commit(self, pending: List[Tuple]) -> List[str]:
+        """Index chunks returned by check() once they are stored
+
+        Returns the chunk_ids of duplicates whose canonical was removed in the meantime, which leaves
+        them without a stored copy.
+        """
+        lost = []
+        with self._lock:
+            for chunk_id, source_url, signature, canonical_id, similarity in pending:
+                if canonical_id is None:
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO signatures (chunk_id, source_url, signature) VALUES (?, ?, ?)",
+                        (chunk_id, source_url, signature.tobytes())
+                    )
+                    self._conn.execute("DELETE FROM buckets WHERE chunk_id = ?", (chunk_id,))
+                    self._conn.executemany(
+                        "INSERT INTO buckets (band, bucket, chunk_id) VALUES (?, ?, ?)",
+                        [(band, key, chunk_id) for band, key in enumerate(self._band_keys(signature))]
+                    )
+            # After the canonicals, so duplicates of a chunk committed in this batch find it
+            for chunk_id, source_url, signature, canonical_id, similarity in pending:
+                if canonical_id is None:
+                    continue
+                if not self._conn.execute("SELECT 1 FROM signatures WHERE chunk_id = ?", (canonical_id,)).fetchone():
+                    lost.append(chunk_id)
+                    continue
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO duplicates (chunk_id, canonical_id, source_url, similarity, detected_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (chunk_id, canonical_id, source_url, similarity, time.time())
+                )
+            self._conn.commit()
+        return lost
+
+    def check_and_add(self, chunks: Iterable[Tuple[str, str, str]]) -> Dict[str, Tuple[str, float]]:
+        """check() and commit() in one step, for chunks that are already stored"""
+        duplicates, pending = self.check(chunks)
+        self.commit(pending)
+        return duplicates
+
+    def remove(self, chunk_ids: List[str]) -> List[str]:
+        """Forget chunks deleted from the store; returns source URLs of duplicates left without a stored copy"""
+        if not chunk_ids:
+            return []
+
+        orphaned = set()
+        with self._lock:
+            for chunk_id in chunk_ids:
+                rows = self._conn.execute(
+                    "SELECT source_url FROM duplicates WHERE canonical_id = ?", (chunk_id,)
+                ).fetchall()
+                orphaned.update(source_url for (source_url,) in rows)
+                self._conn.execute("DELETE FROM duplicates WHERE canonical_id = ? OR chunk_id = ?",
+                                   (chunk_id, chunk_id))
+                self._conn.execute("DELETE FROM buckets WHERE chunk_id = ?", (chunk_id,))
+                self._conn.execute("DELETE FROM signatures WHERE chunk_id = ?", (chunk_id,))
+            self._conn.commit()
+        return sorted(orphaned)
+
+    def canonical_of(self, chunk_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT canonical_id FROM duplicates WHERE chunk_id = ?", (chunk_id,)).fetchone()
+        return row[0] if row else None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            canonical = self._conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+            duplicates = self._conn.execute("SELECT COUNT(*) FROM duplicates").fetchone()[0]
+        return {
+            "canonical": canonical,
+            "duplicates": duplicates,
+            "threshold": self.threshold,
+            "bands": self.bands,
+            "rows": self.rows
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,127 @@
+from typing import Dict, List, Optional
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class PageStateStore:
+    """Persistent per-URL crawl state used to make recrawls incremental"""
+
+    def __init__(self, path: str = "page_state.sqlite"):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                milvus_ids TEXT NOT NULL DEFAULT '[]',
+                links TEXT NOT NULL DEFAULT '[]',
+                fetched_at REAL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, content_hash, milvus_ids, links, fetched_at FROM pages WHERE url = ?",
+                (url,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        etag, last_modified, content_hash, milvus_ids, links, fetched_at = row
+        return {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_hash": content_hash,
+            "milvus_ids": json.loads(milvus_ids),
+            "links": json.loads(links),
+            "fetched_at": fetched_at
+        }
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since headers for a page we have already ingested"""
+        state = self.get(url)
+        if not state or not state["content_hash"]:
+            return {}
+
+        headers = {}
+        if state["etag"]:
+            headers["If-None-Match"] = state["etag"]
+        if state["last_modified"]:
+            headers["If-Modified-Since"] = state["last_modified"]
+        return headers
+
+    def record_links(self, url: str, links: List[str]):
+        """Remember outgoing links so a 304 response can still be expanded"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO pages (url, links) VALUES (?, ?) ON CONFLICT(url) DO UPDATE SET links = excluded.links",
+                (url, json.dumps(links))
+            )
+            self._conn.commit()
+
+    def record_validators(self, url: str, etag: Optional[str], last_modified: Optional[str]):
+        """Refresh HTTP validators of an unchanged page"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET etag = ?, last_modified = ?, fetched_at = ? WHERE url = ?",
+                (etag, last_modified, time.time(), url)
+            )
+            self._conn.commit()
+
+    def record_ingest(self, url: str, etag: Optional[str], last_modified: Optional[str],
+                      content_hash: str, milvus_ids: List):
+        """Record a page whose chunks have been (re)stored"""
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO pages (url, etag, last_modified, content_hash, milvus_ids, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    content_hash = excluded.content_hash,
+                    milvus_ids = excluded.milvus_ids,
+                    fetched_at = excluded.fetched_at
+                """,
+                (url, etag, last_modified, content_hash, json.dumps(milvus_ids), time.time())
+            )
+            self._conn.commit()
+
+    def touch(self, url: str):
+        """Mark a page as confirmed current, e.g. after a 304"""
+        with self._lock:
+            self._conn.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+    def invalidate(self, url: str):
+        """Forget a page's validators and content hash so the next crawl re-ingests it"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET etag = NULL, last_modified = NULL, content_hash = NULL WHERE url = ?", (url,)
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
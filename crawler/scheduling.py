@@ -0,0 +1,229 @@
+from typing import Dict, Optional
+from collections import deque
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# Starting and limit values per registrable domain; subdomains share their parent's budget
+DOMAIN_BUDGETS = {
+    "cssf.lu": {"concurrency": 4, "max_concurrency": 8, "delay": 0.25, "max_delay": 10.0},
+    "eur-lex.europa.eu": {"concurrency": 2, "max_concurrency": 3, "delay": 1.0, "max_delay": 60.0},
+    "data.europa.eu": {"concurrency": 2, "max_concurrency": 4, "delay": 0.5, "max_delay": 30.0},
+    "data.legilux.public.lu": {"concurrency": 2, "max_concurrency": 4, "delay": 0.5, "max_delay": 30.0},
+}
+DEFAULT_BUDGET = {"concurrency": 1, "max_concurrency": 2, "delay": 1.0, "max_delay": 30.0}
+
+THROTTLE_STATUSES = (429, 503)
+
+# Publication year hints in URLs: CSSF news and uploads, CELEX numbers, ELI paths, circular numbers
+_YEAR_PATTERNS = [
+    (re.compile(r"/((?:19|20)\d{2})/\d{2}/"), lambda year: int(year)),
+    (re.compile(r"celex(?::|%3a)\d((?:19|20)\d{2})", re.IGNORECASE), lambda year: int(year)),
+    (re.compile(r"/eli/(?:[a-z_]+/)+((?:19|20)\d{2})/", re.IGNORECASE), lambda year: int(year)),
+    (re.compile(r"cssf[_-]?(\d{2})[_-]\d+", re.IGNORECASE), lambda year: 2000 + int(year)),
+]
+_CIRCULAR = re.compile(r"circular|cssf[_-]?\d{2}[_-]\d+|/document/", re.IGNORECASE)
+_NEWS = re.compile(r"/(?:news|press-release|events?)/|/en/\d{4}/\d{2}/[^/]+/?$", re.IGNORECASE)
+
+
+def budget_domain(host: str, budgets: Dict = None) -> str:
+    """The budgets key covering host, else host itself"""
+    budgets = DOMAIN_BUDGETS if budgets is None else budgets
+    labels = host.lower().split(".")
+    for i in range(len(labels)):
+        domain = ".".join(labels[i:])
+        if domain in budgets:
+            return domain
+    return host.lower()
+
+
+def publication_year(url: str, last_modified: Optional[str] = None) -> Optional[int]:
+    """Year from the URL, else from a Last-Modified header seen on a previous crawl"""
+    for pattern, to_year in _YEAR_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            return to_year(match.group(1))
+    if last_modified:
+        try:
+            return parsedate_to_datetime(last_modified).year
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+class RequestPrioritizer:
+    """Scrapy request priority: primary domain first, then circular PDFs before news, then newest first"""
+
+    def __init__(self, rules, oldest_year: int = 1990):
+        self.rules = rules
+        self.oldest_year = oldest_year
+
+    def kind(self, url: str) -> int:
+        path = url.lower().split("?")[0]
+        if _CIRCULAR.search(url):
+            return 3 if path.endswith(".pdf") else 2
+        if _NEWS.search(url):
+            return 0
+        return 1
+
+    def priority(self, url: str, last_modified: Optional[str] = None) -> int:
+        tier = {"primary": 2, "secondary": 1}.get(self.rules.get_domain_type(url), 0)
+        year = publication_year(url, last_modified)
+        recency = min(max(year - self.oldest_year, 0), 99) if year else 0
+        return tier * 1000 + self.kind(url) * 100 + recency
+
+
+class DomainBudget:
+    """Delay and concurrency for one domain, adapted from response latency and throttling responses
+
+    Follows AutoThrottle's latency / concurrency target while responses are healthy, backs off
+    multiplicatively (and drops a concurrency slot) when the 429/503 rate over the recent window is
+    above max_error_rate, and only grows concurrency again after a full clean window.
+    """
+
+    def __init__(self, concurrency: int = 1, max_concurrency: int = 2, delay: float = 1.0,
+                 max_delay: float = 30.0, window: int = 50, max_error_rate: float = 0.02):
+        self.min_delay = delay
+        self.max_delay = max_delay
+        self.max_concurrency = max_concurrency
+        self.window = window
+        self.max_error_rate = max_error_rate
+        self.concurrency = concurrency
+        self.delay = delay
+        self.latency = None
+        self.blocked_until = 0.0
+        self._statuses = deque(maxlen=window)
+        self._since_change = 0
+        self.responses = 0
+        self.throttled = 0
+
+    def error_rate(self) -> float:
+        return sum(self._statuses) / len(self._statuses) if self._statuses else 0.0
+
+    def observe(self, status: int, latency: Optional[float], retry_after: Optional[float] = None):
+        self.responses += 1
+        self._since_change += 1
+        throttled = status in THROTTLE_STATUSES
+        self._statuses.append(1 if throttled else 0)
+
+        if throttled:
+            self.throttled += 1
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.time() + retry_after)
+            if self.error_rate() > self.max_error_rate or retry_after:
+                self.delay = min(max(self.delay * 2, retry_after or 0), self.max_delay)
+                self.concurrency = max(1, self.concurrency - 1)
+                self._since_change = 0
+            return
+
+        if latency is not None and status < 500:
+            # Error pages come back fast and would pull the delay down
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            target = min(max(self.latency / self.concurrency, self.min_delay), self.max_delay)
+            # Ease towards the target instead of jumping, like AutoThrottle
+            self.delay = max((self.delay + target) / 2, self.min_delay)
+
+        if (self._since_change >= self.window and self.error_rate() == 0
+                and self.concurrency < self.max_concurrency):
+            self.concurrency += 1
+            self._since_change = 0
+
+    def stats(self) -> Dict:
+        return {
+            "concurrency": self.concurrency,
+            "delay": round(self.delay, 3),
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+            "responses": self.responses,
+            "throttled": self.throttled,
+            "error_rate": round(self.error_rate(), 3),
+        }
+
+
+def download_slots(budgets: Dict = None) -> Dict:
+    """DOWNLOAD_SLOTS setting with each domain's starting budget"""
+    budgets = DOMAIN_BUDGETS if budgets is None else budgets
+    return {
+        domain: {"concurrency": budget["concurrency"], "delay": budget["delay"], "randomize_delay": True}
+        for domain, budget in budgets.items()
+    }
+
+
+class AdaptiveThrottleMiddleware:
+    """Downloader middleware keeping per-domain budgets and applying them to Scrapy's download slots
+
+    Requests of all subdomains share one slot per DOMAIN_BUDGETS entry. The spider sets
+    meta["download_slot"] when it builds a request, because DownloaderAwarePriorityQueue keys its
+    queues by slot when the request is scheduled, before any downloader middleware runs; requests
+    built elsewhere (redirects) get theirs from the request_scheduled signal. Needs to sit above
+    RetryMiddleware (e.g. 560) so it sees 429/503 responses before they are retried.
+    """
+
+    def __init__(self, crawler, budgets: Dict = None):
+        self.crawler = crawler
+        self.budgets = DOMAIN_BUDGETS if budgets is None else budgets
+        self.domains: Dict[str, DomainBudget] = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        from scrapy import signals
+
+        middleware = cls(crawler, crawler.settings.getdict("DOMAIN_BUDGETS") or None)
+        crawler.signals.connect(middleware.request_scheduled, signal=signals.request_scheduled)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def slot(self, url: str) -> str:
+        return budget_domain(urlparse(url).hostname or "", self.budgets)
+
+    def request_scheduled(self, request, spider):
+        # Sent before the scheduler queues the request; a redirect keeps the meta of the original URL
+        request.meta["download_slot"] = self.slot(request.url)
+
+    def _budget(self, domain: str) -> DomainBudget:
+        if domain not in self.domains:
+            self.domains[domain] = DomainBudget(**self.budgets.get(domain, DEFAULT_BUDGET))
+        return self.domains[domain]
+
+    def _apply(self, domain: str, budget: DomainBudget):
+        slot = self.crawler.engine.downloader.slots.get(domain)
+        if slot is None:
+            return
+        slot.concurrency = budget.concurrency
+        # A Retry-After window holds the whole domain, not just the throttled request
+        slot.delay = max(budget.delay, budget.blocked_until - time.time())
+
+    @staticmethod
+    def _retry_after(response) -> Optional[float]:
+        value = response.headers.get("Retry-After", b"").decode("utf-8").strip()
+        if not value:
+            return None
+        if value.isdigit():
+            return float(value)
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+    def process_request(self, request, spider):
+        self._budget(request.meta.get("download_slot") or self.slot(request.url))
+
+    def process_response(self, request, response, spider):
+        domain = request.meta.get("download_slot")
+        if domain in self.domains:
+            budget = self.domains[domain]
+            budget.observe(response.status, request.meta.get("download_latency"), self._retry_after(response))
+            self._apply(domain, budget)
+            if response.status in THROTTLE_STATUSES:
+                logger.warning(f"Throttled by {domain} ({response.status}): delay {budget.delay:.2f}s, "
+                               f"concurrency {budget.concurrency}")
+        return response
+
+    def stats(self) -> Dict:
+        return {domain: budget.stats() for domain, budget in self.domains.items()}
+
+    def spider_closed(self, spider):
+        logger.info(f"Domain budgets: {self.stats()}")
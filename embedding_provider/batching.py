@@ -0,0 +1,53 @@
+from typing import List, Optional
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBatcher:
+    """Packs texts into batches bounded by the endpoint's token budget and client batch size"""
+
+    def __init__(self, max_batch_tokens: int = 4096, max_batch_size: int = 8, max_input_tokens: int = 512,
+                 tokenizer_name: Optional[str] = None, chars_per_token: float = 4.0):
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_input_tokens = max_input_tokens
+        self.chars_per_token = chars_per_token
+        self.tokenizer = None
+
+        if tokenizer_name:
+            try:
+                from transformers import AutoTokenizer
+                self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+            except Exception as e:
+                logger.warning(f"Could not load tokenizer {tokenizer_name}, using character estimate: {e}")
+
+    def estimate_tokens(self, text: str) -> int:
+        if self.tokenizer is not None:
+            tokens = len(self.tokenizer.encode(text, add_special_tokens=True, truncation=False))
+        else:
+            # Two extra tokens for [CLS]/[SEP]
+            tokens = math.ceil(len(text) / self.chars_per_token) + 2
+
+        # TEI truncates anything longer than the model's input window (AUTO_TRUNCATE)
+        return min(tokens, self.max_input_tokens)
+
+    def batches(self, texts: List[str]) -> List[List[int]]:
+        """Return batches of indices into texts, grouped by similar length"""
+        lengths = [self.estimate_tokens(text) for text in texts]
+        order = sorted(range(len(texts)), key=lambda i: lengths[i])
+
+        batches = []
+        current: List[int] = []
+        for index in order:
+            # Sorted ascending, so the new text is the longest and sets the padded width
+            padded_tokens = (len(current) + 1) * lengths[index]
+            if current and (len(current) >= self.max_batch_size or padded_tokens > self.max_batch_tokens):
+                batches.append(current)
+                current = []
+            current.append(index)
+
+        if current:
+            batches.append(current)
+        return batches
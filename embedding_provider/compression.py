@@ -0,0 +1,216 @@
+from typing import Dict, List, Optional
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class VectorCompressor:
+    """Stored form of the embeddings; the base class keeps float32 vectors as they are"""
+
+    name = "none"
+    # pymilvus DataType member of the vector field
+    vector_dtype = "FLOAT_VECTOR"
+    # None keeps the collection's configured metric
+    metric_type: Optional[str] = None
+    # Candidates are re-scored against the float query when the stored form is too coarse to rank
+    rerank_factor = 0
+
+    def __init__(self):
+        self.fitted = True
+
+    def output_dim(self, dim: int) -> int:
+        return dim
+
+    def bytes_per_vector(self, dim: int) -> int:
+        return self.output_dim(dim) * 4
+
+    def fit(self, matrix) -> "VectorCompressor":
+        return self
+
+    def transform(self, matrix) -> np.ndarray:
+        """Float32 vectors in the stored space, before quantization"""
+        return np.ascontiguousarray(matrix, dtype=np.float32)
+
+    def encode(self, matrix) -> np.ndarray:
+        if not self.fitted:
+            raise Exception(f"{self.name} compression must be fitted on a corpus sample first")
+        return self.transform(matrix)
+
+    def decode(self, stored: np.ndarray) -> np.ndarray:
+        """Approximate float32 vectors back from the stored form"""
+        return np.asarray(stored, dtype=np.float32)
+
+    def to_rows(self, stored: np.ndarray) -> List:
+        """Per-row values in the form pymilvus expects for vector_dtype"""
+        return list(stored)
+
+
+class Float16Compressor(VectorCompressor):
+    """IEEE half precision, half the memory at practically unchanged recall"""
+
+    name = "float16"
+    vector_dtype = "FLOAT16_VECTOR"
+
+    def bytes_per_vector(self, dim: int) -> int:
+        return self.output_dim(dim) * 2
+
+    def encode(self, matrix) -> np.ndarray:
+        return super().encode(matrix).astype(np.float16)
+
+
+class BFloat16Compressor(VectorCompressor):
+    """bfloat16 keeps float32's exponent range; numpy has no dtype for it, so rows are raw uint16 bits"""
+
+    name = "bfloat16"
+    vector_dtype = "BFLOAT16_VECTOR"
+
+    def bytes_per_vector(self, dim: int) -> int:
+        return self.output_dim(dim) * 2
+
+    def encode(self, matrix) -> np.ndarray:
+        bits = super().encode(matrix).view(np.uint32)
+        # Round to nearest even on the 16 dropped mantissa bits
+        rounded = bits + np.uint32(0x7FFF) + ((bits >> 16) & np.uint32(1))
+        return (rounded >> 16).astype(np.uint16)
+
+    def decode(self, stored: np.ndarray) -> np.ndarray:
+        return (np.asarray(stored, dtype=np.uint16).astype(np.uint32) << 16).view(np.float32)
+
+    def to_rows(self, stored: np.ndarray) -> List:
+        return [row.tobytes() for row in stored]
+
+
+class BinaryCompressor(VectorCompressor):
+    """One sign bit per dimension searched by Hamming distance, then re-scored with the float query"""
+
+    name = "binary"
+    vector_dtype = "BINARY_VECTOR"
+    metric_type = "HAMMING"
+
+    def __init__(self, rerank_factor: int = 4):
+        super().__init__()
+        self.rerank_factor = rerank_factor
+
+    def bytes_per_vector(self, dim: int) -> int:
+        return self.output_dim(dim) // 8
+
+    def encode(self, matrix) -> np.ndarray:
+        return np.packbits(super().encode(matrix) > 0, axis=1)
+
+    def decode(self, stored: np.ndarray) -> np.ndarray:
+        # Bits back to +-1 so a dot product with the float query ranks like the original space
+        return np.unpackbits(np.asarray(stored, dtype=np.uint8), axis=1).astype(np.float32) * 2 - 1
+
+    def to_rows(self, stored: np.ndarray) -> List:
+        return [row.tobytes() for row in stored]
+
+    def rerank(self, query, stored_rows: List) -> np.ndarray:
+        """Scores of stored rows for one float query, higher is better"""
+        # pymilvus returns each binary vector as bytes, sometimes wrapped in a one-item list
+        rows = [row[0] if isinstance(row, list) else row for row in stored_rows]
+        packed = np.stack([np.frombuffer(bytes(row), dtype=np.uint8) for row in rows])
+        return self.decode(packed) @ np.asarray(query, dtype=np.float32)
+
+
+class MatryoshkaCompressor(VectorCompressor):
+    """Keep the leading dimensions and re-normalize; only sound for Matryoshka-trained models"""
+
+    name = "matryoshka"
+
+    def __init__(self, dim: int = 256):
+        super().__init__()
+        self.dim = dim
+
+    def output_dim(self, dim: int) -> int:
+        return min(self.dim, dim)
+
+    def transform(self, matrix) -> np.ndarray:
+        return np.ascontiguousarray(_normalize(super().transform(matrix)[:, :self.dim]))
+
+
+class PCACompressor(VectorCompressor):
+    """Projection onto the top principal components of a corpus sample, persisted next to the caches"""
+
+    name = "pca"
+
+    def __init__(self, dim: int = 256, path: Optional[str] = None):
+        super().__init__()
+        self.dim = dim
+        self.path = path
+        self.mean: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None
+        self.fitted = False
+
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def output_dim(self, dim: int) -> int:
+        return self.dim
+
+    def fit(self, matrix) -> "PCACompressor":
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if len(matrix) < self.dim:
+            raise Exception(f"PCA to {self.dim} dimensions needs at least {self.dim} sample vectors, got {len(matrix)}")
+
+        self.mean = matrix.mean(axis=0)
+        _, singular_values, components = np.linalg.svd(matrix - self.mean, full_matrices=False)
+        self.components = np.ascontiguousarray(components[:self.dim])
+        self.fitted = True
+
+        explained = (singular_values[:self.dim] ** 2).sum() / (singular_values ** 2).sum()
+        logger.info(f"Fitted PCA {matrix.shape[1]} -> {self.dim} on {len(matrix)} vectors "
+                    f"({explained:.1%} variance kept)")
+        if self.path:
+            self.save()
+        return self
+
+    def transform(self, matrix) -> np.ndarray:
+        if not self.fitted:
+            raise Exception("PCA compression must be fitted on a corpus sample first")
+        return np.ascontiguousarray(_normalize((super().transform(matrix) - self.mean) @ self.components.T))
+
+    def save(self, path: Optional[str] = None):
+        path = path or self.path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # np.savez appends .npz to names without it, so write through a file object
+        with open(path, "wb") as projection_file:
+            np.savez(projection_file, mean=self.mean, components=self.components)
+
+    def load(self, path: str):
+        with np.load(path) as projection:
+            self.mean = projection["mean"]
+            self.components = projection["components"]
+        self.dim = self.components.shape[0]
+        self.fitted = True
+        logger.info(f"Loaded PCA projection to {self.dim} dimensions from {path}")
+
+
+COMPRESSORS = {
+    "none": VectorCompressor,
+    "float16": Float16Compressor,
+    "bfloat16": BFloat16Compressor,
+    "binary": BinaryCompressor,
+    "matryoshka": MatryoshkaCompressor,
+    "pca": PCACompressor,
+}
+
+
+def build_compressor(config: Optional[Dict]) -> Optional[VectorCompressor]:
+    """Compressor from a config such as {"method": "pca", "dim": 256, "path": "cache/pca.npz"}"""
+    if not config:
+        return None
+
+    options = dict(config)
+    method = options.pop("method", "none")
+    if method not in COMPRESSORS:
+        raise Exception(f"Unknown compression method '{method}', expected one of {sorted(COMPRESSORS)}")
+    return COMPRESSORS[method](**options)
@@ -0,0 +1,160 @@
+from typing import Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import multiprocessing
+import os
+
+import numpy as np
+
+from embedding_provider.batching import TokenBatcher
+from embedding_provider.embedding_provider import EmbeddingProvider
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "int8", "onnx")
+
+
+def load_cpu_model(model_name: str, backend: str = "int8", num_threads: Optional[int] = None,
+                   classifier: bool = False):
+    """Tokenizer and model on a CPU backend; classifier loads a sequence-classification head (rerankers)"""
+    if backend not in BACKENDS:
+        raise Exception(f"Unknown CPU backend '{backend}', expected one of {BACKENDS}")
+
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    if backend == "onnx":
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTModelForSequenceClassification
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        model_class = ORTModelForSequenceClassification if classifier else ORTModelForFeatureExtraction
+        # Exported on first load, then reused from the Hugging Face cache
+        model = model_class.from_pretrained(
+            model_name, export=True, provider="CPUExecutionProvider", session_options=options
+        )
+        return tokenizer, model
+
+    import torch
+    from transformers import AutoModel, AutoModelForSequenceClassification
+
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    model_class = AutoModelForSequenceClassification if classifier else AutoModel
+    model = model_class.from_pretrained(model_name).eval()
+    if backend == "int8":
+        # Linear layers carry nearly all of BERT's FLOPs
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return tokenizer, model
+
+
+class _Encoder:
+    """Tokenizer plus a BGE model on one of the CPU backends; CLS pooling, L2-normalized"""
+
+    def __init__(self, model_name: str, backend: str = "int8", num_threads: Optional[int] = None,
+                 max_length: int = 512):
+        self.backend = backend
+        self.max_length = max_length
+        self.tokenizer, self.model = load_cpu_model(model_name, backend, num_threads)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        # Padding only to the longest text of the batch, which length bucketing keeps short
+        if self.backend == "onnx":
+            inputs = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length,
+                                    return_tensors="np")
+            hidden = self.model(**inputs).last_hidden_state
+            cls = np.asarray(hidden[:, 0], dtype=np.float32)
+        else:
+            import torch
+
+            inputs = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length,
+                                    return_tensors="pt")
+            with torch.inference_mode():
+                cls = self.model(**inputs).last_hidden_state[:, 0].float().numpy()
+
+        return cls / np.maximum(np.linalg.norm(cls, axis=1, keepdims=True), 1e-12)
+
+
+# Set in each pool process by _init_worker
+_WORKER_ENCODER: Optional[_Encoder] = None
+
+
+def _init_worker(config: Dict):
+    global _WORKER_ENCODER
+    _WORKER_ENCODER = _Encoder(**config)
+
+
+def _encode_in_worker(texts: List[str]) -> np.ndarray:
+    return _WORKER_ENCODER.encode(texts)
+
+
+class CPUEmbeddingProvider(EmbeddingProvider):
+    """Local BGE embeddings tuned for CPU-only workers: int8 or ONNX Runtime, length-bucketed batches,
+    pinned intra-op threads and optional encoding across processes"""
+
+    def __init__(self, model_name: str = "BAAI/bge-large-en-v1.5", backend: str = "int8", batch_size: int = 32,
+                 max_batch_tokens: int = 8192, num_threads: Optional[int] = None, num_processes: int = 1,
+                 max_length: int = 512, tokenizer_name: Optional[str] = None):
+        self._model_name = model_name
+        self.backend = backend
+        self.num_processes = max(1, num_processes)
+        # Each process gets its share of the cores unless told otherwise
+        num_threads = num_threads or max(1, (os.cpu_count() or 1) // self.num_processes)
+        self.batcher = TokenBatcher(max_batch_tokens=max_batch_tokens, max_batch_size=batch_size,
+                                    max_input_tokens=max_length, tokenizer_name=tokenizer_name or model_name)
+
+        config = {"model_name": model_name, "backend": backend, "num_threads": num_threads, "max_length": max_length}
+        if self.num_processes > 1:
+            # spawn: forked copies of an initialized torch/ORT runtime are not safe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.num_processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(config,)
+            )
+            self._encoder = None
+        else:
+            self._pool = None
+            self._encoder = _Encoder(**config)
+        logger.info(f"CPU embedding provider: {model_name} on {backend}, {self.num_processes} process(es) "
+                    f"x {num_threads} threads")
+
+    @property
+    def model_name(self) -> str:
+        return f"local-{self.backend}:{self._model_name}"
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.embed_query(text)
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        # Batches of similar token length, so little compute goes to padding
+        batches = self.batcher.batches(texts)
+        batch_texts = [[texts[i] for i in batch] for batch in batches]
+        if self._pool is not None:
+            results = self._pool.map(_encode_in_worker, batch_texts)
+        else:
+            results = map(self._encoder.encode, batch_texts)
+
+        matrix = None
+        for batch, vectors in zip(batches, results):
+            if matrix is None:
+                matrix = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            matrix[batch] = vectors
+        return matrix
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self.embed_documents([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        return self.embed_documents(texts)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
@@ -0,0 +1,195 @@
+from typing import Dict, Iterable, List, Optional
+from collections import OrderedDict
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Disk-backed, content-addressed embedding cache with size-bounded LRU eviction"""
+
+    def __init__(self, path: str = "embedding_cache.sqlite", max_entries: int = 1_000_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # One connection shared by all callers, serialized by the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model_name}:{digest}"
+
+    @staticmethod
+    def _encode(vector: Iterable[float]) -> bytes:
+        return np.asarray(vector, dtype=np.float32).tobytes()
+
+    @staticmethod
+    def _decode(blob: bytes) -> np.ndarray:
+        # Read-only float32 view over the blob, no per-element conversion
+        return np.frombuffer(blob, dtype=np.float32)
+
+    def get_many(self, model_name: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Return cached vectors in input order, None for misses"""
+        if not texts:
+            return []
+
+        keys = [self.make_key(model_name, text) for text in texts]
+        found: Dict[str, bytes] = {}
+
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            # Stay well below SQLite's host parameter limit
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            results = []
+            for key in keys:
+                blob = found.get(key)
+                if blob is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    results.append(self._decode(blob))
+
+        return results
+
+    def put_many(self, model_name: str, texts: List[str], vectors: List[List[float]]):
+        if not texts:
+            return
+
+        now = time.time()
+        rows = [
+            (self.make_key(model_name, text), self._encode(vector), now)
+            for text, vector in zip(texts, vectors)
+        ]
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)", rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop the least recently used entries once the cache grows past max_entries"""
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+            logger.info(f"Evicted {overflow} entries from embedding cache {self.path}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": size,
+            "max_entries": self.max_entries
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class QueryEmbeddingCache:
+    """In-process LRU cache with a TTL for query vectors"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(query)
+            if entry is not None:
+                vector, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(query)
+                    self.hits += 1
+                    return vector
+                del self._entries[query]
+            self.misses += 1
+            return None
+
+    def put(self, query: str, vector: List[float]):
+        with self._lock:
+            self._entries[query] = (vector, time.monotonic() + self.ttl)
+            self._entries.move_to_end(query)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "max_entries": self.max_entries
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self.hits = 0
+        self.misses = 0
@@ -1,14 +1,42 @@
 from typing import List, Optional, Dict
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+import base64
 import json
+import logging
+import random
+import threading
+import time
+import boto3
+import numpy as np
 import torch
-from more_itertools import chunked
+from botocore.config import Config
+from botocore.exceptions import ClientError
 
 from langchain_core.embeddings import Embeddings
 from langchain_community.embeddings import SagemakerEndpointEmbeddings
 from langchain_community.embeddings.sagemaker_endpoint import EmbeddingsContentHandler
 from langchain_huggingface import HuggingFaceEmbeddings
 
+from embedding_provider.batching import TokenBatcher
+from embedding_provider.embedding_cache import EmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+# Error codes and HTTP statuses SageMaker/TEI return when the endpoint sheds load
+THROTTLING_CODES = {"ThrottlingException", "Throttling", "TooManyRequestsException", "ServiceUnavailable",
+                    "ServiceUnavailableException"}
+THROTTLING_STATUSES = {429, 503}
+
+
+def to_float32_matrix(vectors) -> np.ndarray:
+    """Contiguous (n, dim) float32 array; base64 strings are decoded as raw little-endian float32"""
+    if isinstance(vectors, np.ndarray):
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+    if vectors and isinstance(vectors[0], str):
+        return np.stack([np.frombuffer(base64.b64decode(vector), dtype="<f4") for vector in vectors])
+    return np.asarray(vectors, dtype=np.float32)
+
 
 class EmbeddingProvider(ABC):
     @abstractmethod
@@ -23,6 +51,10 @@ class EmbeddingProvider(ABC):
     def embed_query(self, text: str) -> List[float]:
         pass
 
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Several queries at once, with exactly the vectors embed_query would give"""
+        return [self.embed_query(text) for text in texts]
+
 
 class TEIContentHandler(EmbeddingsContentHandler):
     content_type = "application/json"
@@ -32,10 +64,13 @@ class TEIContentHandler(EmbeddingsContentHandler):
         payload = {"inputs": inputs}
         return json.dumps(payload).encode("utf-8")
 
-    def transform_output(self, output: bytes) -> List[List[float]]:
-        response_json = json.loads(output.read().decode("utf-8"))
+    def transform_output(self, output: bytes) -> np.ndarray:
+        response_json = json.loads(output.read())
         if isinstance(response_json, list):
-            return response_json
+            return to_float32_matrix(response_json)
+        elif isinstance(response_json, dict) and "data" in response_json:
+            # OpenAI-compatible payloads, including encoding_format="base64"
+            return to_float32_matrix([item["embedding"] for item in response_json["data"]])
         else:
             raise ValueError(f"Unexpected TEI response format: {type(response_json)}")
 
@@ -48,52 +83,137 @@ class LegacyContentHandler(EmbeddingsContentHandler):
         input_str = json.dumps({"inputs": inputs, **model_kwargs})
         return input_str.encode("utf-8")
 
-    def transform_output(self, output: bytes) -> List[List[float]]:
+    def transform_output(self, output: bytes) -> np.ndarray:
         response_json = json.loads(output.read().decode("utf-8"))
 
         if "vectors" in response_json:
-            return response_json["vectors"]
+            return to_float32_matrix(response_json["vectors"])
         elif isinstance(response_json, list):
             if (len(response_json) > 0 and isinstance(response_json[0], list) and
                 len(response_json[0]) > 0 and isinstance(response_json[0][0], list) and
                 len(response_json[0][0]) > 0 and isinstance(response_json[0][0][0], list)):
-                return [item[0][0] for item in response_json]
+                return to_float32_matrix([item[0][0] for item in response_json])
             else:
-                return response_json
+                return to_float32_matrix(response_json)
         elif "embeddings" in response_json:
-            return response_json["embeddings"]
+            return to_float32_matrix(response_json["embeddings"])
         elif "outputs" in response_json:
-            return response_json["outputs"]
+            return to_float32_matrix(response_json["outputs"])
         else:
-            return response_json
+            return to_float32_matrix(response_json)
 
 
 class SageMakerEmbeddingProvider(EmbeddingProvider):
-    def __init__(self, endpoint_name: str = 'embedding-endpoint', region_name: str = 'eu-west-1', use_tei: bool = True, max_batch_size: int = 8):
+    def __init__(self, endpoint_name: str = 'embedding-endpoint', region_name: str = 'eu-west-1', use_tei: bool = True,
+                 max_batch_size: int = 8, max_batch_tokens: int = 4096, tokenizer_name: Optional[str] = None,
+                 max_concurrency: int = 8, max_retries: int = 5, retry_backoff: float = 0.5):
         self.endpoint_name = endpoint_name
         self.region_name = region_name
         self.use_tei = use_tei
         self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        # Mirrors MAX_CLIENT_BATCH_SIZE / MAX_BATCH_TOKENS of the TEI container
+        self.batcher = TokenBatcher(
+            max_batch_tokens=max_batch_tokens,
+            max_batch_size=max_batch_size,
+            tokenizer_name=tokenizer_name
+        )
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._executor = None
+        self._executor_lock = threading.Lock()
 
         content_handler = TEIContentHandler() if use_tei else LegacyContentHandler()
 
+        # Size the connection pool for the batches we keep in flight; retries are handled below
+        client = boto3.client(
+            "sagemaker-runtime",
+            region_name=region_name,
+            config=Config(max_pool_connections=max(10, self.max_concurrency), retries={"max_attempts": 1})
+        )
+
         self.embeddings = SagemakerEndpointEmbeddings(
             endpoint_name=endpoint_name,
             region_name=region_name,
             content_handler=content_handler,
+            client=client,
         )
 
     def get_embedding(self, text: str) -> List[float]:
         return self.embeddings.embed_query(text)
 
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        all_embeddings = []
-        for batch in chunked(texts, self.max_batch_size):
-            all_embeddings.extend(self.embeddings.embed_documents(batch))
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency,
+                    thread_name_prefix="sagemaker-embed"
+                )
+            return self._executor
+
+    @staticmethod
+    def _is_throttled(error: Exception) -> bool:
+        # SagemakerEndpointEmbeddings re-raises the botocore error as a ValueError, so walk the chain
+        while error is not None:
+            if isinstance(error, ClientError):
+                response = error.response
+                statuses = {
+                    response.get("ResponseMetadata", {}).get("HTTPStatusCode"),
+                    # ModelError carries the container's own status, e.g. TEI answering 429
+                    response.get("OriginalStatusCode"),
+                }
+                return (response.get("Error", {}).get("Code") in THROTTLING_CODES
+                        or bool(statuses & THROTTLING_STATUSES))
+            error = error.__cause__ or error.__context__
+        return False
+
+    def _embed_batch(self, batch: List[str]) -> List[np.ndarray]:
+        """Embed one batch, retrying throttled calls with exponential backoff and jitter"""
+        attempt = 0
+        while True:
+            try:
+                return self.embeddings.embed_documents(batch)
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_throttled(e):
+                    raise
+                delay = self.retry_backoff * (2 ** attempt) * (1 + random.random())
+                attempt += 1
+                logger.warning(f"Endpoint {self.endpoint_name} throttled, retry {attempt}/{self.max_retries} "
+                               f"in {delay:.2f}s: {e}")
+                time.sleep(delay)
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        index_batches = self.batcher.batches(texts)
+        if not index_batches:
+            return np.empty((0, 0), dtype=np.float32)
+        batches = [[texts[i] for i in batch] for batch in index_batches]
+
+        if self.max_concurrency == 1 or len(batches) == 1:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            # map() keeps up to max_concurrency batches in flight and yields them in input order
+            results = self._get_executor().map(self._embed_batch, batches)
+
+        # Batches are grouped by length, scatter the rows back into one (n, dim) float32 matrix
+        all_embeddings = None
+        for index_batch, batch_embeddings in zip(index_batches, results):
+            batch_matrix = to_float32_matrix(batch_embeddings)
+            if all_embeddings is None:
+                all_embeddings = np.empty((len(texts), batch_matrix.shape[1]), dtype=np.float32)
+            all_embeddings[index_batch] = batch_matrix
         return all_embeddings
 
-    def embed_query(self, text: str) -> List[float]:
-        return self.embeddings.embed_query(text)
+    def embed_query(self, text: str) -> np.ndarray:
+        return to_float32_matrix([self.embeddings.embed_query(text)])[0]
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        # The endpoint embeds queries and documents alike, so queries can share the batched path
+        return self.embed_documents(texts)
+
+    @property
+    def model_name(self) -> str:
+        return f"sagemaker:{self.endpoint_name}"
 
 
 class LocalEmbeddingProvider(HuggingFaceEmbeddings, EmbeddingProvider):
@@ -108,14 +228,66 @@ class LocalEmbeddingProvider(HuggingFaceEmbeddings, EmbeddingProvider):
         return self.embed_query(text)
 
 
+class CachedEmbeddingProvider(EmbeddingProvider):
+    """Consults an EmbeddingCache before delegating misses to the wrapped provider"""
+
+    def __init__(self, provider: EmbeddingProvider, cache: EmbeddingCache, model_name: Optional[str] = None):
+        self.provider = provider
+        self.cache = cache
+        self.model_name = model_name or getattr(provider, "model_name", type(provider).__name__)
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.embed_query(text)
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        cached = self.cache.get_many(self.model_name, texts)
+
+        # Only texts missing from the cache reach the remote endpoint, each unique text once
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+        if missing:
+            computed = to_float32_matrix(self.provider.embed_documents(missing))
+            self.cache.put_many(self.model_name, missing, computed)
+            by_text = dict(zip(missing, computed))
+            cached = [by_text[text] if vector is None else vector for text, vector in zip(texts, cached)]
+
+        return to_float32_matrix(cached) if cached else np.empty((0, 0), dtype=np.float32)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        # Providers may embed a query differently from the same text as a document, so keep them apart
+        query_model = f"{self.model_name}:query"
+        cached = self.cache.get_many(query_model, texts)
+
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+        if missing:
+            computed = self.provider.embed_queries(missing)
+            self.cache.put_many(query_model, missing, computed)
+            by_text = dict(zip(missing, computed))
+            cached = [by_text[text] if vector is None else vector for text, vector in zip(texts, cached)]
+        return cached
+
+
 class EmbeddingService:
-    def __init__(self, use_remote: bool = True, milvus_config: Optional[Dict] = None, use_tei: bool = True, **kwargs):
+    def __init__(self, use_remote: bool = True, milvus_config: Optional[Dict] = None, use_tei: bool = True,
+                 cache_config: Optional[Dict] = None, rerank_config: Optional[Dict] = None, **kwargs):
         self.use_remote = use_remote
 
-        if use_remote:
-            self.provider = SageMakerEmbeddingProvider(use_tei=use_tei, **kwargs)
-        else:
-            self.provider = LocalEmbeddingProvider(**kwargs)
+        # Optional cross-encoder pass over the ANN candidates, e.g. {"backend": "int8", "candidates": 50}
+        self.reranker = None
+        if rerank_config is not None:
+            from embedding_provider.reranker import CrossEncoderReranker
+            self.reranker = CrossEncoderReranker(**rerank_config)
+
+        self.cache = None
+        if cache_config:
+            self.cache = EmbeddingCache(
+                path=cache_config.get('path', 'embedding_cache.sqlite'),
+                max_entries=cache_config.get('max_entries', 1_000_000)
+            )
+
+        self.provider = self._build_provider(use_remote, use_tei, **kwargs)
 
         self.milvus = None
         if milvus_config:
@@ -124,18 +296,61 @@ class EmbeddingService:
             port = milvus_config.get('port', '19530')
             collection_name = milvus_config.get('collection_name', 'embeddings')
             connection_args = milvus_config.get('connection_args', {"host": host, "port": port})
+            auto_id = milvus_config.get('auto_id', True)
+            index_profile = milvus_config.get('index_profile', 'hnsw')
+            metric_type = milvus_config.get('metric_type', 'L2')
+            enable_sparse = milvus_config.get('enable_sparse', False)
+            sparse_stats_path = milvus_config.get('sparse_stats_path')
+            typed_metadata = milvus_config.get('typed_metadata', False)
+            compression = milvus_config.get('compression')
 
             self.milvus = MilvusManager(
                 connection_args=connection_args,
                 collection_name=collection_name,
                 host=host,
-                port=port
+                port=port,
+                auto_id=auto_id,
+                index_profile=index_profile,
+                metric_type=metric_type,
+                enable_sparse=enable_sparse,
+                sparse_stats_path=sparse_stats_path,
+                typed_metadata=typed_metadata,
+                compression=compression
             )
             self.milvus.create_collection(self.provider)
 
+    def _build_provider(self, use_remote: bool, use_tei: bool = True, **kwargs) -> EmbeddingProvider:
+        if use_remote:
+            provider = SageMakerEmbeddingProvider(use_tei=use_tei, **kwargs)
+        elif kwargs.get("backend"):
+            # CPU-tuned local mode: backend="int8" | "onnx" | "torch"
+            from embedding_provider.cpu_provider import CPUEmbeddingProvider
+            provider = CPUEmbeddingProvider(**kwargs)
+        else:
+            provider = LocalEmbeddingProvider(**kwargs)
+
+        if self.cache:
+            provider = CachedEmbeddingProvider(provider, self.cache)
+        return provider
+
+    def cache_stats(self) -> Dict:
+        if not self.cache:
+            return {}
+        return self.cache.stats()
+
     def create_embedding(self, text: str) -> List[float]:
         return self.provider.get_embedding(text)
 
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        return self.provider.embed_documents(texts)
+
+    def fit_compression(self, texts: List[str]):
+        """Fit a learned compression (PCA) on a representative sample of corpus texts"""
+        if not self.milvus or self.milvus.compressor is None:
+            raise Exception("No vector compression configured")
+
+        self.milvus.compressor.fit(self.embed_texts(texts))
+
     def add_text_to_store(self, text: str, metadata: Dict = None) -> Dict:
         if not self.milvus:
             raise Exception("Milvus not configured")
@@ -171,27 +386,119 @@ class EmbeddingService:
             "count": len(texts)
         }
 
-    def search_similar_texts(self, query_text: str, top_k: int = 5, with_scores: bool = False) -> List[Dict]:
+    def add_embeddings_to_store(self, texts: List[str], embeddings: List[List[float]],
+                                metadatas: List[Dict] = None) -> Dict:
         if not self.milvus:
             raise Exception("Milvus not configured")
 
-        if with_scores:
-            return self.milvus.similarity_search_with_score(query_text, top_k)
-        else:
-            return self.milvus.similarity_search(query_text, top_k)
+        if not texts:
+            return {
+                "texts": [],
+                "milvus_ids": [],
+                "saved_to_milvus": False,
+                "count": 0
+            }
+
+        ids = self.milvus.add_embeddings(texts, embeddings, metadatas)
+
+        return {
+            "texts": texts,
+            "milvus_ids": ids,
+            "saved_to_milvus": True,
+            "count": len(texts)
+        }
+
+    def bulk_add_to_store(self, texts: List[str], metadatas: List[Dict] = None, embeddings=None,
+                          batch_size: int = 10000) -> Dict:
+        """Backfill path: embed (unless vectors are given) and insert through pymilvus directly"""
+        if not self.milvus:
+            raise Exception("Milvus not configured")
+
+        if embeddings is None:
+            embeddings = self.embed_texts(texts)
+
+        ids = self.milvus.bulk_insert(texts, embeddings, metadatas, batch_size=batch_size)
+
+        return {
+            "texts": texts,
+            "milvus_ids": ids,
+            "saved_to_milvus": bool(ids),
+            "count": len(ids)
+        }
+
+    def replace_source_in_store(self, source_url: str, docs: List, embeddings: List[List[float]] = None) -> Dict:
+        if not self.milvus:
+            raise Exception("Milvus not configured")
+
+        result = self.milvus.replace_source(source_url, docs, embeddings)
+        result["count"] = len(result["inserted"])
+        return result
+
+    def delete_from_store(self, ids: List) -> Dict:
+        if not self.milvus:
+            raise Exception("Milvus not configured")
+
+        if ids:
+            self.milvus.delete(ids)
+
+        return {
+            "milvus_ids": ids,
+            "count": len(ids)
+        }
+
+    def search_similar_texts(self, query_text: str, top_k: int = 5, with_scores: bool = False,
+                             hybrid: bool = False, filter=None, rerank: Optional[bool] = None) -> List[Dict]:
+        """filter narrows the candidates before the ANN step, e.g. {"domain_type": "primary", "language": "eng"}.
+
+        With a reranker configured (and rerank not False), the reranker's candidate count is fetched
+        and the cross-encoder picks the top_k.
+        """
+        if not self.milvus:
+            raise Exception("Milvus not configured")
+
+        use_reranker = self.reranker is not None and rerank is not False
+        k = max(top_k, self.reranker.candidates) if use_reranker else top_k
+
+        with self.milvus.timer.time("total"):
+            if hybrid:
+                # Dense + BM25 fusion for exact identifiers such as "CSSF 22/806"
+                results = self.milvus.hybrid_search(query_text, k, filter=filter)
+            elif with_scores or use_reranker:
+                results = self.milvus.similarity_search_with_score(query_text, k, filter=filter)
+            else:
+                results = self.milvus.similarity_search(query_text, k, filter=filter)
+
+            if use_reranker:
+                with self.milvus.timer.time("rerank"):
+                    results = self.reranker.rerank(query_text, results, top_k)
+
+        if not with_scores:
+            return [{"content": r["content"], "metadata": r["metadata"]} for r in results]
+        return results
+
+    def latency_stats(self) -> Dict:
+        """Per-stage query latencies: embed, search, rerank and total"""
+        if not self.milvus:
+            return {}
+        return self.milvus.timer.stats()
+
+    def search_many(self, queries: List[str], top_k: int = 5, filter=None) -> List[List[Dict]]:
+        if not self.milvus:
+            raise Exception("Milvus not configured")
+
+        return self.milvus.search_many(queries, top_k, filter=filter)
 
     def switch_provider(self, use_remote: bool, use_tei: bool = True, **kwargs):
         self.use_remote = use_remote
-        if use_remote:
-            self.provider = SageMakerEmbeddingProvider(use_tei=use_tei, **kwargs)
-        else:
-            self.provider = LocalEmbeddingProvider(**kwargs)
+        self._close_provider()
+        self.provider = self._build_provider(use_remote, use_tei, **kwargs)
 
         if self.milvus:
             self.milvus.create_collection(self.provider)
 
     def setup_milvus(self, host: str = "localhost", port: str = "19530",
-                     connection_args: Dict = None, collection_name: str = "embeddings"):
+                     connection_args: Dict = None, collection_name: str = "embeddings", auto_id: bool = True,
+                     index_profile: str = "hnsw", metric_type: str = "L2"):
         from milvus_provider.mivlus_provider import MilvusManager
 
         connection_args = connection_args or {"host": host, "port": port}
@@ -200,6 +507,22 @@ class EmbeddingService:
             connection_args=connection_args,
             collection_name=collection_name,
             host=host,
-            port=port
+            port=port,
+            auto_id=auto_id,
+            index_profile=index_profile,
+            metric_type=metric_type
         )
         self.milvus.create_collection(self.provider)
+
+    def _close_provider(self):
+        # Shuts down the encoding processes of a multi-process local provider
+        provider = getattr(self.provider, "provider", self.provider)
+        if hasattr(provider, "close"):
+            provider.close()
+
+    def close(self):
+        self._close_provider()
+        if self.milvus:
+            self.milvus.save_sparse_stats()
+        if self.cache:
+            self.cache.close()
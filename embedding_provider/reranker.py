@@ -0,0 +1,75 @@
+from typing import Dict, List, Optional
+import hashlib
+import logging
+
+import numpy as np
+
+from embedding_provider.cpu_provider import load_cpu_model
+from embedding_provider.embedding_cache import QueryEmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_id(result: Dict) -> str:
+    """Stable id of a search result: its doc_id, else primary key, else a content hash"""
+    metadata = result.get("metadata") or {}
+    for key in ("doc_id", "pk"):
+        if metadata.get(key) is not None:
+            return str(metadata[key])
+    return hashlib.sha256(result.get("content", "").encode("utf-8")).hexdigest()
+
+
+class CrossEncoderReranker:
+    """bge-reranker style cross-encoder scored in length-sorted batches on CPU, with a score cache"""
+
+    def __init__(self, model_name: str = "BAAI/bge-reranker-base", backend: str = "int8", candidates: int = 50,
+                 batch_size: int = 16, max_length: int = 512, num_threads: Optional[int] = None,
+                 cache_size: int = 20000, cache_ttl: float = 24 * 3600):
+        self.model_name = model_name
+        self.backend = backend
+        # How many ANN results are fetched and re-scored per query
+        self.candidates = candidates
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.tokenizer, self.model = load_cpu_model(model_name, backend, num_threads, classifier=True)
+        # Keyed on query hash + chunk id; chunk ids are content hashes, so edited chunks get new scores
+        self.score_cache = QueryEmbeddingCache(max_entries=cache_size, ttl=cache_ttl)
+
+    def _score_batch(self, query: str, passages: List[str]) -> np.ndarray:
+        pairs = [[query, passage] for passage in passages]
+        if self.backend == "onnx":
+            inputs = self.tokenizer(pairs, padding=True, truncation=True, max_length=self.max_length,
+                                    return_tensors="np")
+            return np.asarray(self.model(**inputs).logits, dtype=np.float32).reshape(-1)
+
+        import torch
+
+        inputs = self.tokenizer(pairs, padding=True, truncation=True, max_length=self.max_length,
+                                return_tensors="pt")
+        with torch.inference_mode():
+            return self.model(**inputs).logits.reshape(-1).float().numpy()
+
+    def score(self, query: str, results: List[Dict]) -> List[float]:
+        """Relevance logits for each result, cached per (query, chunk)"""
+        query_hash = hashlib.sha256(query.encode("utf-8")).hexdigest()[:16]
+        keys = [f"{query_hash}:{chunk_id(result)}" for result in results]
+        scores = [self.score_cache.get(key) for key in keys]
+
+        missing = [i for i, score in enumerate(scores) if score is None]
+        # Similar lengths share a batch, so padding stays small
+        missing.sort(key=lambda i: len(results[i]["content"]))
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            batch_scores = self._score_batch(query, [results[i]["content"] for i in batch])
+            for i, score in zip(batch, batch_scores):
+                scores[i] = float(score)
+                self.score_cache.put(keys[i], scores[i])
+        return scores
+
+    def rerank(self, query: str, results: List[Dict], top_k: int) -> List[Dict]:
+        """Results re-ordered by cross-encoder score (added as rerank_score), cut to top_k"""
+        if not results:
+            return []
+        scores = self.score(query, results)
+        order = sorted(range(len(results)), key=lambda i: scores[i], reverse=True)[:top_k]
+        return [dict(results[i], rerank_score=scores[i]) for i in order]
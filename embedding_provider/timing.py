@@ -0,0 +1,44 @@
+from typing import Dict
+from collections import deque
+from contextlib import contextmanager
+import statistics
+import threading
+import time
+
+
+class StageTimer:
+    """Rolling latency samples per named stage (embed, search, rerank, ...)"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def time(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - start) * 1000)
+
+    def record(self, stage: str, elapsed_ms: float):
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=self.window)).append(elapsed_ms)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self._samples.items()}
+        return {
+            stage: {
+                "count": len(values),
+                "mean_ms": statistics.mean(values),
+                "p50_ms": statistics.median(values),
+                "p95_ms": statistics.quantiles(values, n=20)[-1] if len(values) > 1 else values[0],
+            }
+            for stage, values in samples.items() if values
+        }
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
@@ -0,0 +1,35 @@
+from typing import Optional
+
+
+def _filter_value(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def build_filter(filters) -> Optional[str]:
+    """Milvus boolean expression from {field: value}; lists become `in`, (low, high) tuples ranges.
+
+    Strings are passed through untouched, e.g. 'domain_type == "primary" and page_number < 5'.
+    """
+    if not filters:
+        return None
+    if isinstance(filters, str):
+        return filters
+
+    clauses = []
+    for field, value in filters.items():
+        if isinstance(value, list):
+            clauses.append(f"{field} in [{', '.join(_filter_value(item) for item in value)}]")
+        elif isinstance(value, tuple):
+            low, high = value
+            if low is not None:
+                clauses.append(f"{field} >= {_filter_value(low)}")
+            if high is not None:
+                clauses.append(f"{field} <= {_filter_value(high)}")
+        else:
+            clauses.append(f"{field} == {_filter_value(value)}")
+    return " and ".join(clauses) or None
@@ -1,18 +1,112 @@
 from langchain_milvus import Milvus  # Use the dedicated package, not langchain_community
-from pymilvus import connections
+from pymilvus import (
+    connections, utility, DataType, Collection, CollectionSchema, FieldSchema, AnnSearchRequest, RRFRanker
+)
 from typing import Dict, List, Optional
+import json
 import logging
+import time
+import numpy as np
+
+from embedding_provider.compression import build_compressor
+from embedding_provider.embedding_cache import QueryEmbeddingCache
+from embedding_provider.timing import StageTimer
+from milvus_provider.filters import build_filter
+from milvus_provider.sparse import BM25Encoder
 
 logger = logging.getLogger(__name__)
 
+# BM25 sparse vectors live next to the dense vector when sparse search is enabled
+SPARSE_FIELD = "sparse_vector"
+SPARSE_INDEX_PARAMS = {"index_type": "SPARSE_INVERTED_INDEX", "metric_type": "IP", "params": {"drop_ratio_build": 0.0}}
+SPARSE_SEARCH_PARAMS = {"metric_type": "IP", "params": {"drop_ratio_search": 0.0}}
+
+# Filler for scalar fields a chunk's metadata doesn't carry
+SCALAR_DEFAULTS = {
+    DataType.BOOL: False,
+    DataType.INT8: 0,
+    DataType.INT16: 0,
+    DataType.INT32: 0,
+    DataType.INT64: 0,
+    DataType.FLOAT: 0.0,
+    DataType.DOUBLE: 0.0,
+    DataType.VARCHAR: "",
+    DataType.JSON: {},
+}
+
+# Typed, indexed metadata that searches can filter on before the ANN step
+METADATA_FIELDS = {
+    "source_url": (DataType.VARCHAR, {"max_length": 2048}),
+    "domain_type": (DataType.VARCHAR, {"max_length": 32}),
+    "chunk_type": (DataType.VARCHAR, {"max_length": 32}),
+    "language": (DataType.VARCHAR, {"max_length": 16}),
+    # ISO date (YYYY-MM-DD) so string comparison is date order
+    "publication_date": (DataType.VARCHAR, {"max_length": 10}),
+    "page_number": (DataType.INT64, {}),
+}
+METADATA_INDEX_PARAMS = {"index_type": "INVERTED"}
+
+# Vector index build and search parameters; metric_type is filled in by MilvusManager
+INDEX_PROFILES = {
+    "exact": {
+        "index": {"index_type": "FLAT", "params": {}},
+        "search": {"params": {}}
+    },
+    "hnsw": {
+        "index": {"index_type": "HNSW", "params": {"M": 16, "efConstruction": 200}},
+        "search": {"params": {"ef": 64}}
+    },
+    "ivf_flat": {
+        "index": {"index_type": "IVF_FLAT", "params": {"nlist": 1024}},
+        "search": {"params": {"nprobe": 16}}
+    },
+    "ivf_pq": {
+        # m must divide the vector dimension (1024 for BGE-large)
+        "index": {"index_type": "IVF_PQ", "params": {"nlist": 2048, "m": 64, "nbits": 8}},
+        "search": {"params": {"nprobe": 32}}
+    },
+    # Binary vectors (compression method "binary") only take the BIN_* indexes
+    "bin_flat": {
+        "index": {"index_type": "BIN_FLAT", "params": {}},
+        "search": {"params": {}}
+    },
+    "bin_ivf_flat": {
+        "index": {"index_type": "BIN_IVF_FLAT", "params": {"nlist": 1024}},
+        "search": {"params": {"nprobe": 16}}
+    },
+}
+
 
 class MilvusManager:
-    def __init__(self, connection_args: Dict, collection_name: str, host: str, port: str):
+    def __init__(self, connection_args: Dict, collection_name: str, host: str, port: str, auto_id: bool = True,
+                 query_cache_size: int = 1024, query_cache_ttl: float = 3600,
+                 index_profile: str = "hnsw", metric_type: str = "L2",
+                 enable_sparse: bool = False, sparse_stats_path: Optional[str] = None,
+                 typed_metadata: bool = False, compression: Optional[Dict] = None):
         self.connection_args = connection_args
         self.collection_name = collection_name
         self.host = host
         self.port = port
+        # With auto_id disabled, primary keys are the chunks' deterministic doc_id
+        self.auto_id = auto_id
+        # Stored vector type, e.g. {"method": "float16"}; see embedding_provider.compression
+        self.compressor = build_compressor(compression)
+        if self.compressor is not None and self.compressor.metric_type:
+            metric_type = self.compressor.metric_type
+        if metric_type == "HAMMING" and not index_profile.startswith("bin_"):
+            logger.info(f"Binary vectors can't use index profile '{index_profile}', using 'bin_ivf_flat'")
+            index_profile = "bin_ivf_flat"
+        self.metric_type = metric_type
+        self.index_profile = self._check_profile(index_profile)
+        # Corpus statistics for BM25 are kept on disk so weights stay consistent across runs
+        self.sparse_encoder = BM25Encoder(path=sparse_stats_path) if enable_sparse else None
+        # Filterable metadata gets real schema fields with inverted indexes
+        self.typed_metadata = typed_metadata
         self.vector_store = None
+        # Repeated questions skip the embedding round trip
+        self.query_cache = QueryEmbeddingCache(max_entries=query_cache_size, ttl=query_cache_ttl)
+        # Per-stage query latencies (embed, search; rerank is recorded by EmbeddingService)
+        self.timer = StageTimer()
 
         # Establish connection to Milvus
         self._connect()
@@ -35,57 +129,484 @@ class MilvusManager:
             logger.error(f"Failed to connect to Milvus: {e}")
             raise Exception(f"Milvus connection failed: {e}")
 
+    @staticmethod
+    def _check_profile(profile: str) -> str:
+        if profile not in INDEX_PROFILES:
+            raise Exception(f"Unknown index profile '{profile}', expected one of {sorted(INDEX_PROFILES)}")
+        return profile
+
+    def index_params(self, profile: Optional[str] = None) -> Dict:
+        params = dict(INDEX_PROFILES[profile or self.index_profile]["index"])
+        params["metric_type"] = self.metric_type
+        return params
+
+    def search_params(self, profile: Optional[str] = None, **overrides) -> Dict:
+        """Search parameters of a profile, e.g. search_params("hnsw", ef=128)"""
+        params = dict(INDEX_PROFILES[profile or self.index_profile]["search"]["params"], **overrides)
+        return {"metric_type": self.metric_type, "params": params}
+
+    def _vector_spec(self, embedding_provider):
+        """(DataType, dim) of the vector field for the embedding model and the configured compression"""
+        dim = len(embedding_provider.embed_query("dimension probe"))
+        if self.compressor is None:
+            return DataType.FLOAT_VECTOR, dim
+        return getattr(DataType, self.compressor.vector_dtype), self.compressor.output_dim(dim)
+
+    def _create_explicit_collection(self, embedding_provider):
+        """Create the collection ourselves when it needs fields langchain_milvus can't derive"""
+        vector_dtype, dim = self._vector_spec(embedding_provider)
+
+        if self.auto_id:
+            pk = FieldSchema("pk", DataType.INT64, is_primary=True, auto_id=True)
+        else:
+            pk = FieldSchema("pk", DataType.VARCHAR, is_primary=True, max_length=512)
+        fields = [
+            pk,
+            FieldSchema("text", DataType.VARCHAR, max_length=65535),
+            FieldSchema("vector", vector_dtype, dim=dim),
+        ]
+        if self.sparse_encoder is not None:
+            fields.append(FieldSchema(SPARSE_FIELD, DataType.SPARSE_FLOAT_VECTOR))
+        if self.typed_metadata:
+            fields.extend(FieldSchema(name, dtype, **params) for name, (dtype, params) in METADATA_FIELDS.items())
+
+        # Remaining metadata goes to the dynamic field
+        collection = Collection(self.collection_name, CollectionSchema(fields, enable_dynamic_field=True))
+        collection.create_index(field_name="vector", index_params=self.index_params())
+        if self.sparse_encoder is not None:
+            collection.create_index(field_name=SPARSE_FIELD, index_params=SPARSE_INDEX_PARAMS)
+        if self.typed_metadata:
+            for name in METADATA_FIELDS:
+                collection.create_index(field_name=name, index_params=METADATA_INDEX_PARAMS)
+        collection.load()
+        logger.info(f"Created collection {self.collection_name} with fields {[field.name for field in fields]}")
+
+    def _required_fields(self) -> List[str]:
+        """Fields the configured options need on top of langchain_milvus' default schema"""
+        fields = []
+        if self.sparse_encoder is not None:
+            fields.append(SPARSE_FIELD)
+        if self.typed_metadata:
+            # build_filter expressions reference these as real fields
+            fields.extend(METADATA_FIELDS)
+        return fields
+
+    def _check_existing_schema(self, embedding_provider):
+        """Refuse to reuse a collection created without the fields or vector type the configuration relies on"""
+        fields = {field.name: field for field in Collection(self.collection_name).schema.fields}
+        problems = []
+        missing = [name for name in self._required_fields() if name not in fields]
+        if missing:
+            problems.append(f"without fields {missing}")
+
+        # Created under another compression setting or embedding model, inserts and searches would fail later
+        vector_dtype, dim = self._vector_spec(embedding_provider)
+        vector = fields.get("vector")
+        if vector is not None:
+            existing_dim = vector.params.get("dim")
+            if vector.dtype != vector_dtype or (existing_dim is not None and int(existing_dim) != dim):
+                problems.append(f"with vector field {vector.dtype.name}({existing_dim}), expected "
+                                f"{vector_dtype.name}({dim})")
+
+        if problems:
+            message = (f"Collection {self.collection_name} exists {' and '.join(problems)}; migrate it "
+                       f"(re-create and re-ingest) or change the options to match it")
+            logger.error(message)
+            raise Exception(message)
+
     def create_collection(self, embedding_provider):
         """Create Milvus vector store using langchain_milvus (the reliable way)"""
         try:
+            explicit = self._native_insert
+            if utility.has_collection(self.collection_name):
+                self._check_existing_schema(embedding_provider)
+            elif explicit:
+                self._create_explicit_collection(embedding_provider)
+
             # Use langchain_milvus which handles schema creation much better
             self.vector_store = Milvus(
                 collection_name=self.collection_name,
                 embedding_function=embedding_provider,
                 connection_args=self.connection_args,
-                auto_id=True,
+                auto_id=self.auto_id,
+                # Index type, build and search parameters come from the configured profile
+                index_params=self.index_params(),
+                search_params=self.search_params(),
+                enable_dynamic_field=explicit,
                 # langchain_milvus handles all the schema creation automatically
                 # without the DataType issues we had before
             )
 
+            # Cached query vectors belong to the previous embedding model
+            self.query_cache.clear()
+
             logger.info(f"Successfully created vector store for collection: {self.collection_name}")
 
         except Exception as e:
             logger.error(f"Failed to create collection: {e}")
             raise Exception(f"Collection creation failed: {e}")
 
+    def _ids_for(self, metadatas: Optional[List[Dict]]) -> Optional[List[str]]:
+        """Deterministic primary keys taken from each chunk's doc_id"""
+        if self.auto_id:
+            return None
+        if not metadatas or any("doc_id" not in metadata for metadata in metadatas):
+            raise Exception("doc_id metadata is required when auto_id is disabled")
+        return [metadata["doc_id"] for metadata in metadatas]
+
     def add_texts(self, texts: List[str], metadatas: List[Dict] = None) -> List[str]:
         """Add texts to the vector store"""
         if not self.vector_store:
             raise Exception("Collection not initialized. Call create_collection() first.")
 
         try:
+            if self._native_insert:
+                # langchain_milvus doesn't fill the sparse or typed fields, so go through the native path
+                embeddings = self.vector_store.embedding_func.embed_documents(texts)
+                return self.bulk_insert(texts, embeddings, metadatas, flush=False)
+
             # langchain_milvus handles metadata much better - no need for extensive cleaning
-            return self.vector_store.add_texts(texts, metadatas=metadatas)
+            return self.vector_store.add_texts(texts, metadatas=metadatas, ids=self._ids_for(metadatas))
 
         except Exception as e:
             logger.error(f"Failed to add texts: {e}")
             raise Exception(f"Failed to add texts to Milvus: {e}")
 
-    def similarity_search(self, query: str, k: int = 5) -> List[Dict]:
-        """Search for similar texts"""
+    def add_embeddings(self, texts: List[str], embeddings, metadatas: List[Dict] = None) -> List[str]:
+        """Add texts with precomputed embeddings to the vector store"""
+        if not self.vector_store:
+            raise Exception("Collection not initialized. Call create_collection() first.")
+
+        try:
+            if self._native_insert and self.vector_store.col is not None:
+                return self.bulk_insert(texts, embeddings, metadatas, flush=False)
+
+            # Rows are views into one contiguous float32 matrix, pymilvus takes them as-is
+            matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+            return self.vector_store.add_embeddings(texts, list(matrix), metadatas=metadatas,
+                                                    ids=self._ids_for(metadatas))
+
+        except Exception as e:
+            logger.error(f"Failed to add embeddings: {e}")
+            raise Exception(f"Failed to add embeddings to Milvus: {e}")
+
+    @property
+    def _native_insert(self) -> bool:
+        return self.sparse_encoder is not None or self.typed_metadata or self.compressor is not None
+
+    def _stored_vectors(self, matrix: np.ndarray) -> List:
+        """Vectors in the collection's stored form"""
+        if self.compressor is None:
+            return matrix
+        return self.compressor.to_rows(self.compressor.encode(matrix))
+
+    @staticmethod
+    def _scalar_value(metadata: Dict, field):
+        value = metadata.get(field.name)
+        return SCALAR_DEFAULTS.get(field.dtype) if value is None else value
+
+    def _insert_fields(self) -> List:
+        """Schema fields a client insert must supply (everything but an auto_id primary key)"""
+        return [field for field in self.vector_store.col.schema.fields if not (field.is_primary and field.auto_id)]
+
+    def _sparse_column(self, texts: List[str]) -> Optional[List[Dict[int, float]]]:
+        if self.sparse_encoder is None:
+            return None
+        self.sparse_encoder.partial_fit(texts)
+        return self.sparse_encoder.encode_documents(texts)
+
+    def _build_columns(self, texts: List[str], matrix: np.ndarray, metadatas: List[Dict], ids: Optional[List]) -> List:
+        columns = []
+        for field in self._insert_fields():
+            if field.is_primary:
+                columns.append(ids)
+            elif field.name == self.vector_store._text_field:
+                columns.append(texts)
+            elif field.name == self.vector_store._vector_field:
+                columns.append(self._stored_vectors(matrix))
+            elif field.name == SPARSE_FIELD:
+                columns.append(self._sparse_column(texts))
+            else:
+                columns.append([self._scalar_value(metadata, field) for metadata in metadatas])
+        return columns
+
+    def _build_rows(self, texts: List[str], matrix: np.ndarray, metadatas: List[Dict], ids: Optional[List]) -> List[Dict]:
+        """Row form, needed when metadata keys outside the schema go to the dynamic field"""
+        sparse = self._sparse_column(texts)
+        vectors = self._stored_vectors(matrix)
+        scalar_fields = [field for field in self._insert_fields() if field.name in METADATA_FIELDS]
+        rows = []
+        for i, (text, metadata) in enumerate(zip(texts, metadatas)):
+            row = dict(metadata)
+            for field in scalar_fields:
+                row[field.name] = self._scalar_value(metadata, field)
+            row[self.vector_store._text_field] = text
+            row[self.vector_store._vector_field] = vectors[i]
+            if sparse is not None:
+                row[SPARSE_FIELD] = sparse[i]
+            if ids is not None:
+                row[self.vector_store._primary_field] = ids[i]
+            rows.append(row)
+        return rows
+
+    def bulk_insert(self, texts: List[str], embeddings, metadatas: List[Dict] = None,
+                    batch_size: int = 10000, flush: bool = True) -> List:
+        """Insert precomputed vectors straight through pymilvus in large columnar batches"""
         if not self.vector_store:
             raise Exception("Collection not initialized. Call create_collection() first.")
+        if not texts:
+            return []
+
+        metadatas = metadatas or [{} for _ in texts]
+        matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+        ids = self._ids_for(metadatas)
+        inserted = []
+
+        try:
+            start = 0
+            if self.vector_store.col is None:
+                # langchain_milvus derives the schema from the first row it inserts
+                inserted.extend(self.add_embeddings(texts[:1], matrix[:1], metadatas[:1]))
+                start = 1
+
+            collection = self.vector_store.col
+            dynamic = collection.schema.enable_dynamic_field
+            for begin in range(start, len(texts), batch_size):
+                end = min(begin + batch_size, len(texts))
+                batch_ids = ids[begin:end] if ids is not None else None
+                build = self._build_rows if dynamic else self._build_columns
+                result = collection.insert(build(texts[begin:end], matrix[begin:end], metadatas[begin:end], batch_ids))
+                inserted.extend(result.primary_keys)
+                logger.info(f"Bulk inserted {end - begin} rows into {self.collection_name} ({end}/{len(texts)})")
+
+            if flush:
+                collection.flush()
+                self.save_sparse_stats()
+            return inserted
+
+        except Exception as e:
+            logger.error(f"Bulk insert failed: {e}")
+            raise Exception(f"Bulk insert into Milvus failed: {e}")
+
+    def write_parquet(self, path: str, texts: List[str], embeddings, metadatas: List[Dict] = None):
+        """Write rows as a Parquet file laid out for Milvus bulk import"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not self.vector_store or self.vector_store.col is None:
+            raise Exception("Collection must exist before writing import files")
+        if self.compressor is not None:
+            raise Exception("Import files are only written for uncompressed float vectors")
+
+        metadatas = metadatas or [{} for _ in texts]
+        matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+        ids = self._ids_for(metadatas)
+
+        fields = self._insert_fields()
+        columns = self._build_columns(texts, matrix, metadatas, ids)
+        arrays = {}
+        for field, column in zip(fields, columns):
+            if field.name == self.vector_store._vector_field:
+                # Fixed-size lists of float32 without copying the matrix
+                arrays[field.name] = pa.FixedSizeListArray.from_arrays(pa.array(matrix.reshape(-1)), matrix.shape[1])
+            elif field.name == SPARSE_FIELD:
+                # Bulk import reads sparse vectors as JSON {index: value} strings
+                arrays[field.name] = pa.array([json.dumps(vector) for vector in column])
+            else:
+                arrays[field.name] = pa.array(column)
+
+        pq.write_table(pa.table(arrays), path)
+        logger.info(f"Wrote {len(texts)} rows to {path}")
+
+    def import_files(self, files: List[str], timeout: float = 3600, poll_interval: float = 5) -> List[int]:
+        """Run Milvus bulk import for files already uploaded to the Milvus object store, one task per file"""
+        task_ids = [utility.do_bulk_insert(collection_name=self.collection_name, files=[file]) for file in files]
+
+        deadline = time.time() + timeout
+        pending = set(task_ids)
+        while pending:
+            for task_id in list(pending):
+                state = utility.get_bulk_insert_state(task_id=task_id)
+                if state.state_name == "Completed":
+                    pending.discard(task_id)
+                    logger.info(f"Bulk import task {task_id} imported {state.row_count} rows")
+                elif state.state_name == "Failed":
+                    raise Exception(f"Bulk import task {task_id} failed: {state.failed_reason}")
+            if pending:
+                if time.time() > deadline:
+                    raise Exception(f"Bulk import timed out with tasks {sorted(pending)} unfinished")
+                time.sleep(poll_interval)
+
+        return task_ids
+
+    def _stored_texts(self, ids: List) -> List[str]:
+        """Texts stored under these primary keys (missing keys are skipped)"""
+        collection = getattr(self.vector_store, "col", None)
+        if collection is None or not ids:
+            return []
+        text_field = self.vector_store._text_field
+        texts = []
+        # Keep `in` expressions to a reasonable size
+        for start in range(0, len(ids), 1000):
+            expr = build_filter({self.vector_store._primary_field: list(ids[start:start + 1000])})
+            rows = collection.query(expr=expr, output_fields=[text_field])
+            texts.extend(row[text_field] for row in rows)
+        return texts
+
+    def delete(self, ids: List) -> None:
+        """Delete entries by primary key"""
+        if not self.vector_store:
+            raise Exception("Collection not initialized. Call create_collection() first.")
+
+        try:
+            # BM25 statistics must not keep counting deleted chunks
+            removed = self._stored_texts(ids) if self.sparse_encoder is not None else []
+            self.vector_store.delete(ids=ids)
+            if removed:
+                self.sparse_encoder.remove(removed)
+
+        except Exception as e:
+            logger.error(f"Failed to delete entries: {e}")
+            raise Exception(f"Failed to delete entries from Milvus: {e}")
+
+    def upsert(self, texts: List[str], embeddings, metadatas: List[Dict],
+               batch_size: int = 1000) -> List[str]:
+        """Insert or replace entries keyed on their doc_id primary key, atomically per batch"""
+        if not self.vector_store:
+            raise Exception("Collection not initialized. Call create_collection() first.")
+        if self.auto_id:
+            raise Exception("upsert requires deterministic primary keys (auto_id=False)")
+        if not texts:
+            return []
+
+        matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if self.vector_store.col is None:
+            # Nothing stored yet to replace, and langchain_milvus creates the collection on first insert
+            return self.add_embeddings(texts, matrix, metadatas)
 
+        ids = self._ids_for(metadatas)
+        collection = self.vector_store.col
+        build = self._build_rows if collection.schema.enable_dynamic_field else self._build_columns
+        upserted = []
         try:
-            results = self.vector_store.similarity_search(query, k=k)
+            for start in range(0, len(texts), batch_size):
+                end = min(start + batch_size, len(texts))
+                if self.sparse_encoder is not None:
+                    # Replaced chunks are refitted below, so their old text leaves the BM25 statistics first
+                    self.sparse_encoder.remove(self._stored_texts(ids[start:end]))
+                result = collection.upsert(build(texts[start:end], matrix[start:end], metadatas[start:end],
+                                                 ids[start:end]))
+                upserted.extend(result.primary_keys)
+            return upserted
+
+        except Exception as e:
+            logger.error(f"Failed to upsert entries: {e}")
+            raise Exception(f"Failed to upsert entries into Milvus: {e}")
+
+    def query_source(self, source_url: str) -> Dict[str, object]:
+        """Map doc_id -> primary key for every chunk stored for source_url"""
+        if not self.vector_store:
+            raise Exception("Collection not initialized. Call create_collection() first.")
+
+        # The collection only exists once the first chunks have been inserted
+        collection = getattr(self.vector_store, "col", None)
+        if collection is None:
+            return {}
+
+        pk_field = self.vector_store._primary_field
+        try:
+            rows = collection.query(expr=build_filter({"source_url": source_url}), output_fields=[pk_field, "doc_id"])
+            return {row.get("doc_id"): row[pk_field] for row in rows}
+        except Exception as e:
+            logger.error(f"Failed to query chunks of {source_url}: {e}")
+            raise Exception(f"Failed to query Milvus: {e}")
+
+    def replace_source(self, source_url: str, docs: List, embeddings=None) -> Dict:
+        """Make the stored chunks of source_url match docs, inserting and deleting only the difference"""
+        existing = self.query_source(source_url)
+        new_ids = {doc.metadata["doc_id"] for doc in docs}
+
+        stale_pks = [pk for doc_id, pk in existing.items() if doc_id not in new_ids]
+        positions = [i for i, doc in enumerate(docs) if doc.metadata["doc_id"] not in existing]
+
+        if stale_pks:
+            self.delete(stale_pks)
+
+        inserted = []
+        if positions:
+            texts = [docs[i].page_content for i in positions]
+            metadatas = [docs[i].metadata for i in positions]
+            if embeddings is None:
+                inserted = self.add_texts(texts, metadatas)
+            else:
+                inserted = self.add_embeddings(texts, np.asarray(embeddings, dtype=np.float32)[positions], metadatas)
+
+        kept = [pk for doc_id, pk in existing.items() if doc_id in new_ids]
+        logger.info(f"Replaced {source_url}: {len(inserted)} inserted, {len(stale_pks)} deleted, "
+                    f"{len(kept)} unchanged")
+
+        return {
+            "milvus_ids": kept + list(inserted),
+            "inserted": list(inserted),
+            "deleted": stale_pks,
+            "unchanged": len(kept)
+        }
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Query vectors from the LRU cache, embedding all misses in one provider call"""
+        with self.timer.time("embed"):
+            return self._embed_queries(queries)
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        vectors = [self.query_cache.get(query) for query in queries]
+
+        missing = list(dict.fromkeys(query for query, vector in zip(queries, vectors) if vector is None))
+        if missing:
+            embedding_func = self.vector_store.embedding_func
+            # Query semantics however many queries miss; plain langchain Embeddings only have embed_query
+            if hasattr(embedding_func, "embed_queries"):
+                computed = embedding_func.embed_queries(missing)
+            else:
+                computed = [embedding_func.embed_query(query) for query in missing]
+            for query, vector in zip(missing, computed):
+                self.query_cache.put(query, vector)
+            by_query = dict(zip(missing, computed))
+            vectors = [by_query[query] if vector is None else vector for query, vector in zip(queries, vectors)]
+
+        return vectors
+
+    def similarity_search(self, query: str, k: int = 5, filter=None) -> List[Dict]:
+        """Search for similar texts; filter is a Milvus expression or a dict for build_filter"""
+        if not self.vector_store:
+            raise Exception("Collection not initialized. Call create_collection() first.")
+
+        if self.compressor is not None:
+            # langchain_milvus only sends float32 vectors, compressed fields are searched natively
+            results = self.search_many([query], k, filter)[0]
+            return [{"content": r["content"], "metadata": r["metadata"]} for r in results]
+
+        try:
+            vector = self.embed_queries([query])[0]
+            with self.timer.time("search"):
+                results = self.vector_store.similarity_search_by_vector(vector, k=k, expr=build_filter(filter))
             return [{"content": doc.page_content, "metadata": doc.metadata} for doc in results]
         except Exception as e:
             logger.error(f"Similarity search failed: {e}")
             raise Exception(f"Similarity search failed: {e}")
 
-    def similarity_search_with_score(self, query: str, k: int = 5) -> List[Dict]:
+    def similarity_search_with_score(self, query: str, k: int = 5, filter=None) -> List[Dict]:
         """Search for similar texts with scores"""
         if not self.vector_store:
             raise Exception("Collection not initialized. Call create_collection() first.")
 
+        if self.compressor is not None:
+            return self.search_many([query], k, filter)[0]
+
         try:
-            results = self.vector_store.similarity_search_with_score(query, k=k)
+            vector = self.embed_queries([query])[0]
+            with self.timer.time("search"):
+                results = self.vector_store.similarity_search_with_score_by_vector(vector, k=k,
+                                                                                   expr=build_filter(filter))
             return [
                 {
                     "content": doc.page_content,
@@ -98,12 +619,182 @@ class MilvusManager:
             logger.error(f"Similarity search with score failed: {e}")
             raise Exception(f"Similarity search with score failed: {e}")
 
+    def _hit_to_result(self, hit, output_fields: List[str]) -> Dict:
+        metadata = {field: hit.entity.get(field) for field in output_fields}
+        content = metadata.pop(self.vector_store._text_field, "")
+        return {"content": content, "metadata": metadata, "score": hit.distance}
+
+    def _output_fields(self) -> List[str]:
+        vector_fields = (self.vector_store._vector_field, SPARSE_FIELD)
+        return [field for field in self.vector_store.fields if field not in vector_fields]
+
+    def _query_rows(self, vectors) -> List:
+        """Query vectors in the collection's stored form"""
+        if self.compressor is None:
+            return vectors
+        return self._stored_vectors(np.asarray(vectors, dtype=np.float32))
+
+    def _rerank(self, vector, hits, k: int, output_fields: List[str]) -> List[Dict]:
+        stored = [hit.entity.get(self.vector_store._vector_field) for hit in hits]
+        if not stored:
+            return []
+        scores = self.compressor.rerank(self.compressor.transform(np.asarray([vector]))[0], stored)
+        results = []
+        for position in np.argsort(-scores)[:k]:
+            result = self._hit_to_result(hits[position], output_fields)
+            result["score"] = float(scores[position])
+            results.append(result)
+        return results
+
+    def search_vectors(self, vectors: List[List[float]], k: int = 5, search_params: Optional[Dict] = None,
+                       output_fields: Optional[List[str]] = None, expr: Optional[str] = None):
+        """Raw multi-vector ANN search with vectors already in stored form; returns pymilvus hits per vector"""
+        if not self.vector_store or self.vector_store.col is None:
+            raise Exception("Collection not initialized. Call create_collection() first.")
+
+        with self.timer.time("search"):
+            return self.vector_store.col.search(
+                data=vectors,
+                anns_field=self.vector_store._vector_field,
+                param=search_params or self.vector_store.search_params,
+                limit=k,
+                expr=expr,
+                output_fields=output_fields
+            )
+
+    def search_many(self, queries: List[str], k: int = 5, filter=None) -> List[List[Dict]]:
+        """Search several queries with one embedding call and one multi-vector Milvus search"""
+        if not self.vector_store:
+            raise Exception("Collection not initialized. Call create_collection() first.")
+        if not queries:
+            return []
+
+        try:
+            vectors = self.embed_queries(queries)
+            output_fields = self._output_fields()
+
+            rerank_factor = self.compressor.rerank_factor if self.compressor is not None else 0
+            if rerank_factor:
+                # Over-fetch by Hamming distance, then order candidates by the float query
+                results = self.search_vectors(self._query_rows(vectors), k * rerank_factor, expr=build_filter(filter),
+                                              output_fields=output_fields + [self.vector_store._vector_field])
+                return [self._rerank(vector, hits, k, output_fields) for vector, hits in zip(vectors, results)]
+
+            results = self.search_vectors(self._query_rows(vectors), k, output_fields=output_fields,
+                                          expr=build_filter(filter))
+            return [[self._hit_to_result(hit, output_fields) for hit in hits] for hits in results]
+        except Exception as e:
+            logger.error(f"Multi-query search failed: {e}")
+            raise Exception(f"Multi-query search failed: {e}")
+
+    def hybrid_search(self, query: str, k: int = 5, candidate_k: Optional[int] = None, rrf_k: int = 60,
+                      filter=None) -> List[Dict]:
+        """Dense + BM25 sparse search fused with reciprocal rank fusion, in one Milvus round trip"""
+        if not self.vector_store or self.vector_store.col is None:
+            raise Exception("Collection not initialized. Call create_collection() first.")
+        if self.sparse_encoder is None:
+            raise Exception("Hybrid search requires enable_sparse=True")
+
+        candidate_k = candidate_k or max(k * 4, 20)
+        # Both candidate lists are filtered, so fusion only sees matching chunks
+        expr = build_filter(filter)
+        try:
+            dense_vector = self.embed_queries([query])[0]
+            sparse_vector = self.sparse_encoder.encode_queries([query])[0]
+
+            requests = [AnnSearchRequest(
+                data=self._query_rows([dense_vector]),
+                anns_field=self.vector_store._vector_field,
+                param=self.vector_store.search_params,
+                limit=candidate_k,
+                expr=expr
+            )]
+            # A query made only of unseen terms has nothing to match on the sparse side
+            if sparse_vector:
+                requests.append(AnnSearchRequest(
+                    data=[sparse_vector],
+                    anns_field=SPARSE_FIELD,
+                    param=SPARSE_SEARCH_PARAMS,
+                    limit=candidate_k,
+                    expr=expr
+                ))
+
+            output_fields = self._output_fields()
+            with self.timer.time("search"):
+                results = self.vector_store.col.hybrid_search(
+                    requests,
+                    rerank=RRFRanker(rrf_k),
+                    limit=k,
+                    output_fields=output_fields
+                )
+            return [self._hit_to_result(hit, output_fields) for hit in results[0]]
+        except Exception as e:
+            logger.error(f"Hybrid search failed: {e}")
+            raise Exception(f"Hybrid search failed: {e}")
+
+    def save_sparse_stats(self):
+        if self.sparse_encoder is not None:
+            self.sparse_encoder.save()
+
+    def rebuild_sparse_stats(self, batch_size: int = 1000):
+        """Recompute the BM25 statistics from the texts stored in the collection
+
+        For statistics persisted before deletes were subtracted, or edited outside this class.
+        """
+        if self.sparse_encoder is None:
+            return
+        collection = getattr(self.vector_store, "col", None) if self.vector_store else None
+        self.sparse_encoder.reset()
+        if collection is not None:
+            text_field = self.vector_store._text_field
+            iterator = collection.query_iterator(batch_size=batch_size, output_fields=[text_field])
+            try:
+                while True:
+                    rows = iterator.next()
+                    if not rows:
+                        break
+                    self.sparse_encoder.partial_fit([row[text_field] for row in rows])
+            finally:
+                iterator.close()
+        self.save_sparse_stats()
+        logger.info(f"Rebuilt BM25 statistics from {self.sparse_encoder.doc_count} stored chunks")
+
+    def rebuild_index(self, profile: Optional[str] = None):
+        """Drop the vector index and build it again with the given profile"""
+        if not self.vector_store or self.vector_store.col is None:
+            raise Exception("Collection not initialized. Call create_collection() first.")
+
+        profile = self._check_profile(profile or self.index_profile)
+        collection = self.vector_store.col
+        vector_field = self.vector_store._vector_field
+
+        try:
+            collection.release()
+            for index in list(collection.indexes):
+                if index.field_name == vector_field:
+                    index.drop()
+
+            collection.create_index(field_name=vector_field, index_params=self.index_params(profile))
+            collection.load()
+
+            self.index_profile = profile
+            self.vector_store.index_params = self.index_params(profile)
+            self.vector_store.search_params = self.search_params(profile)
+            logger.info(f"Rebuilt {self.collection_name} vector index with profile '{profile}'")
+
+        except Exception as e:
+            logger.error(f"Failed to rebuild index: {e}")
+            raise Exception(f"Index rebuild failed: {e}")
+
     def drop_collection(self):
         """Drop the collection"""
         try:
             if self.vector_store and hasattr(self.vector_store, 'col'):
                 self.vector_store.col.drop()
                 logger.info(f"Dropped collection: {self.collection_name}")
+                if self.sparse_encoder is not None:
+                    self.sparse_encoder.reset()
+                    self.save_sparse_stats()
         except Exception as e:
             logger.error(f"Failed to drop collection: {e}")
 
@@ -0,0 +1,197 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import Counter
+import json
+import logging
+import math
+import os
+import re
+import threading
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Words, plus identifiers such as "22/806", "8(2)", "2019/2088" or "art.8" kept whole
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:(?:[/.\-][a-z0-9]+)|(?:\([a-z0-9]+\)))*")
+PART_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased tokens; compound identifiers are emitted whole and as their parts"""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group(0)
+        tokens.append(token)
+        parts = PART_PATTERN.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def term_id(term: str) -> int:
+    """Stable sparse dimension for a term (Milvus sparse indices are uint32)"""
+    return zlib.crc32(term.encode("utf-8")) & 0x7FFFFFFF
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List], k: int = 60, limit: Optional[int] = None) -> List[Tuple]:
+    """Fuse ranked id lists; returns (id, score) pairs, best first"""
+    scores: Dict = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank + 1)
+    fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return fused[:limit] if limit else fused
+
+
+class BM25Encoder:
+    """BM25 weights as sparse vectors: documents carry saturated tf, queries carry idf, so IP == BM25"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, path: Optional[str] = None):
+        self.k1 = k1
+        self.b = b
+        self.path = path
+        self.doc_count = 0
+        self.total_length = 0
+        self.doc_freq: Counter = Counter()
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            self.load(path)
+
+    @property
+    def average_length(self) -> float:
+        return self.total_length / self.doc_count if self.doc_count else 1.0
+
+    def partial_fit(self, texts: List[str]):
+        """Add documents to the corpus statistics"""
+        with self._lock:
+            for text in texts:
+                terms = tokenize(text)
+                self.doc_count += 1
+                self.total_length += len(terms)
+                self.doc_freq.update(str(term_id(term)) for term in set(terms))
+
+    def remove(self, texts: List[str]):
+        """Take deleted documents out of the corpus statistics"""
+        with self._lock:
+            for text in texts:
+                terms = tokenize(text)
+                self.doc_count = max(self.doc_count - 1, 0)
+                self.total_length = max(self.total_length - len(terms), 0)
+                self.doc_freq.subtract(str(term_id(term)) for term in set(terms))
+            # Counter.subtract keeps zero and negative counts
+            self.doc_freq = Counter({dimension: df for dimension, df in self.doc_freq.items() if df > 0})
+
+    def reset(self):
+        with self._lock:
+            self.doc_count = 0
+            self.total_length = 0
+            self.doc_freq = Counter()
+
+    def idf(self, dimension: int) -> float:
+        df = self.doc_freq.get(str(dimension), 0)
+        return math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+
+    def encode_documents(self, texts: List[str]) -> List[Dict[int, float]]:
+        average_length = self.average_length
+        vectors = []
+        for text in texts:
+            terms = tokenize(text)
+            norm = self.k1 * (1 - self.b + self.b * len(terms) / average_length)
+            counts = Counter(term_id(term) for term in terms)
+            vectors.append({
+                dimension: tf * (self.k1 + 1) / (tf + norm)
+                for dimension, tf in counts.items()
+            })
+        return vectors
+
+    def encode_queries(self, texts: List[str]) -> List[Dict[int, float]]:
+        vectors = []
+        for text in texts:
+            dimensions = {term_id(term) for term in tokenize(text)}
+            # Terms never seen in the corpus can't match anything
+            vectors.append({
+                dimension: self.idf(dimension)
+                for dimension in dimensions
+                if self.doc_freq.get(str(dimension))
+            })
+        return vectors
+
+    def save(self, path: Optional[str] = None):
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            state = {
+                "k1": self.k1,
+                "b": self.b,
+                "doc_count": self.doc_count,
+                "total_length": self.total_length,
+                "doc_freq": dict(self.doc_freq)
+            }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as stats_file:
+            json.dump(state, stats_file)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str):
+        with open(path, encoding="utf-8") as stats_file:
+            state = json.load(stats_file)
+        self.k1 = state["k1"]
+        self.b = state["b"]
+        self.doc_count = state["doc_count"]
+        self.total_length = state["total_length"]
+        self.doc_freq = Counter(state["doc_freq"])
+        logger.info(f"Loaded BM25 statistics for {self.doc_count} documents from {path}")
+
+
+class InMemoryHybridIndex:
+    """Local stand-in for the Milvus dense + sparse collection, brute force and server-free"""
+
+    def __init__(self, encoder: Optional[BM25Encoder] = None, metric_type: str = "IP"):
+        self.encoder = encoder or BM25Encoder()
+        self.metric_type = metric_type
+        self.ids: List = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict] = []
+        self.dense: List[List[float]] = []
+        self.postings: Dict[int, List[Tuple[int, float]]] = {}
+
+    def add(self, ids: List, texts: List[str], vectors, metadatas: Optional[List[Dict]] = None):
+        self.encoder.partial_fit(texts)
+        start = len(self.ids)
+        for offset, sparse in enumerate(self.encoder.encode_documents(texts)):
+            for dimension, weight in sparse.items():
+                self.postings.setdefault(dimension, []).append((start + offset, weight))
+
+        self.ids.extend(ids)
+        self.texts.extend(texts)
+        self.metadatas.extend(metadatas or [{} for _ in texts])
+        self.dense.extend([float(x) for x in vector] for vector in vectors)
+
+    def _dense_ranking(self, query_vector, limit: int) -> List[int]:
+        query = [float(x) for x in query_vector]
+        if self.metric_type == "L2":
+            scored = [(-sum((a - b) ** 2 for a, b in zip(query, vector)), i) for i, vector in enumerate(self.dense)]
+        else:
+            scored = [(sum(a * b for a, b in zip(query, vector)), i) for i, vector in enumerate(self.dense)]
+        scored.sort(reverse=True)
+        return [i for _, i in scored[:limit]]
+
+    def _sparse_ranking(self, query_text: str, limit: int) -> List[int]:
+        scores: Dict[int, float] = {}
+        for dimension, weight in self.encoder.encode_queries([query_text])[0].items():
+            for position, doc_weight in self.postings.get(dimension, []):
+                scores[position] = scores.get(position, 0.0) + weight * doc_weight
+        return [i for i, _ in sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]]
+
+    def hybrid_search(self, query_text: str, query_vector, k: int = 5, candidate_k: int = 50,
+                      rrf_k: int = 60) -> List[Dict]:
+        rankings = [self._dense_ranking(query_vector, candidate_k), self._sparse_ranking(query_text, candidate_k)]
+        return [
+            {
+                "content": self.texts[position],
+                "metadata": dict(self.metadatas[position], pk=self.ids[position]),
+                "score": score
+            }
+            for position, score in reciprocal_rank_fusion(rankings, k=rrf_k, limit=k)
+        ]
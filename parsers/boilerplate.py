@@ -0,0 +1,217 @@
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+import hashlib
+import logging
+import math
+import os
+import sqlite3
+import threading
+
+from lxml import html as lxml_html
+
+logger = logging.getLogger(__name__)
+
+# Dropped on every site
+COMMON_DROP = ["script", "style", "noscript", "nav", "header", "footer", "form", "button", "iframe", "aside"]
+
+# Per-site extraction templates: subtrees inside each parser's content blocks that are never content
+SITE_TEMPLATES = {
+    "www.cssf.lu": {
+        "drop": [
+            "[class*=cookie]", "[id*=cookie]", "[class*=breadcrumb]", "[class*=related]", "[class*=share]",
+            "[class*=social]", "[class*=newsletter]", "[class*=pagination]", "[class*=back-to-top]",
+            "[class*=print]",
+        ],
+    },
+    "eur-lex.europa.eu": {
+        "drop": [
+            "[id*=cookie]", "[class*=cookie]", ".linkToTop", "[class*=disclaimer]", "[class*=breadcrumb]",
+        ],
+    },
+}
+
+# Candidate blocks for the learned fingerprint list
+BLOCK_TAGS = ("div", "section", "ul", "ol", "p", "table", "dl")
+
+
+def _fingerprint(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class BoilerplateCleaner:
+    """Strips boilerplate subtrees with lxml before partition_html
+
+    Besides the per-site template selectors it learns repeated blocks: a block whose normalized text
+    shows up on min_pages distinct pages of the same host is dropped from then on. Fingerprint counts
+    and savings live in SQLite, so they are shared by parser pool processes and kept across runs.
+    """
+
+    def __init__(self, path: str = "boilerplate.sqlite", templates: Optional[Dict] = None, min_pages: int = 5,
+                 min_block_chars: int = 40, chunk_chars: int = 1800):
+        self.path = path
+        self.templates = SITE_TEMPLATES if templates is None else templates
+        self.min_pages = min_pages
+        self.min_block_chars = min_block_chars
+        # Used to turn dropped text into an estimate of chunks no longer embedded
+        self.chunk_chars = chunk_chars
+        self._conn = None
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._connection()
+
+    def __getstate__(self):
+        # Pickled into parser pool processes, which open their own connection
+        state = dict(self.__dict__)
+        state["_conn"] = None
+        state["_lock"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS block_pages (
+                    host TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    url_hash TEXT NOT NULL,
+                    PRIMARY KEY (host, fingerprint, url_hash)
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS savings (
+                    host TEXT PRIMARY KEY,
+                    pages INTEGER NOT NULL DEFAULT 0,
+                    bytes_in INTEGER NOT NULL DEFAULT 0,
+                    bytes_out INTEGER NOT NULL DEFAULT 0,
+                    blocks_dropped INTEGER NOT NULL DEFAULT 0,
+                    chars_dropped INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _observe(self, host: str, url: str, fingerprints: List[str]) -> set:
+        """Record the page for each block fingerprint; return those now seen on min_pages distinct pages
+
+        Pages are counted by URL, so re-parsing a page (a retry, or a later crawl) never makes its own
+        blocks look repeated.
+        """
+        if not fingerprints:
+            return set()
+        conn = self._connection()
+        url_hash = _fingerprint(url)
+        conn.executemany(
+            "INSERT OR IGNORE INTO block_pages (host, fingerprint, url_hash) VALUES (?, ?, ?)",
+            [(host, fingerprint, url_hash) for fingerprint in fingerprints]
+        )
+        repeated = set()
+        # Stay well below SQLite's host parameter limit
+        for start in range(0, len(fingerprints), 500):
+            batch = fingerprints[start:start + 500]
+            rows = conn.execute(
+                f"SELECT fingerprint FROM block_pages WHERE host = ? "
+                f"AND fingerprint IN ({','.join('?' * len(batch))}) "
+                f"GROUP BY fingerprint HAVING COUNT(*) >= ?",
+                [host] + batch + [self.min_pages]
+            ).fetchall()
+            repeated.update(fingerprint for (fingerprint,) in rows)
+        return repeated
+
+    @staticmethod
+    def _attached(element, root) -> bool:
+        return any(ancestor is root for ancestor in element.iterancestors())
+
+    def clean(self, url: str, raw_html: str) -> str:
+        """raw_html with template and learned boilerplate subtrees removed"""
+        if not raw_html.strip():
+            return raw_html
+
+        host = urlparse(url).netloc.lower()
+        root = lxml_html.fragment_fromstring(raw_html, create_parent="div")
+        page_chars = len(" ".join(root.text_content().split()))
+        dropped_blocks = 0
+        dropped_chars = 0
+
+        template = self.templates.get(host, {})
+        for selector in COMMON_DROP + template.get("drop", []):
+            for element in root.cssselect(selector):
+                if self._attached(element, root):
+                    dropped_chars += len(" ".join(element.text_content().split()))
+                    dropped_blocks += 1
+                    element.drop_tree()
+
+        blocks: Dict[str, list] = {}
+        for element in root.iter(*BLOCK_TAGS):
+            text = " ".join(element.text_content().split()).lower()
+            if len(text) >= self.min_block_chars:
+                blocks.setdefault(_fingerprint(text), []).append((element, len(text)))
+
+        with self._lock:
+            repeated = self._observe(host, url, list(blocks))
+            for fingerprint in repeated:
+                for element, chars in blocks[fingerprint]:
+                    # A block holding most of the page is the page itself, e.g. a short notice repeated verbatim
+                    if chars * 2 > page_chars or not self._attached(element, root):
+                        continue
+                    dropped_chars += chars
+                    dropped_blocks += 1
+                    element.drop_tree()
+
+            cleaned = "".join(lxml_html.tostring(child, encoding="unicode") for child in root)
+            cleaned = (root.text or "") + cleaned
+
+            conn = self._connection()
+            conn.execute(
+                """
+                INSERT INTO savings (host, pages, bytes_in, bytes_out, blocks_dropped, chars_dropped)
+                VALUES (?, 1, ?, ?, ?, ?)
+                ON CONFLICT(host) DO UPDATE SET
+                    pages = pages + 1,
+                    bytes_in = bytes_in + excluded.bytes_in,
+                    bytes_out = bytes_out + excluded.bytes_out,
+                    blocks_dropped = blocks_dropped + excluded.blocks_dropped,
+                    chars_dropped = chars_dropped + excluded.chars_dropped
+                """,
+                (host, len(raw_html.encode("utf-8")), len(cleaned.encode("utf-8")), dropped_blocks, dropped_chars)
+            )
+            conn.commit()
+
+        if dropped_blocks:
+            logger.debug(f"Dropped {dropped_blocks} boilerplate blocks ({dropped_chars} chars) from {url}")
+        return cleaned
+
+    def report(self) -> Dict:
+        """Bytes kept away from partition_html and the estimated chunks no longer embedded, per host"""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT host, pages, bytes_in, bytes_out, blocks_dropped, chars_dropped FROM savings"
+            ).fetchall()
+        return {
+            host: {
+                "pages": pages,
+                "bytes_saved": bytes_in - bytes_out,
+                "bytes_saved_ratio": (bytes_in - bytes_out) / bytes_in if bytes_in else 0.0,
+                "blocks_dropped": blocks_dropped,
+                "estimated_chunks_saved": math.ceil(chars_dropped / self.chunk_chars),
+            }
+            for host, pages, bytes_in, bytes_out, blocks_dropped, chars_dropped in rows
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
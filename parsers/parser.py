@@ -1,5 +1,15 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+import atexit
+import io
 import os
+import shutil
+import threading
+import uuid
+import weakref
 #from langchain_unstructured import UnstructuredLoader
 from unstructured.partition.html import partition_html
 from unstructured.partition.pdf import partition_pdf
@@ -7,10 +17,52 @@ from scrapy.http import HtmlResponse
 import tempfile
 import json
 from unstructured.documents.elements import Element
+from unstructured.staging.base import elements_from_dicts, elements_to_dicts
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+class ScratchSpace:
+    """Managed scratch directory for partitioners that need a real file path"""
+
+    def __init__(self, max_bytes: int = 2 * 1024 ** 3, directory: str = None):
+        self.max_bytes = max_bytes
+        self.directory = directory or tempfile.mkdtemp(prefix="cssf-parse-")
+        os.makedirs(self.directory, exist_ok=True)
+        atexit.register(shutil.rmtree, self.directory, True)
+
+    def usage(self) -> int:
+        # Scanned rather than tracked so the cap also holds across pool processes
+        return sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.is_file())
+
+    @contextmanager
+    def file(self, data: bytes, suffix: str = ""):
+        """Write data to a scratch file and remove it when the block exits"""
+        if self.usage() + len(data) > self.max_bytes:
+            raise Exception(f"Scratch space {self.directory} would exceed {self.max_bytes} bytes")
+
+        path = os.path.join(self.directory, f"{uuid.uuid4().hex}{suffix}")
+        try:
+            with open(path, "wb") as scratch_file:
+                scratch_file.write(data)
+            yield path
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def last_modified_iso(response):
+    """The response's Last-Modified header as an ISO timestamp, None when absent or malformed"""
+    value = response.headers.get("Last-Modified", b"").decode("utf-8").strip()
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
 class DocumentParser(ABC):
     @abstractmethod
     def can_process(self, url: str) -> bool:
@@ -22,20 +74,22 @@ class DocumentParser(ABC):
 
 
 class EurlexHTMLParser(DocumentParser):
+    def __init__(self, cleaner=None):
+        # Optional BoilerplateCleaner applied before partition_html
+        self.cleaner = cleaner
+
     def can_process(self, url: str) -> bool:
         return "eur-lex.europa.eu" in url and not url.lower().endswith(".pdf")
 
     def parse(self, response):
         raw_sections = response.css("div.PP4Contents").getall()
         raw_html = "\n\n".join(raw_sections)
+        if raw_html and self.cleaner:
+            raw_html = self.cleaner.clean(response.url, raw_html)
 
         if raw_html:
-            with tempfile.NamedTemporaryFile(mode="w+", suffix=".html", delete=False, encoding="utf-8") as temp_file:
-                temp_file.write(raw_html)
-                temp_file_path = temp_file.name
-
             return partition_html(
-                temp_file_path,
+                text=raw_html,
                 mode="elements",
                 unstructured_kwargs={"strategy": "hi_res"}
             )
@@ -43,20 +97,22 @@ class EurlexHTMLParser(DocumentParser):
         else: return []
 
 class CSSFHTMLParser(DocumentParser):
+    def __init__(self, cleaner=None):
+        # Optional BoilerplateCleaner applied before partition_html
+        self.cleaner = cleaner
+
     def can_process(self, url: str) -> bool:
         return "www.cssf.lu" in url and not url.lower().endswith(".pdf")
 
     def parse(self, response):
         raw_sections = response.css("div.content-section").getall()
         raw_html = "\n\n".join(raw_sections)
+        if raw_html and self.cleaner:
+            raw_html = self.cleaner.clean(response.url, raw_html)
 
         if raw_html:
-            with tempfile.NamedTemporaryFile(mode="w+", suffix=".html", delete=False, encoding="utf-8") as temp_file:
-                temp_file.write(raw_html)
-                temp_file_path = temp_file.name
-
             return partition_html(
-                temp_file_path,
+                text=raw_html,
                 mode="elements",
                 unstructured_kwargs={"strategy": "hi_res"}
             )
@@ -64,35 +120,197 @@ class CSSFHTMLParser(DocumentParser):
         else: return []
 
 class PDFParser(DocumentParser):
+    def __init__(self, scratch: ScratchSpace = None, page_window: int = None):
+        # Only used when a partitioner strategy insists on a file path
+        self.scratch = scratch
+        # Long PDFs are partitioned this many pages at a time, bounding the partitioner's peak memory
+        self.page_window = page_window
+
     def can_process(self, url: str) -> bool:
         return url.lower().endswith(".pdf")
 
     def parse(self, response):
-        pdf_bytes = response.body
+        last_modified = last_modified_iso(response)
+        if not self.page_window:
+            return self._partition(response.body, last_modified=last_modified)
+
+        elements = []
+        for window in self.iter_windows(response.body, last_modified):
+            elements.extend(window)
+        return elements
+
+    def iter_windows(self, pdf_bytes: bytes, last_modified: str = None):
+        """Yield the elements of each window of page_window pages, page numbers kept document-wide"""
+        for window, starting_page_number in self.split_windows(pdf_bytes):
+            yield self._partition(window, starting_page_number=starting_page_number, last_modified=last_modified)
+
+    def split_windows(self, pdf_bytes: bytes):
+        """Yield (pdf bytes, starting page number) for each window of page_window pages"""
+        from pypdf import PdfReader, PdfWriter
+
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        page_count = len(reader.pages)
+        if not self.page_window or page_count <= self.page_window:
+            yield pdf_bytes, 1
+            return
 
-        with tempfile.NamedTemporaryFile(mode="wb", suffix=".pdf", delete=False) as temp_pdf:
-            temp_pdf.write(pdf_bytes)
-            temp_pdf_path = temp_pdf.name
+        for start in range(0, page_count, self.page_window):
+            writer = PdfWriter()
+            for page in reader.pages[start:start + self.page_window]:
+                writer.add_page(page)
+            window = io.BytesIO()
+            writer.write(window)
+            logger.debug(f"Partitioning PDF pages {start + 1}-{min(start + self.page_window, page_count)} "
+                         f"of {page_count}")
+            yield window.getvalue(), start + 1
+
+    def _partition(self, pdf_bytes: bytes, starting_page_number: int = 1, last_modified: str = None):
+        """last_modified (the response's, ISO) becomes the elements' date, which publication_date is taken from"""
+        if self.scratch is not None:
+            with self.scratch.file(pdf_bytes, suffix=".pdf") as pdf_path:
+                elements = partition_pdf(
+                    filename=pdf_path,
+                    starting_page_number=starting_page_number,
+                    metadata_last_modified=last_modified,
+                    mode="elements",
+                    unstructured_kwargs={"strategy": "hi_res"}
+                )
+            # Without a header unstructured falls back to the scratch file's mtime, which dates nothing
+            for element in elements:
+                element.metadata.last_modified = last_modified
+            return elements
 
         return partition_pdf(
-            temp_pdf_path,
+            file=io.BytesIO(pdf_bytes),
+            starting_page_number=starting_page_number,
+            metadata_last_modified=last_modified,
             mode="elements",
             unstructured_kwargs={"strategy": "hi_res"}
         )
 
+
+def _parse_in_worker(parser, url, body, content_type, last_modified=None):
+    """Runs in a pool process: rebuild the response from raw bytes and return serialized elements"""
+    headers = {"Content-Type": content_type} if content_type else {}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    response = HtmlResponse(url=url, body=body, headers=headers)
+    return elements_to_dicts(parser.parse(response))
+
+
+def _partition_window_in_worker(parser, window, starting_page_number, last_modified):
+    """Runs in a pool process: partition one window of a PDF and return serialized elements"""
+    return elements_to_dicts(parser._partition(window, starting_page_number=starting_page_number,
+                                               last_modified=last_modified))
+
+
 # --- Parser manager (or factory) ---
 class DocumentProcessor:
-    def __init__(self, parsers):
+    def __init__(self, parsers, use_process_pool=False, max_workers=None, timeout=300, max_tasks_per_child=50):
         self.parsers = parsers
+        self.use_process_pool = use_process_pool
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.timeout = timeout
+        # Worker processes are replaced after this many documents to contain memory growth
+        self.max_tasks_per_child = max_tasks_per_child
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # Pools torn down because one document timed out; the other documents they held were not at fault
+        self._timed_out_pools = weakref.WeakSet()
 
-    def process(self, response):
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    max_tasks_per_child=self.max_tasks_per_child
+                )
+            return self._executor
+
+    def _reset_executor(self, executor, timed_out=False):
+        """Kill a pool holding a stuck worker so the next document gets a fresh one"""
+        with self._executor_lock:
+            if timed_out:
+                # Recorded before the workers die, so documents failing with them know they are collateral
+                self._timed_out_pools.add(executor)
+            if self._executor is not executor:
+                return
+            self._executor = None
+
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _process_in_pool(self, parser, response):
+        content_type = response.headers.get("Content-Type", b"").decode("utf-8")
+        last_modified = response.headers.get("Last-Modified", b"").decode("utf-8")
+        return self._run_in_pool(response.url, _parse_in_worker, parser, response.url, response.body, content_type,
+                                 last_modified)
+
+    def _run_in_pool(self, url, fn, *args):
+        # A worker crash may be this document's fault, so it gets one retry; a pool killed because
+        # another document timed out is resubmitted without using that retry
+        crashes = 0
+        while True:
+            executor = self._get_executor()
+            future = executor.submit(fn, *args)
+            try:
+                return elements_from_dicts(future.result(timeout=self.timeout))
+            except FutureTimeoutError:
+                self._reset_executor(executor, timed_out=True)
+                # Raised rather than returning [] so an unparsed page is not mistaken for an empty one
+                raise Exception(f"Parsing timed out after {self.timeout}s for URL: {url}")
+            except BrokenProcessPool:
+                self._reset_executor(executor)
+                with self._executor_lock:
+                    collateral = executor in self._timed_out_pools
+                if collateral:
+                    logger.warning(f"Parser pool was recycled for another document, resubmitting URL: {url}")
+                    continue
+                if crashes:
+                    raise
+                crashes += 1
+                logger.warning(f"Parser pool worker crashed, retrying URL: {url}")
+
+    def _parser_for(self, url):
         for parser in self.parsers:
-            if parser.can_process(response.url):
-                return parser.parse(response)
+            if parser.can_process(url):
+                return parser
+        return None
+
+    def is_windowed(self, response) -> bool:
+        """Whether the response is parsed a page window at a time (see iter_windows)"""
+        parser = self._parser_for(response.url)
+        return isinstance(parser, PDFParser) and bool(parser.page_window)
+
+    def iter_windows(self, response):
+        """Yield the elements of a windowed PDF one window at a time, each window timed out on its own"""
+        parser = self._parser_for(response.url)
+        last_modified = last_modified_iso(response)
+        for window, starting_page_number in parser.split_windows(response.body):
+            if self.use_process_pool:
+                yield self._run_in_pool(response.url, _partition_window_in_worker, parser, window,
+                                        starting_page_number, last_modified)
+            else:
+                yield parser._partition(window, starting_page_number=starting_page_number,
+                                        last_modified=last_modified)
+
+    def process(self, response):
+        parser = self._parser_for(response.url)
+        if parser is not None:
+            if self.use_process_pool:
+                return self._process_in_pool(parser, response)
+            return parser.parse(response)
         
         logger.warning(f"No parser available for URL: {response.url}")
         return []  # Return empty list or None depending on expected downstream behavior
 
+    def close(self):
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
 # === Example usage ===
 #if __name__ == "__main__":
     #    file_path = "C:\\Users\\faton\\workspace\\tutorial\\output\\pdf\\document.pdf"  # or .html
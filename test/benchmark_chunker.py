@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the native single-pass section splitter against chunk_by_title + RecursiveCharacterTextSplitter
+Pages are partitioned once up front from a recorded corpus directory (*.html / *.pdf), so only chunking is timed.
+Without a recorded corpus (see --record) a generated corpus of CSSF-like pages is used instead.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import urllib.request
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from chunker.document_chunker import DocumentChunker
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cssf_pages")
+DEFAULT_LINKS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cssf_links.txt")
+
+
+def record_corpus(directory, links_path, limit):
+    """Download the first `limit` CSSF pages of the link list into the corpus directory"""
+    os.makedirs(directory, exist_ok=True)
+    with open(links_path, encoding="utf-8") as links:
+        urls = [line.strip() for line in links if "www.cssf.lu" in line]
+
+    recorded = 0
+    for url in urls:
+        if recorded >= limit:
+            break
+        suffix = ".pdf" if url.lower().endswith(".pdf") else ".html"
+        path = os.path.join(directory, f"{recorded:04d}{suffix}")
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response, open(path, "wb") as page:
+                page.write(response.read())
+            recorded += 1
+        except Exception as e:
+            print(f"   skipped {url}: {e}")
+    print(f"Recorded {recorded} pages into {directory}")
+
+
+def load_corpus(directory):
+    """Partition every recorded page; returns (name, elements) pairs"""
+    from unstructured.partition.html import partition_html
+    from unstructured.partition.pdf import partition_pdf
+
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.endswith(".html"):
+            pages.append((name, partition_html(filename=path)))
+        elif name.endswith(".pdf"):
+            pages.append((name, partition_pdf(filename=path)))
+    return pages
+
+
+def synthetic_corpus(count, seed=7):
+    """Generate pages shaped like CSSF circulars: numbered titles, paragraphs of varied length, lists, long annexes"""
+    from unstructured.documents.elements import ElementMetadata, ListItem, NarrativeText, Title
+
+    rng = random.Random(seed)
+    words = ("the entity shall notify CSSF of any material outsourcing arrangement concerning critical or "
+             "important functions and maintain a register at group level in accordance with this circular").split()
+
+    def sentence():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(8, 30))).capitalize() + "."
+
+    pages = []
+    for page_index in range(count):
+        elements = []
+        page_number = 1
+        for section in range(rng.randint(3, 15)):
+            page_number += rng.random() < 0.4
+            elements.append(Title(f"{section + 1}. {sentence()[:60]}", metadata=ElementMetadata(page_number=page_number)))
+            for _ in range(rng.randint(0, 8)):
+                # Mostly short paragraphs, some list items and the occasional annex longer than a chunk
+                kind = rng.random()
+                if kind < 0.2:
+                    element = ListItem(sentence())
+                elif kind < 0.95:
+                    element = NarrativeText(" ".join(sentence() for _ in range(rng.randint(1, 6))))
+                else:
+                    element = NarrativeText("\n\n".join(" ".join(sentence() for _ in range(5)) for _ in range(12)))
+                element.metadata = ElementMetadata(page_number=page_number)
+                elements.append(element)
+        pages.append((f"synthetic-{page_index:04d}", elements))
+    return pages
+
+
+def run(chunker, pages):
+    timings = []
+    chunks = {}
+    tracemalloc.start()
+    for name, elements in pages:
+        start = time.perf_counter()
+        chunks[name] = chunker.chunk_document(elements, name)
+        timings.append((time.perf_counter() - start) * 1000)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return timings, chunks, peak
+
+
+def boundary_agreement(reference, candidate):
+    """Share of reference chunk starts that also start a candidate chunk"""
+    matched = total = 0
+    for name, docs in reference.items():
+        starts = {doc.page_content[:40] for doc in candidate.get(name, [])}
+        total += len(docs)
+        matched += sum(doc.page_content[:40] in starts for doc in docs)
+    return matched / total if total else 1.0
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark the native chunker against the two-pass chunker')
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='Directory of recorded .html/.pdf pages')
+    parser.add_argument('--record', type=int, default=0, help='First download this many pages from cssf_links.txt')
+    parser.add_argument('--rounds', type=int, default=3, help='Passes over the corpus')
+    parser.add_argument('--synthetic', type=int, default=200, help='Generated pages used when there is no corpus')
+    parser.add_argument('--max-tokens', type=int, default=None, help='Token limit for the native chunker')
+
+    args = parser.parse_args()
+    if args.record:
+        record_corpus(args.corpus, DEFAULT_LINKS, args.record)
+
+    if os.path.isdir(args.corpus):
+        pages = load_corpus(args.corpus)
+    else:
+        print(f"No recorded corpus at {args.corpus} (use --record N to download one); "
+              f"using {args.synthetic} generated pages")
+        pages = synthetic_corpus(args.synthetic)
+    print(f"Corpus: {len(pages)} pages, {sum(len(elements) for _, elements in pages)} elements, "
+          f"{args.rounds} rounds")
+
+    chunkers = {
+        "two-pass": DocumentChunker(),
+        "native": DocumentChunker(native=True, max_tokens=args.max_tokens),
+    }
+    results = {}
+    print(f"\n{'chunker':<10} {'ms/page':>9} {'p95 ms':>9} {'chunks':>8} {'mean len':>9} {'peak KB':>9}")
+    for name, chunker in chunkers.items():
+        timings = []
+        for _ in range(args.rounds):
+            round_timings, chunks, peak = run(chunker, pages)
+            timings.extend(round_timings)
+        results[name] = chunks
+        lengths = [len(doc.page_content) for docs in chunks.values() for doc in docs]
+        p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+        print(f"{name:<10} {statistics.mean(timings):>9.2f} {p95:>9.2f} {len(lengths):>8} "
+              f"{statistics.mean(lengths) if lengths else 0:>9.0f} {peak / 1024:>9.0f}")
+
+    print(f"\nChunk boundaries shared with two-pass: {boundary_agreement(results['two-pass'], results['native']):.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Recall vs latency report for the Milvus index profiles
+Samples stored vectors as queries, takes the FLAT (exact) results as ground truth and
+rebuilds the collection's vector index with each profile in turn.
+"""
+import os
+import statistics
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from embedding_provider.embedding_provider import EmbeddingService
+
+# Search-time knob swept for each profile
+SWEEPS = {
+    "exact": ("none", [None]),
+    "hnsw": ("ef", [16, 32, 64, 128, 256]),
+    "ivf_flat": ("nprobe", [4, 8, 16, 32, 64]),
+    "ivf_pq": ("nprobe", [8, 16, 32, 64, 128]),
+}
+
+
+def sample_queries(manager, n):
+    vector_field = manager.vector_store._vector_field
+    rows = manager.vector_store.col.query(expr="", limit=n, output_fields=[vector_field])
+    return [row[vector_field] for row in rows]
+
+
+def run_queries(manager, queries, k, search_params):
+    """Search one query at a time so latencies reflect a single request"""
+    ids, latencies = [], []
+    for vector in queries:
+        start = time.perf_counter()
+        hits = manager.search_vectors([vector], k, search_params=search_params)[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids.append([hit.id for hit in hits])
+    return ids, latencies
+
+
+def recall(results, ground_truth, k):
+    found = sum(len(set(result[:k]) & set(truth[:k])) for result, truth in zip(results, ground_truth))
+    return found / (k * len(ground_truth))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Recall vs latency of Milvus index profiles')
+    parser.add_argument('--host', default='localhost', help='Milvus host')
+    parser.add_argument('--port', default='19530', help='Milvus port')
+    parser.add_argument('--collection', default='cssf_documents', help='Collection to evaluate')
+    parser.add_argument('--queries', type=int, default=200, help='Number of sampled query vectors')
+    parser.add_argument('--k', type=int, default=10, help='Recall@k')
+    parser.add_argument('--profiles', nargs='+', default=[p for p in SWEEPS if p != 'exact'],
+                        help='Profiles to evaluate')
+
+    args = parser.parse_args()
+
+    service = EmbeddingService(
+        use_remote=True,
+        milvus_config={
+            "host": args.host,
+            "port": args.port,
+            "collection_name": args.collection,
+        }
+    )
+    manager = service.milvus
+    original_profile = manager.index_profile
+
+    queries = sample_queries(manager, args.queries)
+    print(f"Collection {args.collection}: {manager.vector_store.col.num_entities} entities, "
+          f"{len(queries)} queries, recall@{args.k}")
+
+    try:
+        manager.rebuild_index("exact")
+        ground_truth, _ = run_queries(manager, queries, args.k, manager.search_params("exact"))
+
+        print(f"\n{'profile':<10} {'param':>10} {'recall':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for profile in args.profiles:
+            build_start = time.perf_counter()
+            manager.rebuild_index(profile)
+            print(f"{profile:<10} built in {time.perf_counter() - build_start:.1f}s")
+
+            knob, values = SWEEPS[profile]
+            for value in values:
+                # HNSW needs ef >= k
+                if knob == "ef":
+                    value = max(value, args.k)
+                overrides = {knob: value} if value is not None else {}
+                ids, latencies = run_queries(manager, queries, args.k, manager.search_params(profile, **overrides))
+                p95 = statistics.quantiles(latencies, n=20)[-1]
+                label = f"{knob}={overrides[knob]}" if overrides else "-"
+                print(f"{profile:<10} {label:>10} {recall(ids, ground_truth, args.k):>8.3f} "
+                      f"{statistics.median(latencies):>8.2f} {p95:>8.2f}")
+    finally:
+        manager.rebuild_index(original_profile)
+        print(f"\nRestored profile '{original_profile}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Sentences per second of the CPU-tuned local embedding provider against the current LocalEmbeddingProvider
+Also reports how close each configuration's vectors stay to the fp32 baseline (mean cosine similarity).
+"""
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from embedding_provider.cpu_provider import CPUEmbeddingProvider
+from embedding_provider.embedding_provider import LocalEmbeddingProvider
+
+SAMPLE = (
+    "The CSSF is the competent authority for the prudential supervision of credit institutions and investment "
+    "firms. Circular CSSF 22/806 sets out the requirements applicable to outsourcing arrangements. Entities shall "
+    "notify the CSSF in advance of any material outsourcing of critical or important functions. Article 8(2) of "
+    "Regulation (EU) 2019/2088 requires the disclosure of how environmental or social characteristics are met. "
+    "Investment fund managers must maintain adequate liquidity risk management processes at all times."
+).split(". ")
+
+
+def load_texts(path, count, seed=0):
+    """Chunks from a file (one per line) or synthetic chunks with a realistic spread of lengths"""
+    if path:
+        with open(path, encoding="utf-8") as texts:
+            lines = [line.strip() for line in texts if line.strip()]
+        return lines[:count]
+
+    rng = random.Random(seed)
+    return [". ".join(rng.choice(SAMPLE) for _ in range(rng.randint(1, 16))) for _ in range(count)]
+
+
+def bench(provider, texts, rounds):
+    provider.embed_documents(texts[:8])  # warm-up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        vectors = np.asarray(provider.embed_documents(texts), dtype=np.float32)
+    return len(texts) * rounds / (time.perf_counter() - start), vectors
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='CPU throughput of the local embedding providers')
+    parser.add_argument('--model', default='BAAI/bge-large-en-v1.5', help='Model name')
+    parser.add_argument('--texts', default=None, help='File with one chunk per line (default: synthetic)')
+    parser.add_argument('--count', type=int, default=512, help='Texts per round')
+    parser.add_argument('--rounds', type=int, default=2, help='Rounds per configuration')
+    parser.add_argument('--threads', type=int, default=None, help='Intra-op threads (default: all cores)')
+    parser.add_argument('--processes', type=int, nargs='+', default=[1], help='Process counts to try')
+    parser.add_argument('--backends', nargs='+', default=['torch', 'int8', 'onnx'], help='Backends to try')
+    parser.add_argument('--batch-size', type=int, default=32, help='Texts per batch')
+
+    args = parser.parse_args()
+    texts = load_texts(args.texts, args.count)
+    print(f"{len(texts)} texts, mean {np.mean([len(text) for text in texts]):.0f} chars, {args.rounds} rounds, "
+          f"{os.cpu_count()} cores")
+
+    print(f"\n{'provider':<28} {'sent/s':>9} {'speedup':>8} {'cosine':>8}")
+    baseline_rate, baseline = bench(LocalEmbeddingProvider(model_name=args.model), texts, args.rounds)
+    print(f"{'LocalEmbeddingProvider':<28} {baseline_rate:>9.1f} {1.0:>7.2f}x {1.0:>8.4f}")
+
+    for backend in args.backends:
+        for processes in args.processes:
+            try:
+                provider = CPUEmbeddingProvider(model_name=args.model, backend=backend, batch_size=args.batch_size,
+                                                num_threads=args.threads, num_processes=processes)
+            except Exception as e:
+                print(f"{backend} x{processes}: unavailable ({e})")
+                continue
+            try:
+                rate, vectors = bench(provider, texts, args.rounds)
+            finally:
+                provider.close()
+            cosine = float(np.mean(np.sum(vectors * baseline, axis=1)))
+            print(f"{f'{backend} x{processes} proc':<28} {rate:>9.1f} {rate / baseline_rate:>7.2f}x {cosine:>8.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+One-off check that sitemap/feed discovery reaches the same document set as the link walk, for fewer requests
+Each mode crawls in its own working directory (the spider keeps its state under ./cache). The URLs stored in
+the two page_state databases are compared, and the requests and response bytes of each mode's last crawl
+(cache/crawl_stats.json) are reported next to them. Run --crawl twice to measure a recrawl.
+"""
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+from collections import Counter
+from urllib.parse import urlparse
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+MODES = ("links", "sitemap")
+
+
+def crawl(mode, workdir):
+    """Run a full crawl in the given discovery mode with workdir as its cache location"""
+    os.makedirs(workdir, exist_ok=True)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [project_root, os.environ.get("PYTHONPATH")])))
+    subprocess.run(
+        [sys.executable, "-c", f"from crawl_urls import run_spider; run_spider(discovery={mode!r})"],
+        cwd=workdir, env=env, check=True
+    )
+
+
+def stored_urls(workdir):
+    """URLs whose content made it into the store during the crawl run in workdir"""
+    path = os.path.join(workdir, "cache", "page_state.sqlite")
+    if not os.path.exists(path):
+        raise Exception(f"No page state at {path}; run with --crawl first")
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("SELECT url FROM pages WHERE content_hash IS NOT NULL").fetchall()
+    finally:
+        conn.close()
+    return {url for (url,) in rows}
+
+
+def crawl_cost(workdir):
+    """Counters the spider recorded for the last crawl run in workdir"""
+    path = os.path.join(workdir, "cache", "crawl_stats.json")
+    if not os.path.exists(path):
+        raise Exception(f"No crawl stats at {path}; run with --crawl first")
+    with open(path, encoding="utf-8") as stats_file:
+        return json.load(stats_file)
+
+
+def kind(url):
+    parsed = urlparse(url)
+    return f"{parsed.hostname} {'pdf' if parsed.path.lower().endswith('.pdf') else 'html'}"
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compare the documents reached by sitemap discovery and the link walk')
+    parser.add_argument('--workdir', default=os.path.join(project_root, "cache", "discovery_comparison"),
+                        help='Holds one working directory per discovery mode')
+    parser.add_argument('--crawl', action='store_true', help='Crawl both modes first (needs Milvus and the endpoint)')
+    parser.add_argument('--show', type=int, default=20, help='Missing URLs listed per side')
+
+    args = parser.parse_args()
+    workdirs = {mode: os.path.join(args.workdir, mode) for mode in MODES}
+    if args.crawl:
+        for mode in MODES:
+            print(f"Crawling with discovery={mode} in {workdirs[mode]}")
+            crawl(mode, workdirs[mode])
+
+    urls = {mode: stored_urls(workdirs[mode]) for mode in MODES}
+    missed = urls["links"] - urls["sitemap"]
+    extra = urls["sitemap"] - urls["links"]
+    print(f"Link walk: {len(urls['links'])} documents, discovery: {len(urls['sitemap'])} documents, "
+          f"shared: {len(urls['links'] & urls['sitemap'])}")
+
+    costs = {mode: crawl_cost(workdirs[mode]) for mode in MODES}
+    print(f"\n{'mode':<10} {'ran as':<8} {'requests':>9} {'304s':>7} {'MB':>9} {'listed':>8} {'fresh':>7}")
+    for mode in MODES:
+        cost = costs[mode]
+        print(f"{mode:<10} {cost['discovery']:<8} {cost['requests']:>9} {cost['not_modified']:>7} "
+              f"{cost['response_bytes'] / 1024 ** 2:>9.1f} {cost.get('listed', 0):>8} {cost.get('fresh', 0):>7}")
+    if costs["links"]["requests"]:
+        print(f"Discovery requests: {costs['sitemap']['requests'] / costs['links']['requests']:.1%} of the link walk, "
+              f"bytes: {costs['sitemap']['response_bytes'] / max(costs['links']['response_bytes'], 1):.1%}")
+
+    for title, group in (("Only reached by the link walk", missed), ("Only reached by discovery", extra)):
+        print(f"\n{title}: {len(group)}")
+        for name, count in sorted(Counter(kind(url) for url in group).items()):
+            print(f"   {name:<40} {count:>6}")
+        for url in sorted(group)[:args.show]:
+            print(f"   {url}")
+
+    # Non-zero when discovery loses documents the link walk stores
+    return 1 if missed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
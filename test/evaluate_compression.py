@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Recall@k and memory footprint of the vector compression options
+Vectors come from the embedding cache (or a .npy matrix); held-out vectors are the queries and
+exact float32 search is the ground truth. Runs offline with numpy, no Milvus needed.
+"""
+import os
+import random
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from embedding_provider.compression import build_compressor
+
+DEFAULT_CACHE = os.path.join(project_root, "cache", "embeddings.sqlite")
+
+OPTIONS = [
+    ("float32", {"method": "none"}),
+    ("float16", {"method": "float16"}),
+    ("bfloat16", {"method": "bfloat16"}),
+    ("binary", {"method": "binary", "rerank_factor": 1}),
+    ("binary+rerank4", {"method": "binary", "rerank_factor": 4}),
+    ("binary+rerank10", {"method": "binary", "rerank_factor": 10}),
+    ("pca-512", {"method": "pca", "dim": 512}),
+    ("pca-256", {"method": "pca", "dim": 256}),
+    ("matryoshka-256", {"method": "matryoshka", "dim": 256}),
+]
+
+
+def load_vectors(cache_path=None, npy_path=None, limit=None, seed=0):
+    """Vectors from a .npy matrix or the EmbeddingCache SQLite file"""
+    if npy_path:
+        matrix = np.load(npy_path).astype(np.float32)
+    else:
+        conn = sqlite3.connect(cache_path or DEFAULT_CACHE)
+        blobs = [row[0] for row in conn.execute("SELECT vector FROM embeddings")]
+        conn.close()
+        if not blobs:
+            raise SystemExit(f"No vectors in {cache_path or DEFAULT_CACHE}")
+        matrix = np.stack([np.frombuffer(blob, dtype=np.float32) for blob in blobs])
+
+    if limit and len(matrix) > limit:
+        rows = random.Random(seed).sample(range(len(matrix)), limit)
+        matrix = matrix[sorted(rows)]
+    return matrix
+
+
+def top_k(scores, k):
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(-scores, candidates, axis=1).argsort(axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def similarity(queries, corpus, metric):
+    if metric == "L2":
+        return 2 * queries @ corpus.T - (corpus ** 2).sum(axis=1)
+    return queries @ corpus.T
+
+
+def search(compressor, stored, queries, k, metric):
+    """Rank the stored corpus the way Milvus would for this compressor"""
+    if compressor.rerank_factor:
+        # Hamming ranking is the dot product of +-1 codes
+        codes = compressor.decode(stored)
+        candidates = top_k(compressor.decode(compressor.encode(queries)) @ codes.T, k * compressor.rerank_factor)
+        rows = compressor.to_rows(stored)
+        results = []
+        for query, ids in zip(compressor.transform(queries), candidates):
+            scores = compressor.rerank(query, [rows[i] for i in ids])
+            results.append(ids[np.argsort(-scores)[:k]])
+        return np.array(results)
+
+    return top_k(similarity(compressor.transform(queries), compressor.decode(stored), metric), k)
+
+
+def recall(results, ground_truth, k):
+    found = sum(len(set(result[:k]) & set(truth[:k])) for result, truth in zip(results, ground_truth))
+    return found / (k * len(ground_truth))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Recall and memory of vector compression options')
+    parser.add_argument('--cache', default=None, help='EmbeddingCache SQLite file to read vectors from')
+    parser.add_argument('--npy', default=None, help='Float32 matrix saved with numpy instead of the cache')
+    parser.add_argument('--limit', type=int, default=50000, help='Vectors sampled from the source')
+    parser.add_argument('--queries', type=int, default=500, help='Held-out vectors used as queries')
+    parser.add_argument('--fit-sample', type=int, default=10000, help='Corpus vectors PCA is fitted on')
+    parser.add_argument('--k', type=int, default=10, help='Recall@k')
+    parser.add_argument('--metric', default='L2', choices=['L2', 'IP'], help='Collection metric')
+    parser.add_argument('--options', nargs='+', default=[name for name, _ in OPTIONS], help='Options to evaluate')
+
+    args = parser.parse_args()
+    matrix = load_vectors(args.cache, args.npy, args.limit)
+    queries, corpus = matrix[:args.queries], matrix[args.queries:]
+    dim = corpus.shape[1]
+    print(f"Corpus: {len(corpus)} x {dim} vectors, {len(queries)} queries, recall@{args.k}, {args.metric}")
+
+    ground_truth = top_k(similarity(queries, corpus, args.metric), args.k)
+    baseline_bytes = dim * 4
+
+    print(f"\n{'option':<16} {'recall':>8} {'B/vector':>9} {'MB':>9} {'ratio':>7} {'encode s':>9}")
+    for name, config in OPTIONS:
+        if name not in args.options:
+            continue
+        compressor = build_compressor(config)
+
+        start = time.perf_counter()
+        if not compressor.fitted:
+            compressor.fit(corpus[:args.fit_sample])
+        stored = compressor.encode(corpus)
+        encode_time = time.perf_counter() - start
+
+        results = search(compressor, stored, queries, args.k, args.metric)
+        per_vector = compressor.bytes_per_vector(dim)
+        print(f"{name:<16} {recall(results, ground_truth, args.k):>8.3f} {per_vector:>9} "
+              f"{per_vector * len(corpus) / 2 ** 20:>9.1f} {baseline_bytes / per_vector:>6.1f}x {encode_time:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
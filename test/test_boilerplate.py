@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for boilerplate stripping ahead of partition_html
+Runs without unstructured, Milvus or an embedding endpoint
+"""
+import os
+import pickle
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from parsers.boilerplate import BoilerplateCleaner
+
+BANNER = "<div class='notice'>Subscribe to CSSF newsletters to receive alerts about new circulars and FAQs.</div>"
+
+
+def page(number: int) -> str:
+    return (
+        "<nav><a href='/en/'>Home</a></nav>"
+        "<div class='cookie-banner'>We use cookies to improve your experience.</div>"
+        f"<h1>Circular CSSF 22/{800 + number}</h1>"
+        f"<p>This circular number {number} sets out requirements on outsourcing arrangements for credit "
+        f"institutions and investment firms, including notification duties towards the CSSF.</p>"
+        + BANNER
+    )
+
+
+def test_template_selectors_drop_navigation(tmp_path):
+    cleaner = BoilerplateCleaner(str(tmp_path / "boilerplate.sqlite"))
+    cleaned = cleaner.clean("https://www.cssf.lu/en/c1", page(1))
+    assert "Home" not in cleaned
+    assert "cookies" not in cleaned
+    assert "Circular CSSF 22/801" in cleaned
+
+
+def test_repeated_block_dropped_after_min_pages(tmp_path):
+    cleaner = BoilerplateCleaner(str(tmp_path / "boilerplate.sqlite"), min_pages=3)
+    cleaned = [cleaner.clean(f"https://www.cssf.lu/en/c{i}", page(i)) for i in range(4)]
+    assert "newsletters" in cleaned[1]
+    assert "newsletters" not in cleaned[2]
+    assert "outsourcing arrangements" in cleaned[3]
+
+    report = cleaner.report()["www.cssf.lu"]
+    assert report["pages"] == 4
+    assert report["bytes_saved"] > 0
+
+
+def test_dominant_block_is_kept(tmp_path):
+    cleaner = BoilerplateCleaner(str(tmp_path / "boilerplate.sqlite"), min_pages=2)
+    for i in range(3):
+        cleaned = cleaner.clean(f"https://www.cssf.lu/en/notice{i}", BANNER)
+    assert "newsletters" in cleaned
+
+
+def test_learned_blocks_shared_after_pickling(tmp_path):
+    cleaner = BoilerplateCleaner(str(tmp_path / "boilerplate.sqlite"), min_pages=2)
+    cleaner.clean("https://www.cssf.lu/en/c1", page(1))
+    worker = pickle.loads(pickle.dumps(cleaner))
+    assert "newsletters" not in worker.clean("https://www.cssf.lu/en/c2", page(2))
+    assert cleaner.report()["www.cssf.lu"]["pages"] == 2
+
+
+def test_recleaning_a_page_does_not_count_it_again(tmp_path):
+    cleaner = BoilerplateCleaner(str(tmp_path / "boilerplate.sqlite"), min_pages=3)
+    # Retries and later crawls parse the same URL again
+    cleaned = [cleaner.clean("https://www.cssf.lu/en/c1", page(1)) for _ in range(4)]
+    assert "outsourcing arrangements" in cleaned[-1]
+    assert "newsletters" in cleaned[-1]
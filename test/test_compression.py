@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for the vector compression options
+Runs without a Milvus server or embedding endpoint
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from embedding_provider.compression import (
+    BFloat16Compressor, BinaryCompressor, Float16Compressor, PCACompressor, build_compressor
+)
+
+
+def sample_vectors(n=300, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_half_precision_roundtrip():
+    vectors = sample_vectors()
+    for compressor in (Float16Compressor(), BFloat16Compressor()):
+        stored = compressor.encode(vectors)
+        assert stored.dtype.itemsize == 2
+        assert np.allclose(compressor.decode(stored), vectors, atol=1e-2)
+
+
+def test_bfloat16_rows_are_raw_bytes():
+    compressor = BFloat16Compressor()
+    rows = compressor.to_rows(compressor.encode(sample_vectors(n=2)))
+    assert all(isinstance(row, bytes) and len(row) == 64 * 2 for row in rows)
+
+
+def test_binary_rerank_prefers_true_neighbour():
+    vectors = sample_vectors()
+    compressor = BinaryCompressor(rerank_factor=4)
+    rows = compressor.to_rows(compressor.encode(vectors))
+    assert compressor.bytes_per_vector(64) == 8 == len(rows[0])
+
+    scores = compressor.rerank(vectors[7], rows)
+    assert int(np.argmax(scores)) == 7
+
+
+def test_pca_projection_roundtrip(tmp_path):
+    path = str(tmp_path / "pca.npz")
+    vectors = sample_vectors()
+    compressor = PCACompressor(dim=16, path=path)
+    assert not compressor.fitted
+    compressor.fit(vectors)
+
+    reloaded = PCACompressor(path=path)
+    assert reloaded.dim == 16
+    assert np.allclose(reloaded.encode(vectors), compressor.encode(vectors), atol=1e-5)
+
+
+def test_unfitted_pca_refuses_to_encode():
+    with pytest.raises(Exception):
+        PCACompressor(dim=16).encode(sample_vectors(n=2))
+
+
+def test_build_compressor():
+    assert build_compressor(None) is None
+    assert build_compressor({"method": "binary"}).metric_type == "HAMMING"
+    with pytest.raises(Exception):
+        build_compressor({"method": "int4"})
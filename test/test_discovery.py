@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for sitemap, feed and ELI list discovery
+Runs without a Scrapy crawl
+"""
+import gzip
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from crawler.discovery import (needs_fetch, parse_eli_list, parse_feed, parse_sitemap, parse_timestamp,
+                               sitemaps_from_robots)
+
+SITEMAP_INDEX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://www.cssf.lu/document-sitemap.xml</loc><lastmod>2024-03-05T10:00:00+00:00</lastmod></sitemap>
+</sitemapindex>"""
+
+URLSET = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>https://www.cssf.lu/en/Document/circular-cssf-22-806/</loc><lastmod>2024-03-05</lastmod></url>
+  <url><loc>https://www.cssf.lu/en/Document/circular-cssf-12-552/</loc></url>
+</urlset>"""
+
+RSS = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel>
+  <item><title>News</title><link>https://www.cssf.lu/en/2024/03/some-news/</link>
+  <pubDate>Tue, 05 Mar 2024 10:00:00 +0000</pubDate></item>
+</channel></rss>"""
+
+ATOM = b"""<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <entry><link rel="self" href="https://example.org/self"/><link href="/en/Document/circular-cssf-24-850/"/>
+  <updated>2024-03-05T10:00:00Z</updated></entry>
+</feed>"""
+
+
+def test_sitemaps_from_robots():
+    robots = b"User-agent: *\nDisallow: /wp-admin/\nSitemap: https://www.cssf.lu/sitemap_index.xml\n"
+    assert sitemaps_from_robots(robots) == ["https://www.cssf.lu/sitemap_index.xml"]
+
+
+def test_parse_sitemap_index_and_urlset():
+    kind, entries = parse_sitemap(SITEMAP_INDEX)
+    assert kind == "sitemapindex"
+    assert entries == [("https://www.cssf.lu/document-sitemap.xml", parse_timestamp("2024-03-05T10:00:00Z"))]
+
+    kind, entries = parse_sitemap(gzip.compress(URLSET))
+    assert kind == "urlset"
+    assert entries[0] == ("https://www.cssf.lu/en/Document/circular-cssf-22-806/", parse_timestamp("2024-03-05"))
+    assert entries[1][1] is None
+
+
+def test_parse_rss_and_atom():
+    assert parse_feed(RSS) == [("https://www.cssf.lu/en/2024/03/some-news/",
+                                parse_timestamp("2024-03-05T10:00:00Z"))]
+    assert parse_feed(ATOM, "https://www.cssf.lu/en/feed/") == [
+        ("https://www.cssf.lu/en/Document/circular-cssf-24-850/", parse_timestamp("2024-03-05T10:00:00Z"))
+    ]
+
+
+def test_parse_eli_list():
+    listing = b"<html><body><a href='/eli/reg/2022/2554/oj'>DORA</a><a href='/en/about'>About</a></body></html>"
+    assert parse_eli_list(listing, "https://eur-lex.europa.eu/") == ["https://eur-lex.europa.eu/eli/reg/2022/2554/oj"]
+
+
+def test_needs_fetch_uses_lastmod():
+    fetched = {"content_hash": "abc", "fetched_at": parse_timestamp("2024-03-06")}
+    assert needs_fetch(None, None)
+    assert needs_fetch({"content_hash": None, "fetched_at": None}, parse_timestamp("2024-03-05"))
+    assert not needs_fetch(fetched, parse_timestamp("2024-03-05"))
+    assert needs_fetch(fetched, parse_timestamp("2024-03-07"))
+    assert needs_fetch(fetched, None)
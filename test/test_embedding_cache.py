@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for the disk-backed and in-process embedding caches
+Runs without a Milvus server or embedding endpoint
+"""
+import os
+import sys
+
+import numpy as np
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from embedding_provider import embedding_cache
+from embedding_provider.embedding_cache import EmbeddingCache, QueryEmbeddingCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        self.now += 1
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+def test_get_many_counts_hits_and_misses(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    cache.put_many("model", ["a", "b"], [[1.0, 2.0], [3.0, 4.0]])
+
+    results = cache.get_many("model", ["a", "c", "b", "a"])
+    assert results[1] is None
+    np.testing.assert_array_equal(results[0], [1.0, 2.0])
+    np.testing.assert_array_equal(results[2], [3.0, 4.0])
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 1
+    # Keys include the model, so another model never sees these vectors
+    assert cache.get_many("other-model", ["a"]) == [None]
+
+
+def test_eviction_drops_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "time", FakeClock())
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.put_many("model", ["a"], [[1.0]])
+    cache.put_many("model", ["b"], [[2.0]])
+    # Reading "a" makes "b" the least recently used entry
+    cache.get_many("model", ["a"])
+    cache.put_many("model", ["c"], [[3.0]])
+
+    assert cache.stats()["size"] == 2
+    a, b, c = cache.get_many("model", ["a", "b", "c"])
+    assert b is None
+    assert a is not None and c is not None
+
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EmbeddingCache(path)
+    cache.put_many("model", ["circular 22/806"], [[0.5, 0.25]])
+    cache.close()
+
+    reopened = EmbeddingCache(path)
+    vector, = reopened.get_many("model", ["circular 22/806"])
+    np.testing.assert_array_equal(vector, [0.5, 0.25])
+    assert vector.dtype == np.float32
+
+
+def test_query_cache_lru_and_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(embedding_cache, "time", clock)
+    cache = QueryEmbeddingCache(max_entries=2, ttl=10)
+    cache.put("a", [1.0])
+    cache.put("b", [2.0])
+    assert cache.get("a") == [1.0]
+    cache.put("c", [3.0])
+    assert cache.get("b") is None
+
+    clock.now += 11
+    assert cache.get("a") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "hit_rate": 1 / 3, "size": 1, "max_entries": 2}
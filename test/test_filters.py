@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Tests for Milvus filter expressions built from dicts
+Runs without a Milvus server or embedding endpoint
+"""
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from milvus_provider.filters import build_filter
+
+
+def test_empty_and_string_filters():
+    assert build_filter(None) is None
+    assert build_filter({}) is None
+    assert build_filter('page_number < 5') == 'page_number < 5'
+
+
+def test_scalars_lists_and_ranges():
+    expr = build_filter({
+        "domain_type": "primary",
+        "language": ["en", "fr"],
+        "publication_date": ("2022-01-01", None),
+        "page_number": (1, 10),
+    })
+    assert expr == ('domain_type == "primary" and language in ["en", "fr"] and '
+                    'publication_date >= "2022-01-01" and page_number >= 1 and page_number <= 10')
+
+
+def test_values_are_escaped():
+    assert build_filter({"source_url": 'https://x/"a"\\b'}) == 'source_url == "https://x/\\"a\\"\\\\b"'
+    assert build_filter({"flag": True, "score": 0.5}) == "flag == true and score == 0.5"
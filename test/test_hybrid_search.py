@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for the BM25 sparse encoder and the in-memory hybrid index
+Runs without a Milvus server or embedding endpoint
+"""
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from milvus_provider.sparse import BM25Encoder, InMemoryHybridIndex, reciprocal_rank_fusion, tokenize
+
+CHUNKS = [
+    "Circular CSSF 22/806 on outsourcing arrangements applies to credit institutions.",
+    "Circular CSSF 21/785 on the transfer of investment fund managers.",
+    "Article 8(2) of Regulation (EU) 2019/2088 concerns sustainability-related disclosures.",
+    "The CSSF publishes its annual report on the supervision of the financial sector.",
+]
+
+# Toy dense vectors: the "semantic" neighbour of every query is the annual report chunk
+VECTORS = [
+    [0.1, 0.9, 0.0],
+    [0.1, 0.8, 0.1],
+    [0.0, 0.2, 0.9],
+    [1.0, 0.0, 0.0],
+]
+
+
+def build_index():
+    index = InMemoryHybridIndex(metric_type="IP")
+    index.add(ids=["c1", "c2", "c3", "c4"], texts=CHUNKS, vectors=VECTORS,
+              metadatas=[{"source_url": f"https://www.cssf.lu/en/doc{i}"} for i in range(4)])
+    return index
+
+
+def test_tokenize_keeps_identifiers():
+    tokens = tokenize("CSSF 22/806 and Article 8(2)")
+    assert "22/806" in tokens
+    assert "8(2)" in tokens
+    assert "806" in tokens
+
+
+def test_bm25_prefers_exact_identifier():
+    encoder = BM25Encoder()
+    encoder.partial_fit(CHUNKS)
+    documents = encoder.encode_documents(CHUNKS)
+    query = encoder.encode_queries(["CSSF 22/806"])[0]
+
+    scores = [sum(weight * document.get(dim, 0.0) for dim, weight in query.items()) for document in documents]
+    assert scores.index(max(scores)) == 0
+
+
+def test_unseen_query_terms_are_dropped():
+    encoder = BM25Encoder()
+    encoder.partial_fit(CHUNKS)
+    assert encoder.encode_queries(["zzz-unknown"])[0] == {}
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "a"]], k=60)
+    assert [item for item, _ in fused][:2] in (["a", "b"], ["b", "a"])
+    assert fused[-1][0] == "c"
+
+
+def test_hybrid_search_surfaces_identifier_match():
+    index = build_index()
+    results = index.hybrid_search("CSSF 22/806", query_vector=[1.0, 0.0, 0.0], k=2)
+    assert results[0]["metadata"]["pk"] in ("c1", "c4")
+    assert "c1" in [result["metadata"]["pk"] for result in results]
+
+
+def test_encoder_stats_roundtrip(tmp_path):
+    path = str(tmp_path / "bm25.json")
+    encoder = BM25Encoder(path=path)
+    encoder.partial_fit(CHUNKS)
+    encoder.save()
+
+    reloaded = BM25Encoder(path=path)
+    assert reloaded.doc_count == len(CHUNKS)
+    assert reloaded.encode_queries(["22/806"]) == encoder.encode_queries(["22/806"])
+
+
+def test_removed_chunks_leave_the_stats():
+    encoder = BM25Encoder()
+    encoder.partial_fit(CHUNKS)
+    # A recrawl deletes the first chunk and re-ingests the rest
+    encoder.remove(CHUNKS)
+    encoder.partial_fit(CHUNKS[1:])
+
+    fresh = BM25Encoder()
+    fresh.partial_fit(CHUNKS[1:])
+    assert encoder.doc_count == fresh.doc_count
+    assert encoder.total_length == fresh.total_length
+    assert encoder.doc_freq == fresh.doc_freq
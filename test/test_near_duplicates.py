@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for the MinHash LSH near-duplicate index
+Runs without a Milvus server or embedding endpoint
+"""
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from crawler.near_duplicates import NearDuplicateIndex, choose_bands, shingles
+
+CIRCULAR = (
+    "Circular CSSF 22/806 on outsourcing arrangements. This circular applies to credit institutions, "
+    "investment firms, payment institutions and electronic money institutions. Entities shall notify the "
+    "CSSF in advance of any planned material outsourcing of critical or important functions and shall "
+    "maintain an up-to-date register of all outsourcing arrangements at entity and group level."
+)
+MIRROR = CIRCULAR.replace(". ", ".\n\n  ").replace("CSSF 22/806", "CSSF  22/806")
+OTHER = (
+    "Article 8(2) of Regulation (EU) 2019/2088 concerns the disclosure of how environmental or social "
+    "characteristics promoted by a financial product are met, including the index designated as reference."
+)
+
+
+def test_shingles_ignore_whitespace_and_punctuation():
+    assert shingles(CIRCULAR) == shingles(MIRROR)
+
+
+def test_choose_bands_sits_below_threshold():
+    bands, rows = choose_bands(128, 0.9)
+    assert bands * rows == 128
+    assert (1 / bands) ** (1 / rows) <= 0.9
+
+
+def test_mirror_maps_to_canonical(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "dups.sqlite"))
+    assert index.check_and_add([("c1", "https://www.cssf.lu/en/c22806", CIRCULAR)]) == {}
+
+    duplicates = index.check_and_add([
+        ("m1", "https://eur-lex.europa.eu/mirror", MIRROR),
+        ("o1", "https://eur-lex.europa.eu/other", OTHER),
+    ])
+    assert list(duplicates) == ["m1"]
+    assert duplicates["m1"][0] == "c1"
+    assert index.canonical_of("m1") == "c1"
+
+
+def test_reingesting_canonical_is_not_a_duplicate(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "dups.sqlite"))
+    index.check_and_add([("c1", "https://www.cssf.lu/en/c22806", CIRCULAR)])
+    assert index.check_and_add([("c1", "https://www.cssf.lu/en/c22806", CIRCULAR)]) == {}
+
+
+def test_mapping_persists_and_removal_reports_orphans(tmp_path):
+    path = str(tmp_path / "dups.sqlite")
+    index = NearDuplicateIndex(path)
+    index.check_and_add([("c1", "https://www.cssf.lu/en/c22806", CIRCULAR)])
+    index.check_and_add([("m1", "https://eur-lex.europa.eu/mirror", MIRROR)])
+    index.close()
+
+    reopened = NearDuplicateIndex(path)
+    assert reopened.canonical_of("m1") == "c1"
+    assert reopened.remove(["c1"]) == ["https://eur-lex.europa.eu/mirror"]
+    assert reopened.canonical_of("m1") is None
+    assert reopened.stats()["canonical"] == 0
+
+
+def test_check_indexes_nothing_until_commit(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "dups.sqlite"))
+    duplicates, pending = index.check([("c1", "https://www.cssf.lu/en/c22806", CIRCULAR)])
+    assert duplicates == {}
+
+    # The circular's page failed to store, so its mirror becomes the canonical copy
+    duplicates, mirror_rows = index.check([("m1", "https://eur-lex.europa.eu/mirror", MIRROR)])
+    assert duplicates == {}
+    assert index.commit(mirror_rows) == []
+    assert index.stats()["canonical"] == 1
+
+    duplicates, pending = index.check([("c1", "https://www.cssf.lu/en/c22806", CIRCULAR)])
+    assert duplicates["c1"][0] == "m1"
+
+
+def test_commit_reports_duplicates_of_removed_canonical(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "dups.sqlite"))
+    index.check_and_add([("c1", "https://www.cssf.lu/en/c22806", CIRCULAR)])
+    duplicates, pending = index.check([("m1", "https://eur-lex.europa.eu/mirror", MIRROR)])
+    assert duplicates["m1"][0] == "c1"
+
+    index.remove(["c1"])
+    assert index.commit(pending) == ["m1"]
+    assert index.canonical_of("m1") is None
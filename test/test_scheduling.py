@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for request priorities and adaptive per-domain budgets
+Runs without a Scrapy crawl
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from crawler.scheduling import AdaptiveThrottleMiddleware, DomainBudget, RequestPrioritizer, budget_domain, publication_year
+from url.url_rules import URLRules
+
+
+def test_publication_year_hints():
+    assert publication_year("https://www.cssf.lu/en/2024/03/some-news/") == 2024
+    assert publication_year("https://eur-lex.europa.eu/legal-content/EN/TXT/?uri=CELEX:32019R2088") == 2019
+    assert publication_year("https://data.europa.eu/eli/reg/2022/2554/oj") == 2022
+    assert publication_year("https://www.cssf.lu/en/Document/circular-cssf-22-806/") == 2022
+    assert publication_year("https://www.cssf.lu/en/about/", "Tue, 05 Mar 2019 10:00:00 GMT") == 2019
+    assert publication_year("https://www.cssf.lu/en/about/") is None
+
+
+def test_priority_order():
+    prioritizer = RequestPrioritizer(URLRules())
+    circular_pdf = prioritizer.priority("https://www.cssf.lu/wp-content/uploads/cssf22_806eng.pdf")
+    old_circular_pdf = prioritizer.priority("https://www.cssf.lu/wp-content/uploads/cssf12_552eng.pdf")
+    news = prioritizer.priority("https://www.cssf.lu/en/2024/03/some-news/")
+    eurlex = prioritizer.priority("https://eur-lex.europa.eu/legal-content/EN/TXT/?uri=CELEX:32024R1689")
+
+    assert circular_pdf > old_circular_pdf > news > eurlex
+
+
+def test_budget_domain_groups_subdomains():
+    assert budget_domain("www.cssf.lu") == "cssf.lu"
+    assert budget_domain("eur-lex.europa.eu") == "eur-lex.europa.eu"
+    assert budget_domain("example.org") == "example.org"
+
+
+def test_throttling_backs_off_and_recovers():
+    budget = DomainBudget(concurrency=3, max_concurrency=4, delay=1.0, max_delay=60.0, window=10)
+    budget.observe(429, None)
+    assert budget.delay == 2.0
+    assert budget.concurrency == 2
+
+    budget.observe(503, None, retry_after=30)
+    assert budget.delay == 30.0
+    assert budget.concurrency == 1
+
+    # Concurrency only grows back once the whole window is free of throttling
+    for _ in range(9):
+        budget.observe(200, 0.2)
+    assert budget.concurrency == 1
+    budget.observe(200, 0.2)
+    assert budget.concurrency == 2
+    assert budget.delay < 30.0
+
+
+def test_delay_follows_latency():
+    budget = DomainBudget(concurrency=2, delay=0.25, max_delay=10.0)
+    for _ in range(30):
+        budget.observe(200, 4.0)
+    assert 1.9 < budget.delay <= 2.0
+
+
+def test_redirect_gets_slot_of_its_own_domain():
+    middleware = AdaptiveThrottleMiddleware(crawler=None)
+    # A redirect from cssf.lu to EUR-Lex keeps the meta of the original request
+    request = SimpleNamespace(url="https://eur-lex.europa.eu/eli/reg/2019/2088/oj", meta={"download_slot": "cssf.lu"})
+    middleware.request_scheduled(request, spider=None)
+    assert request.meta["download_slot"] == "eur-lex.europa.eu"
+
+    middleware.process_request(request, spider=None)
+    assert list(middleware.domains) == ["eur-lex.europa.eu"]
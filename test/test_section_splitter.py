@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for the native single-pass section splitter
+Elements are plain stand-ins for unstructured elements, and Document falls back to a local stand-in
+when langchain_core is not installed, so the tests always run
+"""
+import os
+import sys
+from types import ModuleType, SimpleNamespace
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+try:
+    import langchain_core.documents  # noqa: F401
+except ImportError:
+    class Document:
+        def __init__(self, page_content, metadata=None):
+            self.page_content = page_content
+            self.metadata = metadata or {}
+
+    documents = ModuleType("langchain_core.documents")
+    documents.Document = Document
+    sys.modules.setdefault("langchain_core", ModuleType("langchain_core"))
+    sys.modules["langchain_core.documents"] = documents
+
+from chunker.section_splitter import SectionSplitter
+
+
+def element(category, text, page=1):
+    return SimpleNamespace(category=category, text=text, metadata=SimpleNamespace(page_number=page, to_dict=dict))
+
+
+def paragraphs(count, label):
+    return "\n\n".join(f"{label} paragraph {i}: " + "the entity shall notify the CSSF " * 3 for i in range(count))
+
+
+def assert_no_redundant_chunk(chunks, text):
+    """Every chunk adds text its neighbours don't already cover"""
+    spans = []
+    position = 0
+    for chunk in chunks:
+        start = text.find(chunk, position)
+        assert start >= 0, chunk[:40]
+        spans.append((start, start + len(chunk)))
+        position = start + 1
+    for (_, before_end), (start, end), (after_start, _) in zip(spans, spans[1:], spans[2:]):
+        assert not (end <= before_end or start >= after_start or after_start <= before_end), (start, end)
+
+
+def test_title_leads_oversized_element():
+    splitter = SectionSplitter(max_chunk_size=300, overlap=50)
+    docs = list(splitter.split([element("Title", "Heading One"), element("NarrativeText", paragraphs(10, "Body"))],
+                               "https://www.cssf.lu/en/c1"))
+
+    assert docs[0].page_content.startswith("Heading One\n\nBody paragraph 0")
+    assert all(doc.page_content != "Heading One" for doc in docs)
+    assert all(len(doc.page_content) <= 300 for doc in docs)
+    assert_no_redundant_chunk([doc.page_content for doc in docs], "Heading One\n\n" + paragraphs(10, "Body"))
+
+
+def test_title_not_left_at_chunk_tail():
+    splitter = SectionSplitter(max_chunk_size=300, overlap=50)
+    docs = list(splitter.split([
+        element("NarrativeText", "x" * 150),
+        element("Title", "Heading Two"),
+        element("NarrativeText", "y" * 200),
+    ], "https://www.cssf.lu/en/c2"))
+
+    assert [doc.page_content.endswith("Heading Two") for doc in docs] == [False, False]
+    assert docs[1].page_content.startswith("Heading Two\n\n")
+
+
+def test_sections_split_at_titles():
+    splitter = SectionSplitter(max_chunk_size=1800, overlap=200)
+    docs = list(splitter.split([
+        element("Title", "Section A"),
+        element("NarrativeText", "a" * 400),
+        element("Title", "Section B", page=2),
+        element("NarrativeText", "b" * 400, page=2),
+    ], "https://www.cssf.lu/en/c3"))
+
+    assert [doc.page_content[:9] for doc in docs] == ["Section A", "Section B"]
+    assert [doc.metadata["page_number"] for doc in docs] == [1, 2]
+
+
+def test_long_body_after_title_has_no_redundant_chunk():
+    splitter = SectionSplitter(max_chunk_size=1800, overlap=200)
+    body = " ".join(f"Sentence {i} on notification duties towards the CSSF." for i in range(120))
+    chunks = splitter._split_with_lead("Heading One", body)
+
+    assert chunks[0].startswith("Heading One\n\nSentence 0 ")
+    assert all(len(chunk) <= 1800 for chunk in chunks)
+    assert_no_redundant_chunk(chunks, "Heading One\n\n" + body)
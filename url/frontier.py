@@ -0,0 +1,109 @@
+from typing import Iterator
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CrawlFrontier:
+    """Disk-backed visited set and pending queue, so a crawl can resume after a crash or redeploy"""
+
+    PENDING = "pending"
+    DONE = "done"
+
+    def __init__(self, path: str = "frontier.sqlite"):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                added_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_urls_state ON urls(state, priority)")
+        self._conn.commit()
+
+    def __contains__(self, url: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM urls WHERE url = ?", (url,)).fetchone()
+        return row is not None
+
+    def add(self, url: str, priority: int = 0) -> bool:
+        """Enqueue url as pending; returns False if it was already known"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO urls (url, state, priority, added_at) VALUES (?, ?, ?, ?)",
+                (url, self.PENDING, priority, time.time())
+            )
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def mark_done(self, url: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO urls (url, state, added_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET state = excluded.state",
+                (url, self.DONE, time.time())
+            )
+            self._conn.commit()
+
+    def pending(self, page_size: int = 1000) -> Iterator[str]:
+        """Pending URLs, highest priority and oldest first, read one page at a time"""
+        cursor = None
+        while True:
+            with self._lock:
+                if cursor is None:
+                    rows = self._conn.execute(
+                        "SELECT url, priority, added_at FROM urls WHERE state = ? "
+                        "ORDER BY priority DESC, added_at ASC, url ASC LIMIT ?",
+                        (self.PENDING, page_size)
+                    ).fetchall()
+                else:
+                    # Keyset pagination: rows marked done meanwhile don't shift the next page
+                    priority, added_at, url = cursor
+                    rows = self._conn.execute(
+                        "SELECT url, priority, added_at FROM urls WHERE state = ? AND "
+                        "(priority < ? OR (priority = ? AND (added_at > ? OR (added_at = ? AND url > ?)))) "
+                        "ORDER BY priority DESC, added_at ASC, url ASC LIMIT ?",
+                        (self.PENDING, priority, priority, added_at, added_at, url, page_size)
+                    ).fetchall()
+            for url, _, _ in rows:
+                yield url
+            if len(rows) < page_size:
+                return
+            url, priority, added_at = rows[-1]
+            cursor = (priority, added_at, url)
+
+    def has_pending(self) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM urls WHERE state = ? LIMIT 1", (self.PENDING,)).fetchone()
+        return row is not None
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM urls GROUP BY state").fetchall()
+        return dict(rows)
+
+    def reset(self):
+        """Forget the previous run so a new crawl starts from the seeds"""
+        with self._lock:
+            self._conn.execute("DELETE FROM urls")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 from urllib.parse import urlparse
 
 import logging
@@ -7,12 +8,12 @@ from w3lib.url import canonicalize_url
 logger = logging.getLogger(__name__)
 
 class URLRules:
-    def __init__(self):
+    def __init__(self, frontier=None):
         self.primary_domains = ["cssf.lu"]
         self.secondary_domains = [
             "eur-lex.europa.eu",
             "data.europa.eu",
-            "ata.legilux.public.lu"
+            "data.legilux.public.lu"
         ]
         self.exclude_url_patterns = [
             r"^https://www\.cssf\.lu/en/search",
@@ -37,16 +38,55 @@ class URLRules:
             r"^https://www\.cssf\.lu/en/regulatory-framework/",
             r"^https://www\.cssf\.lu/en/?$"
         ]
+        # A CrawlFrontier keeps the visited set on disk; the in-memory set is used without one
+        self.frontier = frontier
         self.visited = set()
 
-    def canonical(self, url):
+        # The same hrefs repeat on every page (menus, footers), so parse/canonicalize each once
+        self.canonical = lru_cache(maxsize=100_000)(self._canonicalize)
+        self.host = lru_cache(maxsize=100_000)(self._host)
+        self.compile()
+
+    def compile(self):
+        """Build the combined exclusion regexes and the domain suffix table; call again after editing the rules"""
+        # Anchored rules only need to be tried at position 0; a leading ".*" adds nothing to a search
+        anchored, floating = [], []
+        for i, pattern in enumerate(self.exclude_url_patterns):
+            if pattern.startswith("^"):
+                anchored.append(f"(?P<p{i}>{pattern[1:]})")
+            else:
+                floating.append(f"(?P<p{i}>{pattern[2:] if pattern.startswith('.*') else pattern})")
+
+        self._anchored_re = re.compile("|".join(anchored), re.IGNORECASE) if anchored else None
+        self._floating_re = re.compile("|".join(floating), re.IGNORECASE) if floating else None
+
+        self._domain_types = {domain: "secondary" for domain in self.secondary_domains}
+        self._domain_types.update({domain: "primary" for domain in self.primary_domains})
+
+    @staticmethod
+    def _canonicalize(url):
         return canonicalize_url(url, keep_fragments=False)
 
+    @staticmethod
+    def _host(url):
+        return (urlparse(url).hostname or "").lower()
+
+    def _lookup_domain_type(self, url):
+        """Match the host and each parent domain against the suffix table, most specific first"""
+        labels = self.host(url).split(".")
+        for i in range(len(labels)):
+            domain_type = self._domain_types.get(".".join(labels[i:]))
+            if domain_type:
+                return domain_type
+        return None
+
     def is_excluded(self, url):
-        for pattern in self.exclude_url_patterns:
-            if re.search(pattern, url, re.IGNORECASE):
-                logger.debug(f"Excluded by pattern: {url} --- > {pattern}")
-                return True
+        match = self._anchored_re and self._anchored_re.match(url)
+        if not match:
+            match = self._floating_re and self._floating_re.search(url)
+        if match:
+            logger.debug(f"Excluded by pattern: {url} --- > {self.exclude_url_patterns[int(match.lastgroup[1:])]}")
+            return True
         return False
 
     def is_nested_only(self, url):
@@ -54,26 +94,28 @@ class URLRules:
         return False
 
     def is_allowed_domain(self, url):
-        domain = urlparse(url).netloc
-        return any(allowed in domain for allowed in self.primary_domains + self.secondary_domains)
+        return self._lookup_domain_type(url) is not None
 
     def is_primary_domain(self, url):
-        domain = urlparse(url).netloc
-        return any(allowed in domain for allowed in self.primary_domains)
+        return self._lookup_domain_type(url) == "primary"
 
     def get_domain_type(self, url):
-        domain = urlparse(url).netloc.lower().lstrip("www.")
-        if any(domain == p or domain.endswith("." + p) for p in self.primary_domains):
-            return "primary"
-        if any(domain == s or domain.endswith("." + s) for s in self.secondary_domains):
-            return "secondary"
-        return "unknown"
+        return self._lookup_domain_type(url) or "unknown"
 
     def is_visited(self, url):
+        if self.frontier is not None:
+            return self.canonical(url) in self.frontier
         return self.canonical(url) in self.visited
 
-    def mark_visited(self, url):
-        self.visited.add(self.canonical(url))
+    def mark_visited(self, url, priority=0):
+        if self.frontier is not None:
+            self.frontier.add(self.canonical(url), priority)
+        else:
+            self.visited.add(self.canonical(url))
+
+    def mark_done(self, url):
+        if self.frontier is not None:
+            self.frontier.mark_done(self.canonical(url))
 
     def should_follow(self, url):
 